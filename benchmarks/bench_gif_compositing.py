@@ -0,0 +1,119 @@
+# benchmarks/bench_gif_compositing.py
+"""Compare animated encounter compositing: legacy per-frame Pillow loop vs. the
+vectorized NumPy stack compositor in utils/encounter_render.py.
+
+Run from the repository root:
+    python -m benchmarks.bench_gif_compositing [species_count] [iterations]
+
+Animated sprites are the species' Showdown GIFs ("front_default" in the catalog),
+downloaded once into the local sprite store.
+"""
+import io
+import os
+import sys
+import time
+import random
+import asyncio
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from utils.species_catalog import load_catalog
+from utils.sprite_store import fetch_sprite, decode_sprite
+from utils.background_atlas import get_background, background_count
+from utils.encounter_render import composite_animated
+
+BG_SIZE = (256, 144)
+SPRITE_SCALE = 1.0
+
+def legacy_composite(sprite_data, background_rgba, sprite_scale, position="bottom_center"):
+    """The per-frame loop generate_encounter_image used before the stack compositor"""
+    sprite_image = Image.open(io.BytesIO(sprite_data))
+    background = Image.fromarray(background_rgba, "RGBA")
+    bg_width, bg_height = background.size
+
+    frames = []
+    durations = []
+    for frame_idx in range(sprite_image.n_frames):
+        sprite_image.seek(frame_idx)
+        durations.append(sprite_image.info.get('duration', 100))
+
+        frame = sprite_image.convert("RGBA")
+        new_size = (int(frame.size[0] * sprite_scale), int(frame.size[1] * sprite_scale))
+        frame = frame.resize(new_size, Image.LANCZOS)
+
+        spr_width, spr_height = frame.size
+        paste_x = (bg_width - spr_width) // 2
+        paste_y = bg_height - spr_height - (bg_height // 10)
+
+        new_frame = background.copy()
+        new_frame.paste(frame, (paste_x, paste_y), frame)
+        frames.append(new_frame)
+
+    final_buffer = io.BytesIO()
+    frames[0].save(final_buffer, format="GIF", save_all=True, append_images=frames[1:],
+                   optimize=True, duration=durations, loop=0, disposal=2)
+    return final_buffer.getvalue()
+
+async def fetch_animated_sprites(count):
+    """Download (or read from the sprite store) Showdown GIFs for random species"""
+    catalog = load_catalog(source="file")
+    urls = [species["sprites"]["front_default"] for species in catalog
+            if species.get("sprites", {}).get("front_default", "").endswith(".gif")]
+    random.seed(0)
+    random.shuffle(urls)
+
+    sprites = []
+    for url in urls:
+        fetched = await fetch_sprite(url)
+        if fetched is not None:
+            sprites.append((url, fetched[1]))
+        if len(sprites) >= count:
+            break
+    return sprites
+
+def time_ms(fn, iterations):
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, result
+
+def main():
+    species_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    sprites = asyncio.run(fetch_animated_sprites(species_count))
+    if not sprites:
+        print("No animated sprites could be fetched")
+        return
+
+    folder = os.path.join("assets", "backgrounds")
+    background = get_background(folder, BG_SIZE, "RGBA", random.randrange(background_count(folder, BG_SIZE, "RGBA")))
+
+    legacy_all, stack_all = [], []
+    legacy_bytes, stack_bytes = 0, 0
+    for url, data in sprites:
+        legacy_ms, legacy_out = time_ms(lambda: legacy_composite(data, background, SPRITE_SCALE), iterations)
+        # Decoding is included: a cold render pays it once, then the LRU serves it
+        stack_ms, stack_out = time_ms(
+            lambda: composite_animated(decode_sprite(data), background, SPRITE_SCALE, formats=("gif",))[0], iterations
+        )
+        legacy_all += legacy_ms
+        stack_all += stack_ms
+        legacy_bytes += len(legacy_out)
+        stack_bytes += len(stack_out)
+        print(f"{url.rsplit('/', 1)[-1]:<28} legacy {statistics.median(legacy_ms):>8.1f}ms | "
+              f"stack {statistics.median(stack_ms):>8.1f}ms")
+
+    print()
+    print(f"{'legacy per-frame loop':<24} median {statistics.median(legacy_all):>8.1f}ms | "
+          f"avg size {legacy_bytes / len(sprites) / 1024:>7.1f} KB")
+    print(f"{'vectorized stack':<24} median {statistics.median(stack_all):>8.1f}ms | "
+          f"avg size {stack_bytes / len(sprites) / 1024:>7.1f} KB")
+    print(f"Speed-up: {statistics.median(legacy_all) / statistics.median(stack_all):.2f}x")
+
+if __name__ == "__main__":
+    main()
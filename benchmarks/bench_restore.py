@@ -0,0 +1,126 @@
+# benchmarks/bench_restore.py
+"""Time restoring a large caught_pokemon collection from a streaming backup.
+
+Run from the repository root:
+    python -m benchmarks.bench_restore [document_count] [database]
+
+Writes a synthetic full backup of document_count caught Pokémon to a temporary
+directory, then restores it into a scratch database (default flapple_restore_bench,
+dropped afterwards) with db.management.restore_backup under a few worker/batch
+settings. The baseline is the naive path: indexes created first, then one thread
+inserting ordered batches. Needs the Mongo_API environment variable.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from utils.indexes import REQUIRED_INDEXES
+
+STATS = ("hp", "attack", "defense", "special-attack", "special-defense", "speed")
+CONFIGS = [(1, 1000), (4, 1000), (8, 1000), (8, 5000)]
+
+def load_management():
+    """db.management.py is a script with a dot in its name, so import it by path"""
+    spec = importlib.util.spec_from_file_location("db_management", os.path.join(ROOT, "db.management.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def synthetic_pokemon(count, owners=2000):
+    rng = random.Random(0)
+    ordinals = {}
+    for unique_id in range(1, count + 1):
+        owner_id = str(rng.randrange(owners))
+        ordinals[owner_id] = ordinals.get(owner_id, 0) + 1
+        level = rng.randint(1, 100)
+        yield {
+            "_id": f"{unique_id:06d}",
+            "pokedex_id": rng.randint(1, 1025),
+            "name": f"species-{rng.randint(1, 1025)}",
+            "nickname": None,
+            "shiny": rng.randrange(4096) == 0,
+            "level": level,
+            "nature": "Hardy",
+            "ivs": {stat: rng.randint(0, 31) for stat in STATS},
+            "base_stats": {stat: rng.randint(20, 150) for stat in STATS},
+            "final_stats": {stat: rng.randint(10, 400) for stat in STATS},
+            "xp": level ** 3,
+            "ability": "overgrow",
+            "owner_id": owner_id,
+            "ordinal": ordinals[owner_id]
+        }
+
+def write_backup(management, backup_dir, count):
+    path = os.path.join(backup_dir, "caught_pokemon.ndjson.gz")
+    written, checksum = management._write_ndjson(path, synthetic_pokemon(count))
+    manifest = {
+        "type": "full", "created_at": None, "base": None, "checkpoint": None,
+        "collections": {"caught_pokemon": {
+            "file": os.path.basename(path), "count": written, "sha256": checksum, "bytes": os.path.getsize(path)
+        }}
+    }
+    with open(os.path.join(backup_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    return os.path.getsize(path)
+
+def naive_restore(management, db, backup_dir, batch_size=1000):
+    collection = db.caught_pokemon
+    collection.drop()
+    for name, keys, options in REQUIRED_INDEXES:
+        if name == "caught_pokemon":
+            collection.create_index(keys, **options)
+
+    batch = []
+    for document in management._read_ndjson(os.path.join(backup_dir, "caught_pokemon.ndjson.gz")):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:>8.2f}s | {count / elapsed:>10.0f} docs/s")
+    return elapsed
+
+def main():
+    load_dotenv()
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    database = sys.argv[2] if len(sys.argv) > 2 else "flapple_restore_bench"
+    if not os.getenv("Mongo_API"):
+        print("Set Mongo_API to run the restore benchmark")
+        return
+
+    management = load_management()
+    db = MongoClient(os.getenv("Mongo_API"))[database]
+    backup_dir = tempfile.mkdtemp(prefix="stream_bench_")
+    try:
+        size = write_backup(management, backup_dir, count)
+        print(f"Backup: {count} caught Pokémon, {size / 1048576:.1f} MB compressed\n")
+
+        baseline = timed("naive (indexes first, 1x)", count, lambda: naive_restore(management, db, backup_dir))
+        for workers, batch_size in CONFIGS:
+            elapsed = timed(
+                f"restore {workers} workers x {batch_size}", count,
+                lambda: management.restore_backup(backup_dir, workers=workers, batch_size=batch_size, db=db)
+            )
+            print(f"{'':<28} speed-up vs naive: {baseline / elapsed:.2f}x")
+    finally:
+        shutil.rmtree(backup_dir, ignore_errors=True)
+        db.client.drop_database(database)
+
+if __name__ == "__main__":
+    main()
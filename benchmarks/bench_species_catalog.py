@@ -0,0 +1,62 @@
+# benchmarks/bench_species_catalog.py
+"""Compare species lookup latency: in-process catalog vs. a MongoDB round-trip.
+
+Run from the repository root:
+    python -m benchmarks.bench_species_catalog [iterations]
+
+The MongoDB half is skipped when the Mongo_API environment variable is unset.
+"""
+import os
+import sys
+import time
+import random
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from utils.species_catalog import load_catalog
+
+def time_lookups(lookup, keys):
+    """Return per-call latencies in microseconds"""
+    latencies = []
+    for key in keys:
+        start = time.perf_counter()
+        lookup(key)
+        latencies.append((time.perf_counter() - start) * 1_000_000)
+    return latencies
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:<24} mean {statistics.mean(latencies):>10.2f}µs | "
+          f"p50 {statistics.median(latencies):>10.2f}µs | p99 {p99:>10.2f}µs")
+
+def main():
+    load_dotenv()
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    use_mongo = bool(os.getenv("Mongo_API"))
+
+    start = time.perf_counter()
+    catalog = load_catalog("mongo" if use_mongo else "file")
+    print(f"Catalog load: {len(catalog)} species in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    ids = [random.choice(list(catalog.by_id)) for _ in range(iterations)]
+    names = [catalog.by_id[i]["name"] for i in ids]
+
+    report("catalog by id", time_lookups(catalog.get_by_id, ids))
+    report("catalog by name", time_lookups(catalog.get_by_name, names))
+
+    if not use_mongo:
+        print("Mongo_API not set - skipping MongoDB comparison")
+        return
+
+    from config import db
+    # MongoDB round-trips are orders of magnitude slower, so sample fewer of them
+    sample = ids[:min(iterations, 500)]
+    report("mongo find_one by id", time_lookups(lambda i: db.pokemon.find_one({"id": i}), sample))
+    report("mongo find_one by name", time_lookups(lambda n: db.pokemon.find_one({"name": n}),
+                                                 [catalog.by_id[i]["name"] for i in sample]))
+
+if __name__ == "__main__":
+    main()
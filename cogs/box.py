@@ -1,12 +1,14 @@
 # cogs/box.py (updated with discord.ui buttons)
 import discord
-import time
 import asyncio
 from discord.ext import commands
-from utils.db_utils import get_user_data, get_pokemon_bulk, get_pokemon_data, update_pokemon_data, update_user_data
+from utils.db_utils import get_user_data, get_pokemon_data, get_pokemon_by_ordinal, update_pokemon_data, update_user_data
+from utils.db_utils import get_box_page, rebuild_box_summaries
+from utils.xp_accumulator import partner_xp
+from utils.cache import TTLCache
 
 class BoxView(discord.ui.View):
-    def __init__(self, ctx, cog, user_id, user, current_page, total_pages, caught_id_list, total_pokemon, box_color):
+    def __init__(self, ctx, cog, user_id, user, current_page, total_pages, total_pokemon, box_color):
         super().__init__(timeout=60)
         self.ctx = ctx
         self.cog = cog
@@ -14,7 +16,6 @@ class BoxView(discord.ui.View):
         self.user = user
         self.current_page = current_page
         self.total_pages = total_pages
-        self.caught_id_list = caught_id_list
         self.total_pokemon = total_pokemon
         self.box_color = box_color
         self.message = None
@@ -53,8 +54,7 @@ class BoxView(discord.ui.View):
         # Get new embed
         embed = await self.cog.get_page_embed(
             self.user_id, self.user, self.current_page,
-            self.total_pages, self.caught_id_list,
-            self.total_pokemon, self.box_color
+            self.total_pages, self.total_pokemon, self.box_color
         )
         
         # Update button states directly
@@ -75,8 +75,7 @@ class BoxView(discord.ui.View):
         
         embed = await self.cog.get_page_embed(
             self.user_id, self.user, self.current_page,
-            self.total_pages, self.caught_id_list, 
-            self.total_pokemon, self.box_color
+            self.total_pages, self.total_pokemon, self.box_color
         )
         
         # Update button states directly
@@ -96,8 +95,7 @@ class BoxView(discord.ui.View):
         
         embed = await self.cog.get_page_embed(
             self.user_id, self.user, self.current_page,
-            self.total_pages, self.caught_id_list, 
-            self.total_pokemon, self.box_color
+            self.total_pages, self.total_pokemon, self.box_color
         )
         
         # Update button states directly
@@ -117,8 +115,7 @@ class BoxView(discord.ui.View):
         
         embed = await self.cog.get_page_embed(
             self.user_id, self.user, self.current_page,
-            self.total_pages, self.caught_id_list, 
-            self.total_pokemon, self.box_color
+            self.total_pages, self.total_pokemon, self.box_color
         )
         
         # Update button states directly
@@ -144,9 +141,10 @@ class BoxView(discord.ui.View):
 class BoxCog(commands.Cog):
     def __init__(self, client):
         self.client = client
-        self.box_cache = {}
-        self.BOX_CACHE_TIMEOUT = 300  # Cache timeout in seconds (5 minutes)
         self.pokemon_per_page = 12
+        # owner -> box size when their summaries were last rebuilt (avoids rebuild loops on gaps;
+        # bounded, and expiry lets a trainer with gaps be retried later)
+        self.rebuilt_summaries = TTLCache("box_rebuilds", max_size=5000, ttl=3600)
     
     @commands.command()
     async def box(self, ctx, page: int = 1, user: discord.Member = None):
@@ -157,19 +155,18 @@ class BoxCog(commands.Cog):
         user_id = str(user.id)
         
         # Get user data
-        user_data = await get_user_data(user_id)
+        user_data = await get_user_data(user_id, fields=("caught_count",))
         
         if not user_data:
             await ctx.send("You have not begun your adventure! Start by using the `%start` command.")
             return
         
-        caught_id_list = user_data.get("caught_pokemon", [])
+        total_pokemon = user_data.get("caught_count", 0)
         
-        if not caught_id_list:
+        if not total_pokemon:
             await ctx.send("You have not caught any Pokémon! Try using the `%search` command.")
             return
         
-        total_pokemon = len(caught_id_list)
         total_pages = max(1, (total_pokemon + self.pokemon_per_page - 1) // self.pokemon_per_page)
         current_page = max(1, min(page, total_pages))
         
@@ -178,11 +175,11 @@ class BoxCog(commands.Cog):
         box_color = discord.Colour(color_seed)
         
         # Get the embed for the current page
-        embed = await self.get_page_embed(user_id, user, current_page, total_pages, caught_id_list, total_pokemon, box_color)
+        embed = await self.get_page_embed(user_id, user, current_page, total_pages, total_pokemon, box_color)
         
         # Create and send the view for pagination
         if total_pages > 1:
-            view = BoxView(ctx, self, user_id, user, current_page, total_pages, caught_id_list, total_pokemon, box_color)
+            view = BoxView(ctx, self, user_id, user, current_page, total_pages, total_pokemon, box_color)
             
             # IMPORTANT: Send message first, then update the view's message reference
             message = await ctx.send(embed=embed, view=view)
@@ -194,22 +191,20 @@ class BoxCog(commands.Cog):
             await ctx.send(embed=embed)
 
     
-    async def get_page_embed(self, user_id, user, page_num, total_pages, caught_id_list, total_pokemon, box_color):
-        """Generate embed for a specific page with bulk data loading and caching"""
-        current_time = time.time()
-        
-        # Check if page data is cached
-        cache_key = f"{user_id}_page_{page_num}"
-        if cache_key in self.box_cache and current_time - self.box_cache[cache_key]["timestamp"] < self.BOX_CACHE_TIMEOUT:
-            return self.box_cache[cache_key]["embed"]
-        
+    async def get_page_embed(self, user_id, user, page_num, total_pages, total_pokemon, box_color):
+        """Generate embed for a specific page from the precomputed box summaries"""
         # Calculate range for current page
         start_idx = (page_num - 1) * self.pokemon_per_page
-        end_idx = min(start_idx + self.pokemon_per_page, total_pokemon)
-        current_page_pokemon_ids = caught_id_list[start_idx:end_idx]
+        page_size = min(self.pokemon_per_page, total_pokemon - start_idx)
         
-        # OPTIMIZATION: Bulk fetch all Pokémon for this page in ONE query
-        pokemon_dict = await get_pokemon_bulk(current_page_pokemon_ids)
+        # One indexed range query over (owner_id, ordinal) - cost doesn't grow with box size
+        summaries = await get_box_page(user_id, start_idx + 1, page_size)
+        
+        # Trainers from before summaries existed (or out of step) get theirs rebuilt once
+        if len(summaries) < page_size and self.rebuilt_summaries.get(user_id) != total_pokemon:
+            await rebuild_box_summaries(user_id)
+            self.rebuilt_summaries.set(user_id, total_pokemon)
+            summaries = await get_box_page(user_id, start_idx + 1, page_size)
         
         # Create the embed
         embed = discord.Embed(
@@ -219,31 +214,18 @@ class BoxCog(commands.Cog):
         )
         
         # Add Pokémon to the embed
-        for i, pokemon_id in enumerate(current_page_pokemon_ids):
-            if pokemon_id in pokemon_dict:
-                pokemon = pokemon_dict[pokemon_id]
-                name = pokemon["name"].capitalize().replace('-', ' ')
-                nickname = pokemon.get("nickname")
-                shiny = pokemon["shiny"]
-                level = pokemon["level"]
-                global_number = start_idx + i + 1
-                display_name = f"{nickname} ({name})" if nickname else name
-                if shiny:
-                    display_name = f"⭐ {display_name}"
-                total_iv = sum(pokemon["ivs"].values()) if "ivs" in pokemon else 0
-                iv_percentage = round((total_iv / 186) * 100, 2)
-                field_name = f"`#{global_number:03d}` {display_name}"
-                value = f"Lv. {level} | IV: {iv_percentage}%"
-                embed.add_field(name=field_name, value=value, inline=True)
+        for summary in summaries:
+            name = summary["name"].capitalize().replace('-', ' ')
+            nickname = summary.get("nickname")
+            display_name = f"{nickname} ({name})" if nickname else name
+            if summary["shiny"]:
+                display_name = f"⭐ {display_name}"
+            field_name = f"`#{summary['ordinal']:03d}` {display_name}"
+            value = f"Lv. {summary['level']} | IV: {summary['iv_percentage']}%"
+            embed.add_field(name=field_name, value=value, inline=True)
         
         embed.set_footer(text="Use buttons to navigate | %view [number] for details")
         
-        # Cache the embed
-        self.box_cache[cache_key] = {
-            "embed": embed,
-            "timestamp": current_time
-        }
-        
         return embed
     
     @commands.command(aliases=["v", "info", "pokemon"])
@@ -281,28 +263,25 @@ class BoxCog(commands.Cog):
             return
         
         # Fetch user data
-        user_data = await get_user_data(user_id)
+        user_data = await get_user_data(user_id, fields=("caught_count",))
         
         if not user_data:
             await ctx.send("You have not begun your adventure! Start by using the `%start` command.")
             return
         
-        caught_id_list = user_data.get("caught_pokemon", [])
+        total_pokemon = user_data.get("caught_count", 0)
         
-        if not caught_id_list:
+        if not total_pokemon:
             await ctx.send("You have not caught any Pokémon! Try using the `%search` command")
             return
         
-        total_pokemon = len(caught_id_list)
-        
         # Validate the number
         if number < 1 or number > total_pokemon:
             await ctx.send(f"Pokémon #{number} doesn't exist in your box. You have {total_pokemon} Pokémon (numbered 1-{total_pokemon}).")
             return
         
-        # Get the Pokémon unique ID (adjusting for 0-based indexing)
-        pokemon_id = caught_id_list[number - 1]
-        pokemon = await get_pokemon_data(pokemon_id)
+        # Look the Pokémon up by its box number
+        pokemon = await get_pokemon_by_ordinal(user_id, number)
         
         if not pokemon:
             await ctx.send("Pokémon data could not be found.")
@@ -353,7 +332,7 @@ class BoxCog(commands.Cog):
         # Add Pokémon info
         view_embed.add_field(name="Type", value=type_str or "Unknown", inline=True)
         view_embed.add_field(name="Pokédex ID", value=f"#{pokedex_id}", inline=True)
-        view_embed.add_field(name="Unique ID", value=pokemon_id, inline=True)
+        view_embed.add_field(name="Unique ID", value=pokemon["_id"], inline=True)
         
         # Add IVs if available
         if "ivs" in pokemon and isinstance(pokemon["ivs"], dict):
@@ -401,7 +380,7 @@ class BoxCog(commands.Cog):
         
         try:
             # Fetch user data
-            user_data = await get_user_data(user_id)
+            user_data = await get_user_data(user_id, fields=("partner_pokemon",))
             
             if not user_data:
                 await ctx.send("You haven't started your adventure yet. Use `%start` to begin!")
@@ -424,7 +403,8 @@ class BoxCog(commands.Cog):
             name = partner_pokemon["name"].capitalize().replace('-', ' ')
             nickname = partner_pokemon.get("nickname")
             level = partner_pokemon["level"]
-            xp = partner_pokemon.get("xp", 0)
+            # Include chat XP that is still buffered and not yet written back
+            xp = partner_pokemon.get("xp", 0) + partner_xp.pending_xp(partner_id)
             pokedex_id = partner_pokemon["pokedex_id"]
             shiny = partner_pokemon["shiny"]
             
@@ -506,18 +486,18 @@ class BoxCog(commands.Cog):
         
         try:
             # Check if user exists
-            user_data = await get_user_data(user_id)
+            user_data = await get_user_data(user_id, fields=("caught_count", "partner_pokemon"))
             
             # Check if user has an account
             if not user_data:
                 await ctx.send("You have not begun your adventure! Start by using the `%start` command.")
                 return
             
-            # Get the list of caught Pokémon
-            caught_id_list = user_data.get("caught_pokemon", [])
+            # Get the number of caught Pokémon
+            total_pokemon = user_data.get("caught_count", 0)
             
             # If no Pokémon are caught, inform the user
-            if not caught_id_list:
+            if not total_pokemon:
                 await ctx.send("You haven't caught any Pokémon yet! Use the `%search` command to find and catch Pokémon.")
                 return
             
@@ -569,7 +549,6 @@ class BoxCog(commands.Cog):
                 return
             
             # Validate the Pokémon number
-            total_pokemon = len(caught_id_list)
             if number < 1 or number > total_pokemon:
                 error_embed = discord.Embed(
                     title="❌ Invalid Pokémon Number",
@@ -579,13 +558,13 @@ class BoxCog(commands.Cog):
                 await ctx.send(embed=error_embed)
                 return
             
-            # Get the Pokémon ID and data
-            pokemon_id = caught_id_list[number - 1]
-            pokemon = await get_pokemon_data(pokemon_id)
+            # Get the Pokémon by its box number
+            pokemon = await get_pokemon_by_ordinal(user_id, number)
             
             if not pokemon:
                 await ctx.send("Pokémon data could not be found.")
                 return
+            pokemon_id = pokemon["_id"]
             
             # Get the current partner for comparison
             current_partner_id = user_data.get("partner_pokemon")
@@ -782,7 +761,12 @@ class BoxCog(commands.Cog):
             )
             await ctx.send(embed=error_embed)
 
-
+    def invalidate_cache(self, user_id=None):
+        """Allow box summaries to be rebuilt again for a user (or every user)"""
+        if user_id:
+            self.rebuilt_summaries.invalidate(user_id)
+        else:
+            self.rebuilt_summaries.clear()
 
 
 async def setup(client):
@@ -1,24 +1,102 @@
 # cogs/encounter.py
 import discord
 import asyncio
+import io
 import random
 import time
 import os
 from discord.ext import commands
-from config import inventory_collection, pokemon_collection, active_catchers, config_collection, unique_id_collection
-from utils.encounter_utils import choose_random_wild, PokemonEncounterView, generate_encounter_image, get_emoji
+from config import active_catchers
+from utils.encounter_utils import PokemonEncounterView, generate_encounter_image, get_emoji
 from utils.pokemon_utils import search_pokemon_by_id, get_best_sprite_url, get_type_colour, prompt_for_nickname
-from utils.db_utils import get_user_data, update_user_data, get_pokemon_data, update_pokemon_data
+from utils.db_utils import get_user_data, get_pokemon_data
+from utils.db_utils import record_catch, BALL_FIELDS
+from utils.config_snapshot import get_config
+from utils.id_allocator import get_next_unique_id
+from utils.cache import TTLCache
+from utils.encounter_sampler import build_wild_sampler
+from utils.encounter_prefetch import EncounterPrefetcher, PreparedEncounter
+from utils.query_stats import defer_command, end_command
+
+# Output size of environment-rendered encounter images
+ENCOUNTER_BG_SIZE = (256, 144)
 
 class EncounterCog(commands.Cog):
     def __init__(self, client):
         self.client = client
-        self.encounter_cache = {}
         self.CACHE_TIMEOUT = 300  # 5 minutes
+        self.encounter_cache = TTLCache("encounters", max_size=1000, ttl=self.CACHE_TIMEOUT)
         self.background_folder = os.path.join(os.getcwd(), "assets", "backgrounds")
-        # Initialize wild pools on startup
-        from utils.encounter_utils import initialize_wild_pool
-        self.normal_ID_list, self.mythical_ID_list, self.legendary_ID_list = initialize_wild_pool()
+        # Build the wild-encounter alias tables on startup (rebuilt on catalog reload)
+        self.sampler = build_wild_sampler()
+        
+        # Pre-rolled encounters; entries from an older catalog version are discarded
+        from utils.render_pool import render_pool
+        self.prefetcher = EncounterPrefetcher(
+            self.prepare_encounter,
+            current_version=lambda: self.sampler.version,
+            can_prepare=lambda: not render_pool.saturated()
+        )
+    
+    async def cog_load(self):
+        # Decode and resize the encounter backgrounds once, off the event loop
+        from utils.background_atlas import warm_atlases
+        try:
+            await asyncio.to_thread(warm_atlases, self.background_folder, [ENCOUNTER_BG_SIZE])
+        except Exception as e:
+            print(f"Error preparing background atlas: {e}")
+        
+        # Compositing runs in warm worker processes so renders never block the event loop
+        from utils.render_pool import render_pool
+        render_pool.start(self.background_folder, [ENCOUNTER_BG_SIZE])
+        
+        # Background producer that keeps a few encounters ready per shard and mode
+        self.prefetcher.start()
+    
+    async def cog_unload(self):
+        self.prefetcher.stop()
+        
+        from utils.render_pool import render_pool
+        render_pool.shutdown()
+    
+    async def prepare_encounter(self, environment_mode):
+        """Roll a wild Pokémon and resolve/render everything %search shows for it"""
+        results, shiny = self.sampler.roll()
+        level = random.randint(3, 20)
+        
+        # Get sprite URL using environment settings
+        sprite_url = await get_best_sprite_url(results, shiny, environment_mode)
+        
+        image_bytes = None
+        is_animated = False
+        file_ext = None
+        
+        # Generate environment image if enabled
+        if environment_mode in ["static", "animated"] and sprite_url:
+            is_animated_allowed = (environment_mode == "animated")
+            # Use image generation function to produce a composite encounter image
+            image_buffer, is_animated, file_ext = await generate_encounter_image(
+                sprite_url=sprite_url,
+                background_folder=self.background_folder,
+                static_sprite_scale=0.4,
+                animated_sprite_scale=1.0,
+                position="bottom_center",
+                bg_size=ENCOUNTER_BG_SIZE,
+                is_animated_allowed=is_animated_allowed
+            )
+            image_bytes = image_buffer.getvalue() if image_buffer else None
+        
+        return PreparedEncounter(
+            species=results,
+            shiny=shiny,
+            level=level,
+            sprite_url=sprite_url,
+            image_bytes=image_bytes,
+            is_animated=is_animated,
+            file_ext=file_ext,
+            catalog_version=self.sampler.version,
+            created_at=time.time()
+        )
     
     @commands.command(aliases=["s"])
     async def search(self, ctx):
@@ -39,14 +117,15 @@ class EncounterCog(commands.Cog):
         # Immediately respond with a temporary message
         temp_message = await ctx.send(f"Searching for a wild pokemon... {get_emoji('grass')}")
         
-        # Offload the heavy processing to a background task
+        # Offload the heavy processing to a background task (which finishes the query stats)
+        defer_command()
         asyncio.create_task(self.process_search(ctx, temp_message))
     
     async def process_search(self, ctx, temp_message):
         """Process the search command (heavy lifting)"""
         try:
             # Get user data (with caching)
-            user_data = await get_user_data(str(ctx.author.id))
+            user_data = await get_user_data(str(ctx.author.id), fields=BALL_FIELDS + ("settings",))
             
             if not user_data:
                 error_embed = discord.Embed(
@@ -76,41 +155,26 @@ class EncounterCog(commands.Cog):
                 await temp_message.edit(embed=error_embed)
                 return
             
-            # ----- Heavy Processing: Choose a wild Pokémon -----
-            results, shiny = choose_random_wild(
-                self.normal_ID_list, 
-                self.mythical_ID_list, 
-                self.legendary_ID_list
-            )
+            # ----- Heavy Processing: Choose a wild Pokémon (pre-rolled when available) -----
+            shard_id = ctx.guild.shard_id if ctx.guild else 0
+            encounter = self.prefetcher.pop(shard_id, environment_mode)
+            if encounter is None:
+                encounter = await self.prepare_encounter(environment_mode)
+            
+            results = encounter.species
+            shiny = encounter.shiny
+            level = encounter.level
+            sprite_url = encounter.sprite_url
+            file_ext = encounter.file_ext
+            image_buffer = io.BytesIO(encounter.image_bytes) if encounter.image_bytes else None
             
-            level = random.randint(3, 20)
             type_list = results["types"]
             type_str = ", ".join([t.capitalize() for t in type_list])
             colour = get_type_colour(type_list)
             name = results["name"].capitalize().replace('-', ' ')
             
-            # Get sprite URL using environment settings
-            sprite_url = await get_best_sprite_url(results, shiny, environment_mode)
-            
-            image_buffer = None
-            is_animated = False
-            
-            # Generate environment image if enabled
-            if environment_mode in ["static", "animated"] and sprite_url:
-                is_animated_allowed = (environment_mode == "animated")
-                # Use image generation function to produce a composite encounter image
-                image_buffer, is_animated = await generate_encounter_image(
-                    sprite_url=sprite_url,
-                    background_folder=self.background_folder,
-                    static_sprite_scale=0.4,
-                    animated_sprite_scale=1.0,
-                    position="bottom_center",
-                    bg_size=(256, 144),
-                    is_animated_allowed=is_animated_allowed
-                )
-            
             # Prepare additional encounter parameters
-            ball_data = config_collection.find_one({"_id": "pokeballs"})
+            ball_data = await get_config("pokeballs")
             base_catch_rate = results["catch_rate"]
             earnings = random.randint(50, 150)
             flee_chance = 20
@@ -136,7 +200,6 @@ class EncounterCog(commands.Cog):
             
             # If using generated image, attach it as a file
             if environment_mode in ["static", "animated"] and image_buffer:
-                file_ext = 'gif' if is_animated else 'png'
                 generated_file = discord.File(image_buffer, filename=f"encounter.{file_ext}")
                 SHembed.set_image(url=f"attachment://encounter.{file_ext}")
             else:
@@ -145,6 +208,15 @@ class EncounterCog(commands.Cog):
             SHembed.set_author(name=ctx.author.name, icon_url=ctx.author.avatar)
             SHembed.set_footer(text=footer_text)
             
+            # A successful throw builds the Pokémon and records the whole catch in one write
+            caught = {}
+            async def catch_handler(ball_field, catch_earnings):
+                pokemon_doc = await self.build_caught_pokemon(str(ctx.author.id), results, shiny, level)
+                ball_counts = await record_catch(str(ctx.author.id), ball_field, catch_earnings, pokemon_doc)
+                if ball_counts is not None:
+                    caught["pokemon_doc"] = pokemon_doc
+                return ball_counts
+            
             # Create a view for the encounter (handles ball buttons, run, etc.)
             view = PokemonEncounterView(
                 ctx=ctx,
@@ -157,7 +229,8 @@ class EncounterCog(commands.Cog):
                 ball_data=ball_data,
                 SHembed_editor=None,  # Will be set later
                 earnings=earnings,
-                flee_chance=flee_chance
+                flee_chance=flee_chance,
+                catch_handler=catch_handler
             )
             
             # Send final message with embed and view
@@ -176,9 +249,9 @@ class EncounterCog(commands.Cog):
             # Wait for the encounter interaction to complete
             code, catch_result, catch, rate, earnings = await self.search_cmd_handler(ctx, view)
             
-            if catch_result is True:
-                # Store the caught Pokémon
-                await self.store_caught_pokemon(ctx, results, shiny, level, sprite_url, type_str, colour)
+            if catch_result is True and "pokemon_doc" in caught:
+                # Already stored by catch_handler - show the summary
+                await self.send_catch_summary(ctx, caught["pokemon_doc"], results, shiny, level, sprite_url, type_str, colour)
         
         except Exception as e:
             error_embed = discord.Embed(
@@ -194,6 +267,7 @@ class EncounterCog(commands.Cog):
         finally:
             # Always remove the user from the active catchers set
             active_catchers.discard(ctx.author.id)
+            end_command()
     
     async def search_cmd_handler(self, ctx, view):
         """Handler for search command interaction results"""
@@ -207,11 +281,10 @@ class EncounterCog(commands.Cog):
         finally:
             active_catchers.discard(ctx.author.id)
     
-    async def store_caught_pokemon(self, ctx, results, shiny, level, sprite_url, type_str, colour):
-        """Store a caught Pokémon and show summary"""
+    async def build_caught_pokemon(self, user_id, results, shiny, level):
+        """Roll nature, IVs and ability for a caught Pokémon and build its document"""
         # Get user data
-        user_id = str(ctx.author.id)
-        user_data = await get_user_data(user_id)
+        user_data = await get_user_data(user_id, fields=("partner_pokemon",))
         
         # Generate nature (with synchronize ability consideration if applicable)
         partner_nature = None
@@ -232,14 +305,7 @@ class EncounterCog(commands.Cog):
         nature = generate_nature(partner_nature, has_synchronize)
         
         # Get a unique ID for the Pokémon
-        unique_id_doc = unique_id_collection.find_one_and_update(
-            {},
-            {"$inc": {"last_id": 1}},
-            upsert=True,
-            return_document=True
-        )
-        
-        unique_id = str(unique_id_doc["last_id"]).zfill(6)
+        unique_id = await get_next_unique_id()
         
         # Generate IVs
         ivs = {
@@ -268,7 +334,7 @@ class EncounterCog(commands.Cog):
             "level": level,
             "nature": nature,
             "ivs": ivs,
-            "base_stats": results["stats"],
+            "base_stats": dict(results["stats"]),
             "final_stats": {
                 "hp": calculate_stat(results["stats"]["hp"], ivs["hp"], level, is_hp=True),
                 "attack": calculate_stat(results["stats"]["attack"], ivs["attack"], level),
@@ -280,12 +346,12 @@ class EncounterCog(commands.Cog):
             "xp": initial_xp,
             "ability": ability_name
         }
-        
-        # Insert Pokémon into collection
-        pokemon_collection.insert_one(pokemon_doc)
-        
-        # Add to user's caught Pokémon list
-        await update_user_data(user_id, {"$push": {"caught_pokemon": unique_id}})
+        return pokemon_doc
+    
+    async def send_catch_summary(self, ctx, pokemon_doc, results, shiny, level, sprite_url, type_str, colour):
+        """Show the catch summary and offer a nickname"""
+        unique_id = pokemon_doc["_id"]
+        ivs = pokemon_doc["ivs"]
         
         # Create and send the catch summary embed
         pokemon_name = results["name"].capitalize().replace('-', ' ')
@@ -300,8 +366,8 @@ class EncounterCog(commands.Cog):
         
         RESULTembed.set_thumbnail(url=sprite_url)
         RESULTembed.add_field(name="Type", value=type_str, inline=False)
-        RESULTembed.add_field(name="Ability", value=ability_name.capitalize(), inline=True)
-        RESULTembed.add_field(name="Nature", value=nature, inline=True)
+        RESULTembed.add_field(name="Ability", value=pokemon_doc["ability"].capitalize(), inline=True)
+        RESULTembed.add_field(name="Nature", value=pokemon_doc["nature"], inline=True)
         
         # Display stats
         for stat, value in pokemon_doc["final_stats"].items():
@@ -319,22 +385,12 @@ class EncounterCog(commands.Cog):
     
     def invalidate_cache(self, user_id=None):
         """Invalidate cache entries when data changes"""
-        current_time = time.time()
-        keys_to_remove = []
-        
-        for key in self.encounter_cache:
-            # If user_id is specified, invalidate all caches for that user
-            if user_id and key.startswith(f"{user_id}_"):
-                keys_to_remove.append(key)
-            
-            # Remove expired cache entries
-            elif current_time - self.encounter_cache[key]["timestamp"] > self.CACHE_TIMEOUT:
-                keys_to_remove.append(key)
+        # If user_id is specified, invalidate all caches tagged with that user
+        if user_id:
+            self.encounter_cache.invalidate_tag(user_id)
         
-        # Remove the identified keys
-        for key in keys_to_remove:
-            if key in self.encounter_cache:
-                del self.encounter_cache[key]
+        # Remove expired cache entries
+        self.encounter_cache.purge_expired()
 
 async def setup(client):
     await client.add_cog(EncounterCog(client))
\ No newline at end of file
@@ -2,14 +2,27 @@
 import discord
 import asyncio
 import time
-from discord.ext import commands
-from config import inventory_collection, user_cooldowns, config_collection, pokemon_collection
-from utils.db_utils import get_user_data, update_user_data, get_pokemon_data, update_pokemon_data
+from discord.ext import commands, tasks
+from config import user_cooldowns
+from utils.db_utils import get_user_data, update_user_data
+from utils.xp_accumulator import partner_xp, XP_FLUSH_INTERVAL
+from utils.query_stats import begin_command, end_command
 
 class MiscCog(commands.Cog):
     def __init__(self, client):
         self.client = client
         self.cooldown_seconds = 2  # Message cooldown for XP gain
+        self.flush_task = None  # Early flush started by the listener, if any
+    
+    async def cog_load(self):
+        self.xp_flush_loop.start()
+    
+    async def cog_unload(self):
+        # Guaranteed final flush so buffered XP survives a clean shutdown or reload
+        self.xp_flush_loop.stop()
+        if self.flush_task is not None:
+            await self.flush_task
+        await self.flush_partner_xp()
     
     @commands.command()
     async def ping(self, ctx):
@@ -25,7 +38,7 @@ class MiscCog(commands.Cog):
     async def balance(self, ctx):
         """Check your Pokédollar balance"""
         user_id = str(ctx.author.id)
-        user_data = await get_user_data(user_id)
+        user_data = await get_user_data(user_id, fields=("Pokedollars",))
         
         if not user_data:
             await ctx.send("You have not begun your adventure! Start by using the `%start` command.")
@@ -49,7 +62,7 @@ class MiscCog(commands.Cog):
         user_id = str(ctx.author.id)
         
         # Get user data
-        user_data = await get_user_data(user_id)
+        user_data = await get_user_data(user_id, fields=("settings",))
         
         if not user_data:
             await ctx.send("You haven't started your adventure yet. Use `%start` to begin!")
@@ -65,7 +78,7 @@ class MiscCog(commands.Cog):
                     }
                 }}
             )
-            user_data = await get_user_data(user_id)
+            user_data = await get_user_data(user_id, fields=("settings",))
         
         # If no setting specified, show current settings
         if not setting:
@@ -147,100 +160,210 @@ class MiscCog(commands.Cog):
         user_cooldowns[user_id] = current_time
         
         # Get user data and check for partner Pokémon
-        user_data = await get_user_data(user_id)
+        begin_command("on_message")
+        try:
+            user_data = await get_user_data(user_id, fields=("partner_pokemon",))
+        finally:
+            end_command()
         if not user_data or "partner_pokemon" not in user_data or not user_data["partner_pokemon"]:
             return
         
-        partner_id = user_data["partner_pokemon"]
-        partner_pokemon = await get_pokemon_data(partner_id)
+        # Award XP - buffered in memory and written back in batches
+        xp_reward = 10
+        flush_due = partner_xp.add(
+            user_data["partner_pokemon"],
+            xp_reward,
+            channel=message.channel,
+            mention=message.author.mention
+        )
+        
+        # Keep a reference so the task isn't garbage collected mid-flush
+        if flush_due and (self.flush_task is None or self.flush_task.done()):
+            self.flush_task = asyncio.create_task(self.flush_partner_xp())
+    
+    @tasks.loop(seconds=XP_FLUSH_INTERVAL)
+    async def xp_flush_loop(self):
+        """Periodically write buffered partner XP to the database"""
+        await self.flush_partner_xp()
+    
+    async def flush_partner_xp(self):
+        """Flush buffered XP and announce any level ups"""
+        level_ups = await partner_xp.flush()
+        
+        for event in level_ups:
+            try:
+                await self.announce_level_up(event)
+            except Exception as e:
+                print(f"Error announcing level up: {e}")
+    
+    async def announce_level_up(self, event):
+        """Send the level up embed for a partner Pokémon"""
+        partner_pokemon = event["pokemon"]
+        new_level = event["new_level"]
+        channel = event["channel"]
         
-        if not partner_pokemon:
+        if channel is None:
             return
         
-        # Award XP
-        xp_reward = 10
-        new_xp = partner_pokemon.get("xp", 0) + xp_reward
+        # Get Pokémon name for level up message
+        name = partner_pokemon["name"].capitalize().replace('-', ' ')
+        nickname = partner_pokemon.get("nickname")
+        display_name = f"{nickname} ({name})" if nickname else name
         
-        # Update the Pokémon's XP
-        await update_pokemon_data(
-            partner_id,
-            {"$set": {"xp": new_xp}}
+        if partner_pokemon.get("shiny"):
+            display_name += " ⭐"
+        
+        # Send level up message
+        level_up_embed = discord.Embed(
+            title="🎉 Level Up!",
+            description=f"{event['mention']}'s partner **{display_name}** leveled up to level {new_level}!",
+            color=discord.Color.green()
         )
         
-        # Check for level up
-        level = partner_pokemon["level"]
-        next_level_xp = int((6/5) * ((level + 1)**3) - (15 * ((level + 1)**2)) + (100 * (level + 1)) - 140)
+        # Try to get sprite URL
+        from utils.pokemon_utils import search_pokemon_by_id, get_best_sprite_url
         
-        if new_xp >= next_level_xp:
-            # Level up the Pokémon
-            excess_xp = new_xp - next_level_xp
-            
-            # Update the Pokémon's level and set XP to excess
-            await update_pokemon_data(
-                partner_id,
-                {
-                    "$inc": {"level": 1},
-                    "$set": {"xp": excess_xp}
-                }
+        pokemon_data = search_pokemon_by_id(partner_pokemon["pokedex_id"])
+        if pokemon_data:
+            sprite_url = await get_best_sprite_url(pokemon_data, partner_pokemon.get("shiny", False))
+            if sprite_url:
+                level_up_embed.set_thumbnail(url=sprite_url)
+        
+        await channel.send(embed=level_up_embed)
+    
+    @commands.command(aliases=["reloaddex"])
+    @commands.is_owner()
+    async def reloadcatalog(self, ctx):
+        """Reload the in-memory species catalog (owner only)"""
+        from utils.species_catalog import reload_catalog
+        from utils.encounter_sampler import build_wild_sampler
+
+        try:
+            catalog = await asyncio.to_thread(reload_catalog)
+        except Exception as e:
+            await ctx.send(f"Failed to reload the species catalog: {e}")
+            return
+
+        # Rebuild anything derived from the previous catalog
+        encounter_cog = self.client.get_cog("EncounterCog")
+        if encounter_cog:
+            encounter_cog.sampler = build_wild_sampler()
+            encounter_cog.prefetcher.clear()
+
+        pokedex_cog = self.client.get_cog("PokedexCog")
+        if pokedex_cog:
+            pokedex_cog.invalidate_cache("all")
+
+        embed = discord.Embed(
+            title="📚 Species Catalog Reloaded",
+            description=f"Loaded **{len(catalog)}** species from `{catalog.source}` (version {catalog.version})",
+            color=discord.Color.green()
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(aliases=["reloademojis"])
+    @commands.is_owner()
+    async def reloadconfig(self, ctx):
+        """Reload ball/shop config and emojis from the database (owner only)"""
+        from utils.config_snapshot import refresh_config_snapshot
+
+        try:
+            snapshot = await refresh_config_snapshot()
+        except Exception as e:
+            await ctx.send(f"Failed to reload the config snapshot: {e}")
+            return
+
+        embed = discord.Embed(
+            title="⚙️ Config Reloaded",
+            description=f"Loaded **{len(snapshot.config)}** config documents and **{len(snapshot.emojis)}** emojis "
+                        f"(version {snapshot.version})",
+            color=discord.Color.green()
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command()
+    @commands.is_owner()
+    async def cachestats(self, ctx):
+        """Show hit/miss/eviction counters for every cache (owner only)"""
+        from utils.cache import all_cache_stats
+
+        embed = discord.Embed(title="🗄️ Cache Statistics", color=discord.Color.blue())
+        for stats in all_cache_stats():
+            embed.add_field(
+                name=stats["name"],
+                value=f"Size: {stats['size']}/{stats['max_size']}\n"
+                      f"Hit rate: {stats['hit_rate'] * 100:.1f}% ({stats['hits']}/{stats['hits'] + stats['misses']})\n"
+                      f"Evicted: {stats['evictions']} | Expired: {stats['expirations']}",
+                inline=True
             )
-            
-            # Recalculate stats after level up
-            from utils.pokemon_utils import calculate_stat
-            
-            # Get the Pokémon's base stats and IVs
-            base_stats = partner_pokemon["base_stats"]
-            ivs = partner_pokemon["ivs"]
-            new_level = level + 1
-            
-            # Calculate new final stats
-            new_final_stats = {
-                "hp": calculate_stat(base_stats["hp"], ivs["hp"], new_level, is_hp=True),
-                "attack": calculate_stat(base_stats["attack"], ivs["attack"], new_level),
-                "defense": calculate_stat(base_stats["defense"], ivs["defense"], new_level),
-                "special-attack": calculate_stat(base_stats["special-attack"], ivs["special-attack"], new_level),
-                "special-defense": calculate_stat(base_stats["special-defense"], ivs["special-defense"], new_level),
-                "speed": calculate_stat(base_stats["speed"], ivs["speed"], new_level)
-            }
-            
-            # Update the Pokémon's final stats
-            await update_pokemon_data(
-                partner_id,
-                {"$set": {"final_stats": new_final_stats}}
+
+        from utils.render_pool import render_pool
+        pool = render_pool.stats()
+        embed.add_field(
+            name="render_pool",
+            value=f"Workers: {pool['workers']} | In flight: {pool['in_flight']}/{pool['max_in_flight']}\n"
+                  f"Completed: {pool['completed']} | Rejected: {pool['rejected']} | Failed: {pool['failed']} "
+                  f"| Restarts: {pool['restarts']}",
+            inline=False
+        )
+
+        from utils.render_cache import render_cache
+        renders = render_cache.stats()
+        embed.add_field(
+            name="render_cache",
+            value=f"Memory: {renders['memory_entries']} ({renders['memory_bytes'] / 1048576:.1f} MB) | "
+                  f"Disk: {renders['disk_entries']} ({renders['disk_bytes'] / 1048576:.1f} MB)\n"
+                  f"Hit rate: {renders['hit_rate'] * 100:.1f}% (memory {renders['memory_hits']}, "
+                  f"disk {renders['disk_hits']}, miss {renders['misses']}) | Evicted: {renders['evictions']}",
+            inline=False
+        )
+
+        encounter_cog = self.client.get_cog("EncounterCog")
+        if encounter_cog:
+            prefetch = encounter_cog.prefetcher.stats()
+            queued = ", ".join(f"{key}: {depth}/{prefetch['targets'].get(key, 0)}" for key, depth in prefetch["queued"].items())
+            embed.add_field(
+                name="encounter_prefetch",
+                value=f"Hit rate: {prefetch['hit_rate'] * 100:.1f}% ({prefetch['hits']}/{prefetch['hits'] + prefetch['misses']}) | "
+                      f"Dropped: {prefetch['dropped']}\nQueued: {queued or 'none'}",
+                inline=False
             )
-            
-            # Get Pokémon name for level up message
-            name = partner_pokemon["name"].capitalize().replace('-', ' ')
-            nickname = partner_pokemon.get("nickname")
-            display_name = f"{nickname} ({name})" if nickname else name
-            
-            if partner_pokemon.get("shiny"):
-                display_name += " ⭐"
-            
-            # Send level up message
-            level_up_embed = discord.Embed(
-                title="🎉 Level Up!",
-                description=f"{message.author.mention}'s partner **{display_name}** leveled up to level {new_level}!",
-                color=discord.Color.green()
+
+        from utils.encounter_render import encode_stats
+        encodes = encode_stats.stats()
+        if encodes:
+            embed.add_field(
+                name="encounter_encoding",
+                value="\n".join(
+                    f"{fmt}: chosen {entry['chosen']}/{entry['attempts']} | "
+                    f"{entry['avg_encode_ms']:.0f}ms | {entry['avg_kb']:.0f} KB avg"
+                    for fmt, entry in sorted(encodes.items())
+                ),
+                inline=False
             )
-            
-            # Try to get sprite URL
-            from utils.pokemon_utils import search_pokemon_by_id, get_best_sprite_url
-            
-            pokemon_data = search_pokemon_by_id(partner_pokemon["pokedex_id"])
-            if pokemon_data:
-                sprite_url = await get_best_sprite_url(pokemon_data, partner_pokemon.get("shiny", False))
-                if sprite_url:
-                    level_up_embed.set_thumbnail(url=sprite_url)
-            
-            await message.channel.send(embed=level_up_embed)
-    
+
+        from utils.query_stats import stats as query_stats
+        reads = query_stats()
+        if reads:
+            embed.add_field(
+                name="db_reads_per_command",
+                value="\n".join(
+                    f"{command_name}: {entry['bytes_per_call']:.0f} B over {entry['reads_per_call']:.1f} reads "
+                    f"({entry['invocations']} calls)"
+                    for command_name, entry in list(reads.items())[:10]
+                ),
+                inline=False
+            )
+
+        await ctx.send(embed=embed)
+
     @commands.command()
     async def cooldowns(self, ctx):
         """View your active cooldowns"""
         user_id = str(ctx.author.id)
         current_time = time.time()
         
-        user_data = await get_user_data(user_id)
+        user_data = await get_user_data(user_id, fields=("cooldowns",))
         if not user_data:
             await ctx.send("You have not begun your adventure! Start by using the `%start` command.")
             return
@@ -1,17 +1,29 @@
 # cogs/pokedex.py
 import discord
-import time
 import asyncio
 from discord.ext import commands
-from config import db, move_collection
+from utils.db_utils import get_move_data, get_ability_data
 from utils.pokemon_utils import get_best_sprite_url, get_type_colour, get_next_evolution
+from utils.pokemon_utils import search_pokemon_by_id, search_pokemon_by_name
+from utils.species_catalog import get_catalog
+from utils.type_chart import TYPE_COLOURS, defensive_matchups, is_type
+from utils.cache import TTLCache
+
+# Embed field titles for each damage multiplier in %type
+MULTIPLIER_LABELS = {
+    4.0: "Very weak to (4x damage)",
+    2.0: "Weak to (2x damage)",
+    0.5: "Resistant to (0.5x damage)",
+    0.25: "Very resistant to (0.25x damage)",
+    0.0: "Immune to (0x damage)"
+}
 
 class PokedexCog(commands.Cog):
     def __init__(self, client):
         self.client = client
-        self.pokedex_cache = {}
-        self.move_cache = {}
         self.CACHE_TIMEOUT = 1800  # 30 minutes cache timeout (longer than other caches since data rarely changes)
+        self.pokedex_cache = TTLCache("pokedex_embeds", max_size=2000, ttl=self.CACHE_TIMEOUT)
+        self.move_cache = TTLCache("move_embeds", max_size=1000, ttl=self.CACHE_TIMEOUT)
     
     @commands.command(aliases=["pd", "dex"])
     async def pokedex(self, ctx, *, pokemon=None):
@@ -38,21 +50,21 @@ class PokedexCog(commands.Cog):
         
         # Check cache first
         cache_key = f"pokedex_{pokemon.lower() if isinstance(pokemon, str) else pokemon}"
-        current_time = time.time()
+        cached_embed = self.pokedex_cache.get(cache_key)
         
-        if cache_key in self.pokedex_cache and current_time - self.pokedex_cache[cache_key]["timestamp"] < self.CACHE_TIMEOUT:
-            await ctx.send(embed=self.pokedex_cache[cache_key]["embed"])
+        if cached_embed is not None:
+            await ctx.send(embed=cached_embed)
             return
         
         try:
             # Search by ID if input is a number
             if isinstance(pokemon, str) and pokemon.isdigit():
                 pokemon = int(pokemon)
-                results = db.pokemon.find_one({"id": pokemon})
+                results = search_pokemon_by_id(pokemon)
             else:
                 # Search by name
                 normalized_name = str(pokemon).lower().replace(' ', '-')
-                results = db.pokemon.find_one({"name": normalized_name})
+                results = search_pokemon_by_name(normalized_name)
             
             if not results:
                 error_embed = discord.Embed(
@@ -66,11 +78,8 @@ class PokedexCog(commands.Cog):
             # Create a detailed embed with all available information
             embed = await self.create_pokedex_embed(results, ctx.author)
             
-            # Cache the embed
-            self.pokedex_cache[cache_key] = {
-                "embed": embed,
-                "timestamp": current_time
-            }
+            # Cache the embed, tagged by species name so it can be invalidated
+            self.pokedex_cache.set(cache_key, embed, tags=(results["name"],))
             
             await ctx.send(embed=embed)
             
@@ -202,10 +211,10 @@ class PokedexCog(commands.Cog):
         
         # Check cache first
         cache_key = f"move_{move_name.lower()}"
-        current_time = time.time()
+        cached_embed = self.move_cache.get(cache_key)
         
-        if cache_key in self.move_cache and current_time - self.move_cache[cache_key]["timestamp"] < self.CACHE_TIMEOUT:
-            await ctx.send(embed=self.move_cache[cache_key]["embed"])
+        if cached_embed is not None:
+            await ctx.send(embed=cached_embed)
             return
         
         try:
@@ -213,7 +222,7 @@ class PokedexCog(commands.Cog):
             normalized_move = move_name.lower().replace(' ', '-')
             
             # Query MongoDB for the move
-            results = move_collection.find_one({"name": normalized_move})
+            results = await get_move_data(normalized_move)
             
             if not results:
                 error_embed = discord.Embed(
@@ -272,10 +281,7 @@ class PokedexCog(commands.Cog):
             embed.set_footer(text=f"Move data • Requested by {ctx.author.name}")
             
             # Cache the embed
-            self.move_cache[cache_key] = {
-                "embed": embed,
-                "timestamp": current_time
-            }
+            self.move_cache.set(cache_key, embed, tags=(normalized_move,))
             
             await ctx.send(embed=embed)
             
@@ -310,7 +316,7 @@ class PokedexCog(commands.Cog):
             normalized_ability = ability_name.lower().replace(' ', '-')
             
             # Query MongoDB for the ability
-            ability_data = db.abilities.find_one({"name": normalized_ability})
+            ability_data = await get_ability_data(normalized_ability)
             
             if not ability_data:
                 error_embed = discord.Embed(
@@ -338,10 +344,10 @@ class PokedexCog(commands.Cog):
                 embed.add_field(name="Effect Details", value=effect, inline=False)
             
             # Find Pokémon with this ability
-            pokemon_with_ability = list(db.pokemon.find(
-                {"abilities.name": normalized_ability},
-                {"id": 1, "name": 1, "abilities": 1}
-            ).limit(15))  # Limit to prevent too large embeds
+            pokemon_with_ability = [
+                species for species in get_catalog()
+                if any(a.get("name") == normalized_ability for a in species.get("abilities", []))
+            ][:15]  # Limit to prevent too large embeds
             
             if pokemon_with_ability:
                 pokemon_list = []
@@ -393,180 +399,50 @@ class PokedexCog(commands.Cog):
             )
             embed.add_field(
                 name="How to Use",
-                value="`%type [name]`\n" +
-                      "Example: `%type fire`",
+                value="`%type [name] [second type]`\n" +
+                      "Example: `%type fire` or `%type fire flying`",
                 inline=False
             )
             await ctx.send(embed=embed)
             return
         
         try:
-            # Normalize type name
-            normalized_type = type_name.lower()
-            
-            # Type effectiveness data
-            type_effectiveness = {
-                "normal": {
-                    "weak_to": ["fighting"],
-                    "resistant_to": [],
-                    "immune_to": ["ghost"],
-                    "color": 0xA8A77A
-                },
-                "fire": {
-                    "weak_to": ["water", "ground", "rock"],
-                    "resistant_to": ["fire", "grass", "ice", "bug", "steel", "fairy"],
-                    "immune_to": [],
-                    "color": 0xEE8130
-                },
-                "water": {
-                    "weak_to": ["electric", "grass"],
-                    "resistant_to": ["fire", "water", "ice", "steel"],
-                    "immune_to": [],
-                    "color": 0x6390F0
-                },
-                "electric": {
-                    "weak_to": ["ground"],
-                    "resistant_to": ["electric", "flying", "steel"],
-                    "immune_to": [],
-                    "color": 0xF7D02C
-                },
-                "grass": {
-                    "weak_to": ["fire", "ice", "poison", "flying", "bug"],
-                    "resistant_to": ["water", "electric", "grass", "ground"],
-                    "immune_to": [],
-                    "color": 0x7AC74C
-                },
-                "ice": {
-                    "weak_to": ["fire", "fighting", "rock", "steel"],
-                    "resistant_to": ["ice"],
-                    "immune_to": [],
-                    "color": 0x96D9D6
-                },
-                "fighting": {
-                    "weak_to": ["flying", "psychic", "fairy"],
-                    "resistant_to": ["bug", "rock", "dark"],
-                    "immune_to": [],
-                    "color": 0xC22E28
-                },
-                "poison": {
-                    "weak_to": ["ground", "psychic"],
-                    "resistant_to": ["grass", "fighting", "poison", "bug", "fairy"],
-                    "immune_to": [],
-                    "color": 0xA33EA1
-                },
-                "ground": {
-                    "weak_to": ["water", "grass", "ice"],
-                    "resistant_to": ["poison", "rock"],
-                    "immune_to": ["electric"],
-                    "color": 0xE2BF65
-                },
-                "flying": {
-                    "weak_to": ["electric", "ice", "rock"],
-                    "resistant_to": ["grass", "fighting", "bug"],
-                    "immune_to": ["ground"],
-                    "color": 0xA98FF3
-                },
-                "psychic": {
-                    "weak_to": ["bug", "ghost", "dark"],
-                    "resistant_to": ["fighting", "psychic"],
-                    "immune_to": [],
-                    "color": 0xF95587
-                },
-                "bug": {
-                    "weak_to": ["fire", "flying", "rock"],
-                    "resistant_to": ["grass", "fighting", "ground"],
-                    "immune_to": [],
-                    "color": 0xA6B91A
-                },
-                "rock": {
-                    "weak_to": ["water", "grass", "fighting", "ground", "steel"],
-                    "resistant_to": ["normal", "fire", "poison", "flying"],
-                    "immune_to": [],
-                    "color": 0xB6A136
-                },
-                "ghost": {
-                    "weak_to": ["ghost", "dark"],
-                    "resistant_to": ["poison", "bug"],
-                    "immune_to": ["normal", "fighting"],
-                    "color": 0x735797
-                },
-                "dragon": {
-                    "weak_to": ["ice", "dragon", "fairy"],
-                    "resistant_to": ["fire", "water", "electric", "grass"],
-                    "immune_to": [],
-                    "color": 0x6F35FC
-                },
-                "dark": {
-                    "weak_to": ["fighting", "bug", "fairy"],
-                    "resistant_to": ["ghost", "dark"],
-                    "immune_to": ["psychic"],
-                    "color": 0x705746
-                },
-                "steel": {
-                    "weak_to": ["fire", "fighting", "ground"],
-                    "resistant_to": ["normal", "grass", "ice", "flying", "psychic", "bug", "rock", "dragon", "steel", "fairy"],
-                    "immune_to": ["poison"],
-                    "color": 0xB7B7CE
-                },
-                "fairy": {
-                    "weak_to": ["poison", "steel"],
-                    "resistant_to": ["fighting", "bug", "dark"],
-                    "immune_to": ["dragon"],
-                    "color": 0xD685AD
-                }
-            }
+            # Normalize type names - "fire flying" or "fire/flying" asks about a dual type;
+            # a repeated type ("fire fire") is just that single type
+            type_names = list(dict.fromkeys(type_name.lower().replace("/", " ").replace(",", " ").split()))
             
-            if normalized_type not in type_effectiveness:
+            invalid = [t for t in type_names if not is_type(t)]
+            if invalid or not 1 <= len(type_names) <= 2:
                 error_embed = discord.Embed(
                     title="Type Not Found",
-                    description=f"'{type_name}' is not a valid Pokémon type. Please check the spelling.",
+                    description=f"'{type_name}' is not a valid Pokémon type (or pair of types). Please check the spelling.",
                     color=discord.Color.red()
                 )
                 await ctx.send(embed=error_embed)
                 return
             
-            type_data = type_effectiveness[normalized_type]
-            
             # Create embed
             embed = discord.Embed(
-                title=f"{normalized_type.capitalize()} Type",
-                color=type_data["color"]
+                title=f"{'/'.join(t.capitalize() for t in type_names)} Type",
+                color=TYPE_COLOURS[type_names[0]]
             )
             
-            # Add type effectiveness
-            if type_data["weak_to"]:
+            # Add type effectiveness (precomputed matrix, combined for dual types)
+            for multiplier, attacking_types in defensive_matchups(type_names).items():
                 embed.add_field(
-                    name="Weak to (2x damage)",
-                    value=", ".join([t.capitalize() for t in type_data["weak_to"]]),
+                    name=MULTIPLIER_LABELS[multiplier],
+                    value=", ".join([t.capitalize() for t in attacking_types]),
                     inline=False
                 )
             
-            if type_data["resistant_to"]:
-                embed.add_field(
-                    name="Resistant to (0.5x damage)",
-                    value=", ".join([t.capitalize() for t in type_data["resistant_to"]]),
-                    inline=False
-                )
-            
-            if type_data["immune_to"]:
-                embed.add_field(
-                    name="Immune to (0x damage)",
-                    value=", ".join([t.capitalize() for t in type_data["immune_to"]]),
-                    inline=False
-                )
-            
-            # Count Pokémon of this type
-            pokemon_count = db.pokemon.count_documents({"types": normalized_type})
+            # Count Pokémon of this type (from the in-memory catalog)
+            matching_species = get_catalog().get_by_types(type_names)
+            pokemon_count = len(matching_species)
             embed.add_field(name="Pokémon Count", value=f"{pokemon_count} Pokémon", inline=True)
             
             # Get some example Pokémon
-            sample_pokemon = list(db.pokemon.find(
-                {"types": normalized_type},
-                {"name": 1, "_id": 0}
-            ).limit(10))
-            
-            if sample_pokemon:
-                examples = ", ".join([p["name"].capitalize() for p in sample_pokemon])
+            if matching_species:
+                examples = ", ".join([p["name"].capitalize() for p in matching_species[:10]])
                 if pokemon_count > 10:
                     examples += f", and {pokemon_count - 10} more"
                 embed.add_field(name="Examples", value=examples, inline=False)
@@ -586,30 +462,15 @@ class PokedexCog(commands.Cog):
     
     def invalidate_cache(self, entity_type=None, entity_name=None):
         """Invalidate cache entries"""
-        current_time = time.time()
-        
         # Remove expired cache entries
-        expired_pokedex = [key for key, data in self.pokedex_cache.items() 
-                          if current_time - data["timestamp"] > self.CACHE_TIMEOUT]
-        for key in expired_pokedex:
-            if key in self.pokedex_cache:
-                del self.pokedex_cache[key]
-        
-        expired_moves = [key for key, data in self.move_cache.items() 
-                        if current_time - data["timestamp"] > self.CACHE_TIMEOUT]
-        for key in expired_moves:
-            if key in self.move_cache:
-                del self.move_cache[key]
+        self.pokedex_cache.purge_expired()
+        self.move_cache.purge_expired()
         
         # Invalidate specific cache if requested
         if entity_type == "pokemon" and entity_name:
-            for key in list(self.pokedex_cache.keys()):
-                if entity_name.lower() in key.lower():
-                    del self.pokedex_cache[key]
+            self.pokedex_cache.invalidate_tag(entity_name.lower().replace(' ', '-'))
         elif entity_type == "move" and entity_name:
-            for key in list(self.move_cache.keys()):
-                if entity_name.lower() in key.lower():
-                    del self.move_cache[key]
+            self.move_cache.invalidate_tag(entity_name.lower().replace(' ', '-'))
         elif entity_type == "all":
             self.pokedex_cache.clear()
             self.move_cache.clear()
@@ -3,8 +3,8 @@ import discord
 import asyncio
 import time
 from discord.ext import commands
-from config import config_collection
-from utils.db_utils import get_user_data, update_user_data
+from utils.db_utils import get_user_data, update_user_data, BALL_FIELDS
+from utils.config_snapshot import get_config
 from utils.encounter_utils import get_emoji
 
 class ShopItemSelect(discord.ui.Select):
@@ -105,19 +105,8 @@ class ShopView(discord.ui.View):
     
     async def initialize(self):
         """Fetch shop data and initialize selectors"""
-        # Get shop data from database or cache
-        cache_key = "shop_data"
-        current_time = time.time()
-        
-        # Check if shop data is cached by the cog
-        if hasattr(self.client.get_cog("ShopCog"), "shop_cache"):
-            shop_cache = self.client.get_cog("ShopCog").shop_cache
-            if cache_key in shop_cache and current_time - shop_cache[cache_key]["timestamp"] < 300:
-                self.shop_data = shop_cache[cache_key]["data"]
-            else:
-                self.shop_data = await self.fetch_shop_data()
-        else:
-            self.shop_data = await self.fetch_shop_data()
+        # Shop prices come from the in-memory config snapshot
+        self.shop_data = await self.fetch_shop_data()
 
         if not self.shop_data:
             self.shop_data = {
@@ -150,7 +139,7 @@ class ShopView(discord.ui.View):
     
     async def fetch_shop_data(self):
         """Fetch shop data from database"""
-        shop_data = config_collection.find_one({"_id": "shop"})
+        shop_data = await get_config("shop")
         if not shop_data:
             # Fallback to default prices
             shop_data = {
@@ -160,14 +149,6 @@ class ShopView(discord.ui.View):
                 "Masterball": 50000
             }
         
-        # Cache the shop data in the cog
-        shop_cog = self.client.get_cog("ShopCog")
-        if shop_cog and hasattr(shop_cog, "shop_cache"):
-            shop_cog.shop_cache["shop_data"] = {
-                "data": shop_data,
-                "timestamp": time.time()
-            }
-        
         return shop_data
     
     async def item_callback(self, interaction):
@@ -364,17 +345,6 @@ class ShopView(discord.ui.View):
 class ShopCog(commands.Cog):
     def __init__(self, client):
         self.client = client
-        self.shop_cache = {
-            "shop_data": {
-                "data": {
-                    "Pokeball": 200,
-                    "Greatball": 600,
-                    "Ultraball": 1200,
-                    "Masterball": 50000
-                },
-                "timestamp": time.time()
-            }
-        }
         self.CACHE_TIMEOUT = 300  # 5 minutes cache timeout
     
     @commands.command(aliases=["pm", "mart"])
@@ -384,7 +354,7 @@ class ShopCog(commands.Cog):
         try:
             # Get user data
             user_id = str(ctx.author.id)
-            user_data = await get_user_data(user_id)
+            user_data = await get_user_data(user_id, fields=("Pokedollars",) + BALL_FIELDS)
             
             if not user_data:
                 await ctx.send("You have not begun your adventure! Start by using the `%start` command.")
@@ -424,7 +394,7 @@ class ShopCog(commands.Cog):
     async def claim_daily(self, ctx):
         """Claim your daily Pokédollars reward"""
         user_id = str(ctx.author.id)
-        user_data = await get_user_data(user_id)
+        user_data = await get_user_data(user_id, fields=("last_daily_claim", "daily_streak"))
         
         if not user_data:
             await ctx.send("You have not begun your adventure! Start by using the `%start` command.")
@@ -500,7 +470,7 @@ class ShopCog(commands.Cog):
         )
         
         # Get updated balance
-        updated_data = await get_user_data(user_id)
+        updated_data = await get_user_data(user_id, fields=("Pokedollars",))
         new_balance = updated_data.get("Pokedollars", 0)
         
         reward_embed.set_footer(text=f"Your new balance: {new_balance:,} Pokédollars")
@@ -1,19 +1,21 @@
 # cogs/trainer.py
 import discord
 import asyncio
-import time
 import random
 from discord.ext import commands
-from config import inventory_collection, pokemon_collection, unique_id_collection
-from utils.db_utils import get_user_data, update_user_data, get_pokemon_data
+from utils.db_utils import get_user_data, update_user_data, get_pokemon_data, BALL_FIELDS
+from utils.db_utils import insert_user_data, insert_pokemon_data, insert_box_summary
+from utils.box_summary import build_box_summary
+from utils.id_allocator import get_next_unique_id
 from utils.pokemon_utils import get_best_sprite_url, generate_nature, generate_iv, calculate_stat, search_pokemon_by_id
 from utils.pokemon_utils import generate_ability, calculate_min_xp_for_level, prompt_for_nickname
+from utils.cache import TTLCache
 
 class TrainerCog(commands.Cog):
     def __init__(self, client):
         self.client = client
-        self.trainer_cache = {}
         self.CACHE_TIMEOUT = 300  # 5 minutes
+        self.trainer_cache = TTLCache("trainer_profiles", max_size=1000, ttl=self.CACHE_TIMEOUT)
         
         # Dictionary of starter Pokémon by generation
         self.starter_pokemon_generations = {
@@ -35,7 +37,7 @@ class TrainerCog(commands.Cog):
         
         try:
             # Check if user already exists
-            user_data = await get_user_data(user_id)
+            user_data = await get_user_data(user_id, fields=("_id",))
             
             if user_data:
                 await ctx.send("You have already begun your adventure! Start searching for wild Pokémon using `%search`")
@@ -55,7 +57,7 @@ class TrainerCog(commands.Cog):
                 "Ultraballs": 0,
                 "Masterballs": 0,
                 "Pokedollars": 5000,
-                "caught_pokemon": [],
+                "caught_count": 0,
                 "partner_pokemon": None,
                 "trainer_sprite": trainer_sprite,
                 "settings": {
@@ -84,14 +86,7 @@ class TrainerCog(commands.Cog):
             is_shiny = random.choices([True, False], weights=[1, 4095], k=1)[0]
             
             # Get a unique ID
-            unique_id_doc = unique_id_collection.find_one_and_update(
-                {},
-                {"$inc": {"last_id": 1}},
-                upsert=True,
-                return_document=True
-            )
-            
-            unique_id = str(unique_id_doc["last_id"]).zfill(6)
+            unique_id = await get_next_unique_id()
             
             # Generate IVs
             ivs = {
@@ -117,7 +112,7 @@ class TrainerCog(commands.Cog):
                 "level": 5,
                 "nature": nature,
                 "ivs": ivs,
-                "base_stats": full_pokemon_data["stats"],
+                "base_stats": dict(full_pokemon_data["stats"]),
                 "final_stats": {
                     "hp": calculate_stat(full_pokemon_data["stats"]["hp"], ivs["hp"], 5, is_hp=True),
                     "attack": calculate_stat(full_pokemon_data["stats"]["attack"], ivs["attack"], 5),
@@ -127,14 +122,17 @@ class TrainerCog(commands.Cog):
                     "speed": calculate_stat(full_pokemon_data["stats"]["speed"], ivs["speed"], 5)
                 },
                 "xp": starter_initial_xp,
-                "ability": starter_ability_name
+                "ability": starter_ability_name,
+                "owner_id": user_id,
+                "ordinal": 1
             }
             
             # Insert the Pokémon and update user data
-            pokemon_collection.insert_one(pokemon_doc)
-            user_data["caught_pokemon"].append(unique_id)
+            await insert_pokemon_data(pokemon_doc)
+            user_data["caught_count"] = 1
             user_data["partner_pokemon"] = unique_id
-            inventory_collection.insert_one(user_data)
+            await insert_user_data(user_data)
+            await insert_box_summary(build_box_summary(pokemon_doc, user_id, pokemon_doc["ordinal"]))
             
             # Create and send the starter summary embed
             starter_embed = await self.create_starter_summary_embed(ctx, chosen_starter, full_pokemon_data, unique_id, is_shiny)
@@ -165,14 +163,14 @@ class TrainerCog(commands.Cog):
         try:
             # Check cache first
             cache_key = f"profile_{user_id}"
-            current_time = time.time()
+            cached_embed = self.trainer_cache.get(cache_key)
             
-            if cache_key in self.trainer_cache and current_time - self.trainer_cache[cache_key]["timestamp"] < self.CACHE_TIMEOUT:
-                await ctx.send(embed=self.trainer_cache[cache_key]["embed"])
+            if cached_embed is not None:
+                await ctx.send(embed=cached_embed)
                 return
             
             # Fetch user data
-            user_data = await get_user_data(user_id)
+            user_data = await get_user_data(user_id, fields=("Pokedollars", "caught_count", "trainer_sprite", "partner_pokemon", "settings") + BALL_FIELDS)
             
             if not user_data:
                 await ctx.send(f"{user.name} has not begun their adventure yet!")
@@ -180,7 +178,7 @@ class TrainerCog(commands.Cog):
             
             # Get trainer info
             pokedollars = user_data.get("Pokedollars", 0)
-            caught_pokemon = user_data.get("caught_pokemon", [])
+            caught_count = user_data.get("caught_count", 0)
             trainer_sprite = user_data.get("trainer_sprite", "red")  # Default if not set
             
             # Get partner Pokémon info
@@ -215,7 +213,7 @@ class TrainerCog(commands.Cog):
             
             # Add user stats
             embed.add_field(name="💰 Balance", value=f"{pokedollars:,} Pokedollars", inline=True)
-            embed.add_field(name="🏆 Pokémon Caught", value=f"{len(caught_pokemon)}", inline=True)
+            embed.add_field(name="🏆 Pokémon Caught", value=f"{caught_count}", inline=True)
             embed.add_field(name="🤝 Partner Pokémon", value=partner_info, inline=False)
             
             # Add partner sprite if available
@@ -240,10 +238,7 @@ class TrainerCog(commands.Cog):
             embed.set_footer(text="Use %box to view your Pokémon | %changeavatar to change avatar")
             
             # Cache the profile embed
-            self.trainer_cache[cache_key] = {
-                "embed": embed,
-                "timestamp": current_time
-            }
+            self.trainer_cache.set(cache_key, embed)
             
             await ctx.send(embed=embed)
             
@@ -262,7 +257,7 @@ class TrainerCog(commands.Cog):
         
         try:
             # Check if user exists
-            user_data = await get_user_data(user_id)
+            user_data = await get_user_data(user_id, fields=("trainer_sprite",))
             
             if not user_data:
                 await ctx.send("You have not begun your adventure! Start by using the `%start` command.")
@@ -284,8 +279,7 @@ class TrainerCog(commands.Cog):
             )
             
             # Invalidate cached profile
-            if f"profile_{user_id}" in self.trainer_cache:
-                del self.trainer_cache[f"profile_{user_id}"]
+            self.trainer_cache.invalidate(f"profile_{user_id}")
             
             # Confirmation message with new sprite
             embed = discord.Embed(
@@ -857,23 +851,12 @@ class TrainerCog(commands.Cog):
     
     def invalidate_cache(self, user_id=None):
         """Invalidate cache entries when data changes"""
-        current_time = time.time()
-        
         if user_id:
             # Invalidate specific user's cache
-            cache_key = f"profile_{user_id}"
-            if cache_key in self.trainer_cache:
-                del self.trainer_cache[cache_key]
+            self.trainer_cache.invalidate(f"profile_{user_id}")
         else:
             # Clear expired cache entries
-            keys_to_remove = []
-            for key, data in self.trainer_cache.items():
-                if current_time - data["timestamp"] > self.CACHE_TIMEOUT:
-                    keys_to_remove.append(key)
-            
-            for key in keys_to_remove:
-                if key in self.trainer_cache:
-                    del self.trainer_cache[key]
+            self.trainer_cache.purge_expired()
 
 async def setup(client):
     await client.add_cog(TrainerCog(client))
\ No newline at end of file
@@ -1,10 +1,25 @@
 import os
 from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 
-# MongoDB connection
+# Async connection pool settings (override via environment)
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 5))
+MONGO_OPERATION_TIMEOUT = float(os.getenv('MONGO_OPERATION_TIMEOUT', 5))  # Seconds per operation
+
+# MongoDB connection (blocking - startup loading and scripts only)
 client = MongoClient(os.getenv('Mongo_API'))
 db = client.flapple
 
+# Async MongoDB connection used by the bot at runtime
+async_client = AsyncIOMotorClient(
+    os.getenv('Mongo_API'),
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=int(MONGO_OPERATION_TIMEOUT * 1000)
+)
+async_db = async_client.flapple
+
 # Collections
 inventory_collection = db.inventory
 pokemon_collection = db.caught_pokemon
@@ -31,7 +46,7 @@ user_cooldowns = {}
 
 # Export all variables
 __all__ = [
-    'db', 'inventory_collection', 'pokemon_collection', 'unique_id_collection',
+    'db', 'async_db', 'MONGO_OPERATION_TIMEOUT', 'inventory_collection', 'pokemon_collection', 'unique_id_collection',
     'move_collection', 'config_collection', 'starter_pokemon_generations',
     'active_catchers', 'user_cooldowns'
 ]
\ No newline at end of file
@@ -1,7 +1,13 @@
 import json
 import os
 import sys
-from pymongo import MongoClient
+import time
+import gzip
+import glob
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import MongoClient, ReplaceOne, DeleteOne
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -65,35 +71,73 @@ def initialize_emoji_collection():
         print(f"❌ Error uploading emoji data: {str(e)}")
         return False
 
-def upload_initial_data():
+# Documents per unordered bulk write when loading a collection
+UPLOAD_BATCH_SIZE = 1000
+
+def load_collection(db, collection_name, documents, key="_id", batch_size=UPLOAD_BATCH_SIZE):
+    """Stream documents into a staging collection, then swap it in with one rename
+    
+    Live bots keep reading the old collection until the rename, so a reload never
+    leaves it empty or half-written. Documents are upserted by key, so duplicates
+    in the source keep the last copy.
+    """
+    from utils.indexes import REQUIRED_INDEXES
+    staging_name = f"{collection_name}_staging"
+    staging = db[staging_name]
+    staging.drop()
+    db.create_collection(staging_name)
+    
+    # Built up front: upserts look documents up by key, and the rename carries indexes over
+    declared = [(keys, options) for name, keys, options in REQUIRED_INDEXES if name == collection_name]
+    for keys, options in declared:
+        staging.create_index(keys, **options)
+    if key != "_id" and not any(keys[0][0] == key for keys, _ in declared):
+        staging.create_index(key)
+    
+    start = time.perf_counter()
+    loaded = 0
+    batch = []
+    
+    def write_batch():
+        staging.bulk_write([ReplaceOne({key: doc[key]}, doc, upsert=True) for doc in batch], ordered=False)
+        elapsed = time.perf_counter() - start
+        print(f"   {collection_name}: {loaded} documents ({loaded / elapsed:.0f} docs/s)")
+        batch.clear()
+    
+    for doc in documents:
+        batch.append(doc)
+        loaded += 1
+        if len(batch) >= batch_size:
+            write_batch()
+    if batch:
+        write_batch()
+    
+    # Atomic swap on a single replica set; the old collection is dropped with it
+    staging.rename(collection_name, dropTarget=True)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Loaded {loaded} documents into {collection_name} in {elapsed:.2f}s ({loaded / max(elapsed, 1e-9):.0f} docs/s)")
+    return loaded
+
+def upload_initial_data(batch_size=UPLOAD_BATCH_SIZE):
     """Upload all initial data to MongoDB"""
+    from utils.json_stream import iter_json_array, iter_json_object
     db = connect_to_mongodb()
     
     # Track successful operations
     successes = 0
     
     try:
-        # Upload Pokemon data
-        with open('./fresh_data/all_pokemon_data_v3.json', 'r') as f:
-            pokemon_data = json.load(f)
-        
-        # Clear existing data first
-        db.pokemon.delete_many({})
-        result = db.pokemon.insert_many(pokemon_data)
-        print(f"✅ Uploaded {len(result.inserted_ids)} Pokémon to MongoDB")
+        # Upload Pokemon data (streamed - the file is never held in memory whole)
+        pokemon_docs = iter_json_array('./fresh_data/all_pokemon_data_v2.json')
+        load_collection(db, "pokemon", pokemon_docs, key="id", batch_size=batch_size)
         successes += 1
     except Exception as e:
         print(f"❌ Error uploading Pokémon data: {str(e)}")
     
     try:
         # Upload Move data
-        with open('./fresh_data/all_move_data.json', 'r') as f:
-            move_data = json.load(f)
-        
-        # Clear existing data first
-        db.moves.delete_many({})
-        result = db.moves.insert_many(move_data)
-        print(f"✅ Uploaded {len(result.inserted_ids)} moves to MongoDB")
+        move_docs = iter_json_array('./fresh_data/all_move_data.json')
+        load_collection(db, "moves", move_docs, key="name", batch_size=batch_size)
         successes += 1
     except Exception as e:
         print(f"❌ Error uploading move data: {str(e)}")
@@ -118,52 +162,33 @@ def upload_initial_data():
         
         # Clear existing data first
         db.unique_id.delete_one({"_id": "last_id"})
-        db.unique_id.insert_one({"_id": "last_id", "value": int(last_id)})
+        db.unique_id.insert_one({"_id": "last_id", "last_id": int(last_id)})
         print(f"✅ Uploaded last unique ID ({last_id}) to MongoDB")
         successes += 1
     except Exception as e:
         print(f"❌ Error uploading last unique ID: {str(e)}")
     
     try:
-        # Upload inventory data
-        with open('./fresh_data/Inventory.json', 'r') as f:
-            inventory_data = json.load(f)
-        
-        # Fixed: Correctly format user data for MongoDB
-        user_docs = []
-        for user_id, user_data in inventory_data["users"].items():
-            user_doc = user_data.copy()
-            user_doc["_id"] = user_id
-            user_docs.append(user_doc)
-        
-        # Clear existing data first
-        db.inventory.delete_many({})
-        if user_docs:
-            result = db.inventory.insert_many(user_docs)
-            print(f"✅ Uploaded {len(result.inserted_ids)} user inventories to MongoDB")
-        else:
+        # Upload inventory data, keyed by user ID
+        user_docs = (
+            {**user_data, "_id": user_id}
+            for user_id, user_data in iter_json_object('./fresh_data/Inventory.json', keys=("users",))
+        )
+        if not load_collection(db, "inventory", user_docs, batch_size=batch_size):
             print("⚠️ No user inventory data to upload")
         successes += 1
     except Exception as e:
         print(f"❌ Error uploading inventory data: {str(e)}")
     
     try:
-        # Upload caught Pokémon data
-        with open('./fresh_data/caught_pokemon_data.json', 'r') as f:
-            caught_pokemon_data = json.load(f)
-        
-        # Convert the JSON object into a list of documents with proper _id field
-        caught_pokemon_docs = []
-        for unique_id, pokemon in caught_pokemon_data.items():
-            pokemon_doc = pokemon.copy()
-            pokemon_doc['_id'] = unique_id
-            caught_pokemon_docs.append(pokemon_doc)
-        
-        # Clear existing data first
-        db.caught_pokemon.delete_many({})
-        if caught_pokemon_docs:
-            result = db.caught_pokemon.insert_many(caught_pokemon_docs)
-            print(f"✅ Uploaded {len(result.inserted_ids)} caught Pokémon to MongoDB")
+        # Upload caught Pokémon data, keyed by unique ID
+        caught_pokemon_docs = (
+            {**pokemon, "_id": unique_id}
+            for unique_id, pokemon in iter_json_object('./fresh_data/caught_pokemon_data.json')
+        )
+        if load_collection(db, "caught_pokemon", caught_pokemon_docs, batch_size=batch_size):
+            # Seed files may still list Pokémon on the inventory documents
+            migrate_caught_pokemon(db)
         else:
             print("⚠️ No caught Pokémon data to upload")
         successes += 1
@@ -261,7 +286,7 @@ def backup_data():
         if last_id_doc:
             backup_file = f"{backup_dir}/backup_last_unique_id.txt"
             with open(backup_file, 'w') as f:
-                f.write(str(last_id_doc['value']))
+                f.write(str(last_id_doc.get('last_id', last_id_doc.get('value'))))
             print(f"✅ Backed up last unique ID to {backup_file}")
             successes += 1
         else:
@@ -303,25 +328,459 @@ def backup_data():
     else:
         print(f"\n⚠️ Backup partially completed ({successes}/7 operations successful) to directory: {backup_dir}")
 
+# Streaming backups: one gzipped NDJSON file per collection plus manifest.json
+BACKUP_ROOT = "./backups"
+BACKUP_BATCH_SIZE = 1000
+BACKUP_WORKERS = 4
+
+def _backup_collections(db):
+    """Every collection worth backing up (load/restore leftovers and system collections skipped)"""
+    return sorted(
+        name for name in db.list_collection_names()
+        if not name.startswith("system.") and not name.endswith(("_staging", "_restore"))
+    )
+
+class _HashingWriter:
+    """File wrapper that hashes everything written, so checksums cover the bytes on disk"""
+    def __init__(self, f, digest):
+        self.f = f
+        self.digest = digest
+    
+    def write(self, data):
+        self.digest.update(data)
+        return self.f.write(data)
+    
+    def flush(self):
+        self.f.flush()
+
+def _write_ndjson(path, documents):
+    """Write documents as gzipped Extended JSON lines; returns (count, sha256 of the file)"""
+    from bson import json_util
+    count = 0
+    digest = hashlib.sha256()
+    
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(fileobj=_HashingWriter(raw, digest), mode="wb", compresslevel=6) as f:
+            for document in documents:
+                f.write(json_util.dumps(document, json_options=json_util.RELAXED_JSON_OPTIONS).encode())
+                f.write(b"\n")
+                count += 1
+    return count, digest.hexdigest()
+
+def _backup_collection(db, collection_name, backup_dir, batch_size):
+    start = time.perf_counter()
+    path = os.path.join(backup_dir, f"{collection_name}.ndjson.gz")
+    cursor = db[collection_name].find({}, batch_size=batch_size)
+    count, checksum = _write_ndjson(path, cursor)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {collection_name}: {count} documents in {elapsed:.2f}s")
+    return collection_name, {
+        "file": os.path.basename(path), "count": count, "sha256": checksum, "bytes": os.path.getsize(path)
+    }
+
+def _backup_changes(db, collection_names, backup_dir, checkpoint):
+    """Drain the change stream since checkpoint into per-collection change files"""
+    from bson import json_util
+    
+    # Stop at the cluster time we started at, so a busy database can't keep us draining forever
+    with db.client.start_session() as session:
+        db.command("ping", session=session)
+        cutoff = session.operation_time
+    
+    # Renames are matched on their target too: a staging swap replaces the whole collection
+    pipeline = [{"$match": {"$or": [{"ns.coll": {"$in": collection_names}}, {"to.coll": {"$in": collection_names}}]}}]
+    with db.watch(pipeline, resume_after=checkpoint, full_document="updateLookup") as stream:
+        changes = {name: [] for name in collection_names}
+        new_checkpoint = stream.resume_token
+        while True:
+            event = stream.try_next()
+            if event is None:
+                new_checkpoint = stream.resume_token
+                break
+            if event["clusterTime"] > cutoff:
+                break  # Left for the next incremental; the checkpoint stays before it
+            collection_name = event["ns"]["coll"]
+            operation = event["operationType"]
+            if operation in ("drop", "rename", "dropDatabase", "invalidate"):
+                raise RuntimeError(f"{collection_name} was dropped or replaced ({operation}) since the checkpoint")
+            if operation == "delete":
+                changes[collection_name].append({"op": "delete", "_id": event["documentKey"]["_id"]})
+            elif event.get("fullDocument") is not None:
+                changes[collection_name].append({"op": "upsert", "doc": event["fullDocument"]})
+            # An update whose document was deleted before the lookup is covered by the later delete
+            new_checkpoint = stream.resume_token
+    
+    collections = {}
+    for collection_name, events in changes.items():
+        path = os.path.join(backup_dir, f"{collection_name}.changes.ndjson.gz")
+        count, checksum = _write_ndjson(path, events)
+        collections[collection_name] = {
+            "file": os.path.basename(path), "count": count, "sha256": checksum, "bytes": os.path.getsize(path)
+        }
+        print(f"✅ {collection_name}: {count} changes")
+    return collections, json_util.dumps(new_checkpoint)
+
+def _current_checkpoint(db):
+    """Resume token for 'now', or None without change streams (standalone servers)"""
+    from bson import json_util
+    try:
+        with db.watch() as stream:
+            stream.try_next()
+            return json_util.dumps(stream.resume_token)
+    except Exception as e:
+        print(f"⚠️ Change streams unavailable, later incremental backups won't be possible: {str(e)}")
+        return None
+
+def latest_stream_backup(backup_root=BACKUP_ROOT):
+    """(directory, manifest) of the newest streaming backup, or (None, None)"""
+    for backup_dir in sorted(glob.glob(os.path.join(backup_root, "stream_*")), reverse=True):
+        manifest_path = os.path.join(backup_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                return backup_dir, json.load(f)
+    return None, None
+
+def stream_backup(incremental=False, workers=BACKUP_WORKERS, batch_size=BACKUP_BATCH_SIZE, db=None):
+    """Compressed, parallel backup; incremental mode saves only changes since the last one
+    
+    Full backups stream every collection's cursor in batches to <collection>.ndjson.gz,
+    several collections at a time. The change-stream position is taken *before* the
+    scan, so anything written during it is replayed (idempotently) by the next
+    incremental backup, which needs a replica set.
+    """
+    from bson import json_util
+    db = db if db is not None else connect_to_mongodb()
+    
+    base_dir, base_manifest = latest_stream_backup() if incremental else (None, None)
+    if incremental and (base_manifest is None or not base_manifest.get("checkpoint")):
+        print("❌ No previous streaming backup with a checkpoint - run a full one first")
+        return None
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    backup_dir = os.path.join(BACKUP_ROOT, f"stream_{timestamp}")
+    os.makedirs(backup_dir, exist_ok=True)
+    
+    start = time.perf_counter()
+    collection_names = _backup_collections(db)
+    if incremental:
+        checkpoint = json_util.loads(base_manifest["checkpoint"])
+        try:
+            collections, new_checkpoint = _backup_changes(db, collection_names, backup_dir, checkpoint)
+        except Exception as e:
+            # e.g. the oplog rolled past the checkpoint
+            print(f"❌ Could not resume from the last checkpoint, run a full backup: {str(e)}")
+            os.rmdir(backup_dir)
+            return None
+    else:
+        new_checkpoint = _current_checkpoint(db)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda name: _backup_collection(db, name, backup_dir, batch_size), collection_names)
+            collections = dict(results)
+    
+    manifest = {
+        "type": "incremental" if incremental else "full",
+        "created_at": datetime.now().isoformat(),
+        "base": os.path.basename(base_dir) if incremental else None,
+        "checkpoint": new_checkpoint,
+        "collections": collections
+    }
+    with open(os.path.join(backup_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(entry["bytes"] for entry in collections.values())
+    print(f"\n🎉 {manifest['type'].capitalize()} backup of {len(collections)} collections "
+          f"({total_bytes / 1048576:.1f} MB) to {backup_dir} in {elapsed:.2f}s")
+    return backup_dir
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _read_ndjson(path):
+    """Stream documents back out of a gzipped Extended JSON lines file"""
+    from bson import json_util
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield json_util.loads(line)
+
+def _backup_chain(backup_dir):
+    """[(directory, manifest)] from the full backup up to backup_dir, in apply order"""
+    chain = []
+    while backup_dir:
+        with open(os.path.join(backup_dir, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        chain.append((backup_dir, manifest))
+        base = manifest.get("base")
+        backup_dir = os.path.join(os.path.dirname(backup_dir), base) if base else None
+    chain.reverse()
+    if chain[0][1]["type"] != "full":
+        raise ValueError(f"Backup chain for {chain[-1][0]} does not start with a full backup")
+    return chain
+
+def _insert_batches(collection, documents, executor, batch_size, max_in_flight):
+    """Unordered insert_many batches on the executor, at most max_in_flight at once"""
+    slots = threading.BoundedSemaphore(max_in_flight)
+    futures = []
+    
+    def insert(batch):
+        try:
+            collection.insert_many(batch, ordered=False)
+        finally:
+            slots.release()
+    
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            slots.acquire()
+            futures.append(executor.submit(insert, batch))
+            batch = []
+    if batch:
+        slots.acquire()
+        futures.append(executor.submit(insert, batch))
+    
+    # Surface the first failure
+    for future in futures:
+        future.result()
+
+def _apply_changes(collection, changes, batch_size):
+    """Replay incremental upserts/deletes in their original order"""
+    operations = []
+    for change in changes:
+        if change["op"] == "delete":
+            operations.append(DeleteOne({"_id": change["_id"]}))
+        else:
+            operations.append(ReplaceOne({"_id": change["doc"]["_id"]}, change["doc"], upsert=True))
+        if len(operations) >= batch_size:
+            collection.bulk_write(operations, ordered=True)
+            operations = []
+    if operations:
+        collection.bulk_write(operations, ordered=True)
+
+def restore_backup(backup_dir=None, workers=BACKUP_WORKERS, batch_size=BACKUP_BATCH_SIZE, db=None, collections=None):
+    """Restore a streaming backup (plus any incrementals it builds on)
+    
+    Checksums are verified before anything is written. Each collection is loaded into
+    <name>_restore with parallel unordered inserts and only the _id index, replayed up
+    to the chosen incremental, then gets its declared indexes built in one pass. Only
+    once every collection has staged cleanly are they swapped in by rename, so a failed
+    restore leaves the live data untouched. Returns {collection: documents restored},
+    or None on failure.
+    """
+    from utils.indexes import REQUIRED_INDEXES
+    db = db if db is not None else connect_to_mongodb()
+    
+    if backup_dir is None:
+        backup_dir, _ = latest_stream_backup()
+        if backup_dir is None:
+            print("❌ No streaming backup found")
+            return None
+    try:
+        chain = _backup_chain(backup_dir)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"❌ Error reading backup {backup_dir}: {str(e)}")
+        return None
+    
+    # Verify every file up front so a corrupt backup never replaces live data
+    for chain_dir, manifest in chain:
+        for collection_name, entry in manifest["collections"].items():
+            path = os.path.join(chain_dir, entry["file"])
+            if _file_sha256(path) != entry["sha256"]:
+                print(f"❌ Checksum mismatch for {path}")
+                return None
+    print(f"✅ Checksums verified for {len(chain)} backup(s)")
+    
+    full_dir, full_manifest = chain[0]
+    collection_names = collections or sorted(full_manifest["collections"])
+    restored = {}
+    start = time.perf_counter()
+    
+    # Phase 1: load and index every staging collection
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for collection_name in collection_names:
+                collection_start = time.perf_counter()
+                staging = db[f"{collection_name}_restore"]
+                staging.drop()
+                
+                entry = full_manifest["collections"][collection_name]
+                _insert_batches(staging, _read_ndjson(os.path.join(full_dir, entry["file"])),
+                                executor, batch_size, max_in_flight=workers * 2)
+                loaded = staging.estimated_document_count()
+                if loaded != entry["count"]:
+                    raise ValueError(f"{collection_name}: restored {loaded} documents, manifest says {entry['count']}")
+                
+                for chain_dir, manifest in chain[1:]:
+                    change_entry = manifest["collections"].get(collection_name)
+                    if change_entry and change_entry["count"]:
+                        _apply_changes(staging, _read_ndjson(os.path.join(chain_dir, change_entry["file"])), batch_size)
+                
+                # One index build over the loaded data is much cheaper than maintaining indexes per insert
+                for name, keys, options in REQUIRED_INDEXES:
+                    if name == collection_name:
+                        staging.create_index(keys, **options)
+                
+                count = restored[collection_name] = staging.count_documents({})
+                elapsed = time.perf_counter() - collection_start
+                print(f"✅ {collection_name}: staged {count} documents in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f} docs/s)")
+    except Exception as e:
+        print(f"❌ Restore failed, live collections were not touched: {str(e)}")
+        for collection_name in collection_names:
+            db[f"{collection_name}_restore"].drop()
+        return None
+    
+    # Phase 2: swap everything in back to back
+    for collection_name in collection_names:
+        if restored[collection_name]:
+            db[f"{collection_name}_restore"].rename(collection_name, dropTarget=True)
+        else:
+            # Nothing to swap in - just empty the live collection
+            db[f"{collection_name}_restore"].drop()
+            db[collection_name].delete_many({})
+    
+    elapsed = time.perf_counter() - start
+    total = sum(restored.values())
+    print(f"\n🎉 Restored {total} documents from {backup_dir} in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} docs/s)")
+    return restored
+
+def ensure_indexes(db=None):
+    """Build every index declared in utils/indexes.py; returns the number that failed"""
+    from utils.indexes import REQUIRED_INDEXES
+    db = db if db is not None else connect_to_mongodb()
+    
+    failures = 0
+    for collection_name, keys, options in REQUIRED_INDEXES:
+        try:
+            index_name = db[collection_name].create_index(keys, **options)
+            print(f"✅ {collection_name}.{index_name}")
+        except Exception as e:
+            failures += 1
+            print(f"❌ Error creating index {keys} on {collection_name}: {str(e)}")
+    return failures
+
+def audit_query_plans(db=None):
+    """explain() every query shape the bot issues and flag collection scans; returns the flagged names"""
+    from utils.indexes import QUERY_SHAPES, plan_stages, winning_plan
+    db = db if db is not None else connect_to_mongodb()
+    
+    flagged = []
+    for shape in QUERY_SHAPES:
+        try:
+            explain_result = db.command("explain", shape["command"], verbosity="queryPlanner")
+        except Exception as e:
+            flagged.append(shape["name"])
+            print(f"❌ {shape['name']}: explain failed: {str(e)}")
+            continue
+        
+        stages = plan_stages(winning_plan(explain_result))
+        plan_text = " <- ".join(stages) or "no plan"
+        if "COLLSCAN" in stages and not shape.get("full_scan"):
+            flagged.append(shape["name"])
+            print(f"❌ {shape['name']}: collection scan ({plan_text})")
+        else:
+            print(f"✅ {shape['name']}: {plan_text}")
+    
+    if flagged:
+        print(f"\n⚠️ {len(flagged)} query shape(s) need an index: {', '.join(flagged)}")
+    else:
+        print("\n🎉 Every query shape is served by an index")
+    return flagged
+
+def migrate_caught_pokemon(db=None, batch_size=1000):
+    """Move every trainer's caught_pokemon array onto the Pokémon themselves (owner_id + ordinal)"""
+    from utils.box_summary import (
+        summary_upserts, ordinal_updates, legacy_inventory_update,
+        numbered_pokemon_filter, SUMMARY_SOURCE_PROJECTION, LEGACY_TRAINER_FILTER
+    )
+    db = db if db is not None else connect_to_mongodb()
+    
+    ensure_indexes(db)
+    
+    migrated_users = 0
+    migrated_pokemon = 0
+    for user in db.inventory.find(LEGACY_TRAINER_FILTER, {"caught_pokemon": 1}):
+        owner_id = user["_id"]
+        caught_id_list = user["caught_pokemon"]
+        
+        operations = ordinal_updates(owner_id, caught_id_list)
+        for start in range(0, len(operations), batch_size):
+            db.caught_pokemon.bulk_write(operations[start:start + batch_size], ordered=False)
+        
+        # Rebuild the %box summaries from the numbered Pokémon
+        db.box_summaries.delete_many({"owner_id": owner_id})
+        summaries = summary_upserts(
+            owner_id, db.caught_pokemon.find(numbered_pokemon_filter(owner_id), SUMMARY_SOURCE_PROJECTION)
+        )
+        for start in range(0, len(summaries), batch_size):
+            db.box_summaries.bulk_write(summaries[start:start + batch_size], ordered=False)
+        
+        db.inventory.update_one({"_id": owner_id}, legacy_inventory_update(caught_id_list))
+        migrated_users += 1
+        migrated_pokemon += len(caught_id_list)
+    
+    print(f"✅ Migrated {migrated_pokemon} caught Pokémon across {migrated_users} trainers")
+    return migrated_users
+
 def main():
     """Run the backup task"""
     print("Starting database backup...")
     backup_data()
     print(f"Backup completed at {datetime.now()}")
 
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Non-interactive use (CI, deploy scripts):
+    #   python db.management.py backup [--incremental] | restore [backup_dir] | upload [batch_size] | indexes | audit
+    if sys.argv[1] == "backup":
+        incremental = "--incremental" in sys.argv[2:]
+        sys.exit(0 if stream_backup(incremental=incremental) else 1)
+    elif sys.argv[1] == "restore":
+        sys.exit(0 if restore_backup(sys.argv[2] if len(sys.argv) > 2 else None) else 1)
+    elif sys.argv[1] == "upload":
+        upload_initial_data(int(sys.argv[2]) if len(sys.argv) > 2 else UPLOAD_BATCH_SIZE)
+        sys.exit(0)
+    elif sys.argv[1] == "indexes":
+        sys.exit(1 if ensure_indexes() else 0)
+    elif sys.argv[1] == "audit":
+        sys.exit(1 if audit_query_plans() else 0)
+    print(f"Unknown command: {sys.argv[1]} (expected 'backup', 'restore', 'upload', 'indexes' or 'audit')")
+    sys.exit(2)
+
 if __name__ == "__main__":
     # Interactive menu for better usability
     print("Welcome to the Pokémon Discord Bot Database Manager")
     print("---------------------------------------------------")
     print("1. Upload initial data to MongoDB")
     print("2. Backup data from MongoDB")
-    print("3. Exit")
+    print("3. Migrate caught Pokémon off the inventory documents")
+    print("4. Build indexes")
+    print("5. Audit query plans")
+    print("6. Streaming backup (compressed, parallel)")
+    print("7. Incremental backup since the last streaming backup")
+    print("8. Restore the latest streaming backup")
+    print("9. Exit")
     
-    choice = input("Enter your choice (1-3): ")
+    choice = input("Enter your choice (1-9): ")
     
     if choice == "1":
         upload_initial_data()
     elif choice == "2":
         backup_data()
+    elif choice == "3":
+        migrate_caught_pokemon()
+    elif choice == "4":
+        ensure_indexes()
+    elif choice == "5":
+        audit_query_plans()
+    elif choice == "6":
+        stream_backup()
+    elif choice == "7":
+        stream_backup(incremental=True)
+    elif choice == "8":
+        restore_backup()
     else:
         print("Exiting program.")
\ No newline at end of file
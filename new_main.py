@@ -1,6 +1,7 @@
 import discord
 import os
 import asyncio
+import signal
 from dotenv import load_dotenv
 from discord.ext import commands
 
@@ -25,6 +26,17 @@ async def on_ready():
     
     print('All systems initialized successfully!')
 
+@client.before_invoke
+async def start_query_stats(ctx):
+    """Attribute database reads to the command being run"""
+    from utils.query_stats import begin_command
+    begin_command(ctx.command.qualified_name)
+
+@client.after_invoke
+async def finish_query_stats(ctx):
+    from utils.query_stats import end_command
+    end_command()
+
 async def load_cogs():
     """Load all cogs from the cogs directory"""
     for filename in os.listdir('./cogs'):
@@ -37,7 +49,41 @@ async def load_cogs():
 
 # Setup and run bot
 async def main():
+    # Species data must be in memory before cogs build their wild pools
+    from utils.species_catalog import load_catalog
+    load_catalog()
+    
     async with client:
+        # Close cleanly on SIGTERM so cogs can flush buffered writes
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, lambda: asyncio.create_task(client.close())
+            )
+        except (NotImplementedError, AttributeError):
+            pass  # Signal handlers are not supported on Windows event loops
+        
+        # Ball prices, shop and emojis are served from memory and kept fresh by a change stream
+        from utils.config_snapshot import refresh_config_snapshot, watch_config_changes
+        try:
+            await refresh_config_snapshot()
+        except Exception as e:
+            print(f"Failed to load config snapshot: {e}")
+        # Held on the client so the watcher task is never garbage collected
+        client.config_watch_task = asyncio.create_task(watch_config_changes())
+        
+        # Box lookups and pages depend on the (owner_id, ordinal) indexes
+        from utils.db_utils import ensure_indexes, migrate_legacy_trainers
+        try:
+            await ensure_indexes()
+        except Exception as e:
+            print(f"Failed to ensure indexes: {e}")
+        
+        # Trainers left on the legacy caught_pokemon array (normally none - see db.management.py option 3)
+        try:
+            await migrate_legacy_trainers()
+        except Exception as e:
+            print(f"Failed to migrate legacy trainers: {e}")
+        
         await load_cogs()
         await client.start(os.getenv('API_Key'))
 
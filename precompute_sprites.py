@@ -0,0 +1,127 @@
+"""Resolve the best sprite URL for every species offline.
+
+Probes every candidate sprite URL once (bounded concurrency), then picks the best
+reachable URL for each species x shiny x environment mode and writes
+fresh_data/best_sprites.json. The species catalog loads that file into each
+record's "best_sprite" field, so runtime sprite selection needs no network I/O.
+
+Usage:
+    python precompute_sprites.py [concurrency]
+
+Run %reloadcatalog (or restart the bot) afterwards to pick up the new file.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import aiohttp
+from dotenv import load_dotenv
+from utils.species_catalog import load_catalog, BEST_SPRITES_FILE
+from utils.sprite_resolver import get_sprite_priority, SPRITE_PROBE_TIMEOUT, SPRITE_MISSING_STATUSES
+
+DEFAULT_CONCURRENCY = 32
+BROKEN_SPRITES_FILE = os.path.join("cache", "broken_sprites.json")
+
+# (sprite mode, environment mode passed to get_sprite_priority)
+SPRITE_MODES = (("default", "off"), ("static", "static"))
+
+async def probe_url(session, semaphore, url):
+    """HEAD a URL; returns (url, ok, detail)"""
+    async with semaphore:
+        try:
+            async with session.head(url, timeout=aiohttp.ClientTimeout(total=SPRITE_PROBE_TIMEOUT * 5)) as response:
+                return url, response.status == 200, response.status
+        except Exception as e:
+            # Timeouts and connection errors: ok is False, but the detail is not a status
+            return url, False, type(e).__name__
+
+def candidate_urls(species):
+    """Every URL the priority lists could pick for a species"""
+    sprites = species.get("sprites") or {}
+    urls = set()
+    for _, environment_mode in SPRITE_MODES:
+        for shiny in (False, True):
+            for key in get_sprite_priority(shiny, environment_mode):
+                if sprites.get(key):
+                    urls.add(sprites[key])
+    return urls
+
+def pick_best(sprites, shiny, environment_mode, reachable, missing):
+    """(definite, url): definite unless a candidate before the pick could not be checked
+
+    A miss is only definite when every candidate was 404/410; anything else (timeouts,
+    5xx, 405...) is left to the runtime resolver.
+    """
+    for key in get_sprite_priority(shiny, environment_mode):
+        url = sprites.get(key)
+        if not url:
+            continue
+        if url in reachable:
+            return True, url
+        if url not in missing:
+            return False, None
+    return True, None
+
+async def precompute(concurrency=DEFAULT_CONCURRENCY):
+    catalog = load_catalog()
+    species_list = list(catalog)
+
+    urls = set()
+    for species in species_list:
+        urls |= candidate_urls(species)
+
+    print(f"Probing {len(urls)} distinct sprite URLs for {len(species_list)} species "
+          f"(concurrency {concurrency})...")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        results = await asyncio.gather(*(probe_url(session, semaphore, url) for url in urls))
+    elapsed = time.perf_counter() - start
+
+    reachable = {url for url, ok, _ in results if ok}
+    missing_urls = {url for url, ok, detail in results if not ok and detail in SPRITE_MISSING_STATUSES}
+    broken = sorted(({"url": url, "detail": detail} for url, ok, detail in results if not ok),
+                    key=lambda entry: entry["url"])
+
+    best_sprites = {}
+    missing = 0
+    undecided = 0
+    for species in species_list:
+        sprites = species.get("sprites") or {}
+        entry = {}
+        for mode, environment_mode in SPRITE_MODES:
+            entry[mode] = {}
+            for variant, shiny in (("normal", False), ("shiny", True)):
+                definite, url = pick_best(sprites, shiny, environment_mode, reachable, missing_urls)
+                if not definite:
+                    # Left out so resolve_sprite_url probes it at runtime
+                    undecided += 1
+                    continue
+                entry[mode][variant] = url
+                missing += url is None
+        best_sprites[str(species["id"])] = entry
+
+    with open(BEST_SPRITES_FILE, "w", encoding="utf-8") as f:
+        json.dump(best_sprites, f, indent=2)
+
+    os.makedirs(os.path.dirname(BROKEN_SPRITES_FILE), exist_ok=True)
+    with open(BROKEN_SPRITES_FILE, "w", encoding="utf-8") as f:
+        json.dump(broken, f, indent=2)
+
+    print(f"✅ Probed {len(urls)} URLs in {elapsed:.1f}s ({len(urls) / elapsed if elapsed else 0:.1f} URLs/s)")
+    print(f"✅ Wrote best sprites for {len(best_sprites)} species to {BEST_SPRITES_FILE}")
+    if broken:
+        print(f"⚠️ {len(broken)} broken sprite URLs listed in {BROKEN_SPRITES_FILE}")
+        for entry in broken[:10]:
+            print(f"   {entry['detail']}: {entry['url']}")
+    if missing:
+        print(f"⚠️ {missing} species/shiny/mode combinations have no reachable sprite")
+    if undecided:
+        print(f"⚠️ {undecided} species/shiny/mode combinations could not be checked (left to the runtime resolver)")
+
+if __name__ == "__main__":
+    load_dotenv()
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CONCURRENCY
+    asyncio.run(precompute(concurrency))
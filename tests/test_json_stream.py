@@ -0,0 +1,26 @@
+# tests/test_json_stream.py
+import json
+import pytest
+from utils.json_stream import iter_json_array, iter_json_object
+
+# Floats and exponents that a small chunk size splits at every possible point
+NUMBERS_ARRAY = '[1.5e10, true, null, -0.25, 3E-4, 12, 7.0e+2, {"x": 1e5}, "1.5"]'
+NUMBERS_OBJECT = '{"meta": {"v": 2.5e1}, "users": {"a": 1.25, "b": -6e-3, "c": [10, 2.0E3]}}'
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 7, 64])
+def test_array_numbers_split_at_chunk_boundaries(tmp_path, chunk_size):
+    path = tmp_path / "numbers.json"
+    path.write_text(NUMBERS_ARRAY, encoding="utf-8")
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == json.loads(NUMBERS_ARRAY)
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 7, 64])
+def test_nested_object_numbers_split_at_chunk_boundaries(tmp_path, chunk_size):
+    path = tmp_path / "numbers.json"
+    path.write_text(NUMBERS_OBJECT, encoding="utf-8")
+    expected = json.loads(NUMBERS_OBJECT)["users"]
+    assert dict(iter_json_object(path, keys=("users",), chunk_size=chunk_size)) == expected
+
+def test_trailing_number_at_eof(tmp_path):
+    path = tmp_path / "numbers.json"
+    path.write_text("[1, 2.5e3]", encoding="utf-8")
+    assert list(iter_json_array(path, chunk_size=1)) == [1, 2500.0]
@@ -0,0 +1,112 @@
+# utils/background_atlas.py
+import os
+import random
+import hashlib
+import threading
+import numpy as np
+
+BACKGROUND_FOLDER = os.path.join("assets", "backgrounds")
+
+# Decoded, resized backgrounds are written here once and memory-mapped afterwards,
+# so every process (bot and render workers) shares the same page-cache copy
+BACKGROUND_CACHE_DIR = os.path.join("cache", "backgrounds")
+
+# Channel order per renderer: OpenCV path uses BGRA, PIL (GIF) path uses RGBA
+ATLAS_MODES = ("BGRA", "RGBA")
+
+# (folder, size, mode) -> (file names, read-only array of shape (N, H, W, 4))
+_atlases = {}
+# (folder, size, mode) -> per-background versions the mapped atlas was built from
+_versions = {}
+_atlas_lock = threading.Lock()
+
+def _source_files(folder):
+    return sorted(f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f)))
+
+def _file_version(folder, name):
+    """Changes whenever the background file is edited"""
+    stat = os.stat(os.path.join(folder, name))
+    return f"{name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def _fingerprint(versions):
+    """Changes whenever a background is added, removed or edited"""
+    digest = hashlib.sha1()
+    for version in versions:
+        digest.update(f"{version};".encode())
+    return digest.hexdigest()[:12]
+
+def _decode_background(path, size, mode):
+    """Decode and resize one background exactly as the renderers used to"""
+    if mode == "BGRA":
+        import cv2
+        bg = cv2.imread(path)
+        bg = cv2.resize(bg, size)
+        return cv2.cvtColor(bg, cv2.COLOR_BGR2BGRA)
+
+    from PIL import Image
+    with Image.open(path) as image:
+        return np.array(image.convert("RGBA").resize(size, Image.LANCZOS))
+
+def build_atlas(folder, size, mode):
+    """Decode every background in a folder into one (N, H, W, 4) array"""
+    names = _source_files(folder)
+    frames = [_decode_background(os.path.join(folder, name), size, mode) for name in names]
+    return names, np.stack(frames)
+
+def load_atlas(folder=BACKGROUND_FOLDER, size=(640, 360), mode="BGRA"):
+    """Return (names, atlas) for a size and colour mode, building the cache file if needed"""
+    size = tuple(size)
+    key = (folder, size, mode)
+    atlas = _atlases.get(key)
+    if atlas is not None:
+        return atlas
+
+    with _atlas_lock:
+        atlas = _atlases.get(key)
+        if atlas is not None:
+            return atlas
+
+        names = _source_files(folder)
+        versions = tuple(_file_version(folder, name) for name in names)
+        cache_path = os.path.join(
+            BACKGROUND_CACHE_DIR,
+            f"{_fingerprint(versions)}_{size[0]}x{size[1]}_{mode}.npy"
+        )
+
+        if not os.path.exists(cache_path):
+            names, array = build_atlas(folder, size, mode)
+            os.makedirs(BACKGROUND_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, cache_path)
+
+        atlas = (names, np.load(cache_path, mmap_mode="r"))
+        _versions[key] = versions
+        _atlases[key] = atlas
+        return atlas
+
+def warm_atlases(folder=BACKGROUND_FOLDER, sizes=((640, 360),), modes=ATLAS_MODES):
+    """Build/map every atlas up front so the first encounter pays no decode cost"""
+    for size in sizes:
+        for mode in modes:
+            load_atlas(folder, size, mode)
+
+def background_count(folder=BACKGROUND_FOLDER, size=(640, 360), mode="BGRA"):
+    return len(load_atlas(folder, size, mode)[0])
+
+def background_names(folder=BACKGROUND_FOLDER, size=(640, 360), mode="BGRA"):
+    """Background file names in atlas order"""
+    return load_atlas(folder, size, mode)[0]
+
+def background_version(folder=BACKGROUND_FOLDER, size=(640, 360), mode="BGRA", index=0):
+    """Version (name, size, mtime) of one background as loaded into the atlas, for cache keys"""
+    load_atlas(folder, size, mode)
+    return _versions[(folder, tuple(size), mode)][index]
+
+def get_background(folder=BACKGROUND_FOLDER, size=(640, 360), mode="BGRA", index=None):
+    """Writable copy of one background (random when index is None)"""
+    names, atlas = load_atlas(folder, size, mode)
+    if index is None:
+        index = random.randrange(len(names))
+    return np.array(atlas[index])
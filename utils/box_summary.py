@@ -0,0 +1,61 @@
+# utils/box_summary.py
+from pymongo import ReplaceOne, UpdateOne
+
+# Sum of six perfect (31) IVs
+MAX_TOTAL_IV = 186
+
+# Pokémon fields copied into the box summary as-is
+MIRRORED_FIELDS = ("pokedex_id", "name", "nickname", "shiny", "level")
+
+# Pokémon fields a box summary is built from
+SUMMARY_SOURCE_PROJECTION = dict.fromkeys(MIRRORED_FIELDS + ("ivs", "ordinal"), 1)
+
+# Trainers still carrying the legacy caught_pokemon ID array
+LEGACY_TRAINER_FILTER = {"caught_pokemon": {"$exists": True}}
+
+def iv_percentage(ivs):
+    """Total IVs as a percentage of the maximum, rounded like %box shows it"""
+    return round((sum(ivs.values()) / MAX_TOTAL_IV) * 100, 2) if ivs else 0.0
+
+def build_box_summary(pokemon, owner_id, ordinal):
+    """Compact row %box renders for one Pokémon; ordinal is its 1-based box number"""
+    summary = {field: pokemon.get(field) for field in MIRRORED_FIELDS}
+    summary.update({
+        "_id": pokemon["_id"],
+        "owner_id": owner_id,
+        "ordinal": ordinal,
+        "iv_percentage": iv_percentage(pokemon.get("ivs"))
+    })
+    return summary
+
+def summary_changes(update_query):
+    """The part of a Pokémon update that also has to be applied to its summary"""
+    changes = {}
+    for field, value in update_query.get("$set", {}).items():
+        if field in MIRRORED_FIELDS:
+            changes[field] = value
+        elif field == "ivs":
+            changes["iv_percentage"] = iv_percentage(value)
+    return changes
+
+def numbered_pokemon_filter(owner_id):
+    """A trainer's Pokémon that have a box number (mid-catch fallback rows do not)"""
+    return {"owner_id": owner_id, "ordinal": {"$exists": True}}
+
+def summary_upserts(owner_id, pokemon_docs):
+    """Box summary upserts for numbered Pokémon read with SUMMARY_SOURCE_PROJECTION"""
+    return [
+        ReplaceOne({"_id": pokemon["_id"]}, build_box_summary(pokemon, owner_id, pokemon["ordinal"]), upsert=True)
+        for pokemon in pokemon_docs
+    ]
+
+def ordinal_updates(owner_id, caught_id_list):
+    """Number a legacy caught_pokemon array: box numbers follow the array order, from 1"""
+    return [
+        UpdateOne({"_id": pokemon_id}, {"$set": {"owner_id": owner_id, "ordinal": index + 1}})
+        for index, pokemon_id in enumerate(caught_id_list)
+    ]
+
+def legacy_inventory_update(caught_id_list):
+    """Inventory update that finishes a trainer's migration: keep the box size, drop the array"""
+    return {"$set": {"caught_count": len(caught_id_list)}, "$unset": {"caught_pokemon": ""}}
@@ -0,0 +1,124 @@
+# utils/cache.py
+import time
+import weakref
+from collections import OrderedDict
+
+# Every live cache, so stats can be reported from one place
+_caches = weakref.WeakSet()
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTL, hit/miss/eviction counters and tag invalidation
+
+    Entries may carry tags (e.g. the Pokémon IDs contained in a bulk result). A reverse
+    index from tag to keys lets invalidate_tag() drop only the entries that are affected.
+    """
+
+    def __init__(self, name, max_size=1024, ttl=300):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, tags)
+        self._tag_index = {}           # tag -> set of keys
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _caches.add(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def get(self, key, default=None):
+        """Return a cached value and mark it as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, tags=(), ttl=None):
+        """Store a value, evicting the least recently used entries when full"""
+        if key in self._entries:
+            self._remove(key)
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        tags = frozenset(tags)
+        self._entries[key] = (value, expires_at, tags)
+        for tag in tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop a single entry; returns True if it existed"""
+        if key in self._entries:
+            self._remove(key)
+            return True
+        return False
+
+    def invalidate_tag(self, tag):
+        """Drop every entry carrying the given tag; returns the number removed"""
+        keys = self._tag_index.pop(tag, None)
+        if not keys:
+            return 0
+
+        for key in list(keys):
+            self._remove(key)
+        return len(keys)
+
+    def purge_expired(self):
+        """Remove all expired entries; returns the number removed"""
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry[1] <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        return len(expired)
+
+    def clear(self):
+        """Remove every entry (counters are kept)"""
+        self._entries.clear()
+        self._tag_index.clear()
+
+    def stats(self):
+        """Snapshot of size and counters"""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+def all_cache_stats():
+    """Stats for every live cache, sorted by name"""
+    return sorted((cache.stats() for cache in list(_caches)), key=lambda s: s["name"])
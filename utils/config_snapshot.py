@@ -0,0 +1,140 @@
+# utils/config_snapshot.py
+import time
+import asyncio
+from pymongo.errors import OperationFailure
+from utils.db_utils import get_all_config_data, get_all_emoji_data, get_config_data, watch_collections
+
+# Shown when an emoji is missing from the emojis collection
+DEFAULT_EMOJI = "🔍"
+
+# Collections whose changes trigger a snapshot refresh
+WATCHED_COLLECTIONS = ("config", "emojis")
+
+# Wait after a change event so bursts of edits cause a single reload
+CHANGE_DEBOUNCE = 2
+
+# Seconds between background reloads triggered by snapshot misses
+REFRESH_RETRY_INTERVAL = 30
+
+# Change stream reconnect backoff (seconds), doubling up to the maximum
+WATCH_RETRY_DELAY = 5
+WATCH_RETRY_MAX_DELAY = 300
+
+# MongoDB error code for "$changeStream is only supported on replica sets"
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+_snapshot = None
+_refresh_lock = asyncio.Lock()
+_retry_task = None
+_last_retry = 0
+
+class ConfigSnapshot:
+    """Immutable view of the config and emojis collections at one point in time
+
+    Documents are shared by every caller - treat them as read-only.
+    """
+    __slots__ = ("config", "emojis", "version", "loaded_at")
+
+    def __init__(self, config_docs, emoji_docs, version=1):
+        self.config = {doc["_id"]: doc for doc in config_docs}
+        self.emojis = {doc["_id"]: doc.get("emoji") for doc in emoji_docs}
+        self.version = version
+        self.loaded_at = time.time()
+
+    def get_config(self, config_id):
+        return self.config.get(config_id)
+
+    def get_emoji(self, emoji_type):
+        return self.emojis.get(emoji_type) or DEFAULT_EMOJI
+
+async def refresh_config_snapshot():
+    """Reload config and emojis from MongoDB and swap in a new snapshot"""
+    global _snapshot
+    async with _refresh_lock:
+        config_docs, emoji_docs = await asyncio.gather(get_all_config_data(), get_all_emoji_data())
+        version = _snapshot.version + 1 if _snapshot else 1
+        _snapshot = ConfigSnapshot(config_docs, emoji_docs, version)
+        print(f"Loaded config snapshot v{version} ({len(_snapshot.config)} config docs, {len(_snapshot.emojis)} emojis)")
+        return _snapshot
+
+def get_config_snapshot():
+    """Current snapshot (empty until the first refresh has completed)"""
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = ConfigSnapshot([], [], version=0)
+    return _snapshot
+
+async def get_config(config_id):
+    """A config document, served from memory when the snapshot has it
+
+    A miss (e.g. the startup load failed) is read straight from MongoDB and
+    schedules a background reload of the snapshot.
+    """
+    config_doc = get_config_snapshot().get_config(config_id)
+    if config_doc is None:
+        _schedule_refresh()
+        config_doc = await get_config_data(config_id)
+    return config_doc
+
+def get_emoji(emoji_type):
+    """An emoji served from memory (the default one while nothing is loaded)"""
+    snapshot = get_config_snapshot()
+    if snapshot.version == 0:
+        # The startup load failed - try again rather than wait for %reloadconfig
+        _schedule_refresh()
+    return snapshot.get_emoji(emoji_type)
+
+def _schedule_refresh():
+    """Start a background snapshot reload, at most once per REFRESH_RETRY_INTERVAL"""
+    global _retry_task, _last_retry
+    if _retry_task is not None and not _retry_task.done():
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return  # Called outside the event loop - the next call from a command will retry
+    if time.time() - _last_retry < REFRESH_RETRY_INTERVAL:
+        return
+    _last_retry = time.time()
+    _retry_task = asyncio.create_task(_retry_refresh())
+
+async def _retry_refresh():
+    try:
+        await refresh_config_snapshot()
+    except Exception as e:
+        print(f"Failed to reload config snapshot: {e}")
+
+async def watch_config_changes():
+    """Refresh the snapshot whenever config or emojis change (needs a replica set)
+
+    Runs until cancelled, reconnecting with backoff whenever the stream fails.
+    """
+    delay = WATCH_RETRY_DELAY
+    while True:
+        try:
+            async with watch_collections(WATCHED_COLLECTIONS) as stream:
+                delay = WATCH_RETRY_DELAY
+                async for _ in stream:
+                    await asyncio.sleep(CHANGE_DEBOUNCE)
+                    # Drain the rest of the burst so it costs one reload
+                    while await stream.try_next() is not None:
+                        pass
+                    await refresh_config_snapshot()
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAM_UNSUPPORTED:
+                # Standalone server: retrying can never succeed - %reloadconfig still works
+                print("Config change stream unavailable (not a replica set), use %reloadconfig after edits")
+                return
+            print(f"Config change stream failed, retrying in {delay}s (use %reloadconfig after edits meanwhile): {e}")
+        except Exception as e:
+            print(f"Config change stream failed, retrying in {delay}s (use %reloadconfig after edits meanwhile): {e}")
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WATCH_RETRY_MAX_DELAY)
+        # Edits made while disconnected produced no events, so reload once on reconnect
+        try:
+            await refresh_config_snapshot()
+        except Exception as e:
+            print(f"Failed to reload config snapshot: {e}")
@@ -1,116 +1,147 @@
 # utils/db_utils.py
-import time
-from config import inventory_collection, pokemon_collection
+import asyncio
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from config import async_client, async_db, MONGO_OPERATION_TIMEOUT
+from utils.cache import TTLCache
+from utils.box_summary import (
+    build_box_summary, summary_changes, summary_upserts, ordinal_updates, legacy_inventory_update,
+    numbered_pokemon_filter, SUMMARY_SOURCE_PROJECTION, LEGACY_TRAINER_FILTER
+)
+from utils.query_stats import record_read
 
-# Cache for database queries
-user_cache = {}
-pokemon_cache = {}
-pokemon_bulk_cache = {}
+# Async collections (Motor) - every runtime DB call goes through this module
+inventory_collection = async_db.inventory
+pokemon_collection = async_db.caught_pokemon
+unique_id_collection = async_db.unique_id
+move_collection = async_db.moves
+ability_collection = async_db.abilities
+config_collection = async_db.config
+emoji_collection = async_db.emojis
+box_summary_collection = async_db.box_summaries
+
+# Inventory fields holding ball counts
+BALL_FIELDS = ("Pokeballs", "Greatballs", "Ultraballs", "Masterballs")
+BALL_PROJECTION = {field: 1 for field in BALL_FIELDS}
+
+# Operations per bulk write when renumbering Pokémon or rebuilding box summaries
+BOX_REBUILD_CHUNK = 1000
+
+# MongoDB error code for "transactions need a replica set or mongos"
+ILLEGAL_OPERATION = 20
+
+# None until the first catch tells us whether the deployment supports transactions
+_transactions_supported = None
 
 # Cache timeout in seconds (5 minutes)
 CACHE_TIMEOUT = 300
 
-async def get_user_data(user_id):
-    """Get user data with caching"""
-    current_time = time.time()
+# Cache for database queries (bounded LRU with TTL expiry)
+user_cache = TTLCache("users", max_size=5000, ttl=CACHE_TIMEOUT)
+pokemon_cache = TTLCache("pokemon", max_size=20000, ttl=CACHE_TIMEOUT)
+pokemon_bulk_cache = TTLCache("pokemon_bulk", max_size=2000, ttl=CACHE_TIMEOUT)
+
+async def run_query(operation, timeout=None):
+    """Await a Motor operation with a per-operation timeout"""
+    return await asyncio.wait_for(operation, timeout or MONGO_OPERATION_TIMEOUT)
+
+async def get_user_data(user_id, fields=None):
+    """Get user data with caching; fields limits the read to those top-level fields
+    
+    Each field set is cached separately under the user's tag, so any write to the
+    user drops every projection of them at once.
+    """
+    fields = frozenset(fields) if fields else None
+    cache_key = (user_id, fields)
     
     # Check cache first
-    if user_id in user_cache and current_time - user_cache[user_id]["timestamp"] < CACHE_TIMEOUT:
-        return user_cache[user_id]["data"]
+    user_data = user_cache.get(cache_key)
+    if user_data is not None:
+        return user_data
+    
+    projection = dict.fromkeys(fields, 1) if fields else None
     
     # Fetch from database
-    user_data = inventory_collection.find_one({"_id": user_id})
+    user_data = await run_query(inventory_collection.find_one({"_id": user_id}, projection))
+    record_read(user_data)
     
     # Cache the result if found
     if user_data:
-        user_cache[user_id] = {
-            "data": user_data,
-            "timestamp": current_time
-        }
+        user_cache.set(cache_key, user_data, tags=(user_id,))
     
     return user_data
 
 async def get_pokemon_data(pokemon_id):
     """Get a single Pokémon's data with caching"""
-    current_time = time.time()
-    
     # Check cache first
-    if pokemon_id in pokemon_cache and current_time - pokemon_cache[pokemon_id]["timestamp"] < CACHE_TIMEOUT:
-        return pokemon_cache[pokemon_id]["data"]
+    pokemon_data = pokemon_cache.get(pokemon_id)
+    if pokemon_data is not None:
+        return pokemon_data
     
     # Fetch from database
-    pokemon_data = pokemon_collection.find_one({"_id": pokemon_id})
+    pokemon_data = await run_query(pokemon_collection.find_one({"_id": pokemon_id}))
+    record_read(pokemon_data)
     
     # Cache the result if found
     if pokemon_data:
-        pokemon_cache[pokemon_id] = {
-            "data": pokemon_data,
-            "timestamp": current_time
-        }
+        pokemon_cache.set(pokemon_id, pokemon_data)
     
     return pokemon_data
 
-async def get_pokemon_bulk(pokemon_ids):
-    """Get multiple Pokémon in a single query with caching"""
-    current_time = time.time()
+async def get_pokemon_bulk(pokemon_ids, cached=True):
+    """Get multiple Pokémon in a single query with caching
     
+    cached=False always reads every document from the database, for callers that
+    write back values derived from what they read.
+    """
     # Create a cache key from the sorted list of IDs to ensure consistency
-    cache_key = ",".join(sorted(pokemon_ids))
+    cache_key = tuple(sorted(pokemon_ids))
     
     # Check cache first
-    if cache_key in pokemon_bulk_cache and current_time - pokemon_bulk_cache[cache_key]["timestamp"] < CACHE_TIMEOUT:
-        return pokemon_bulk_cache[cache_key]["data"]
+    cached_result = pokemon_bulk_cache.get(cache_key) if cached else None
+    if cached_result is not None:
+        return cached_result
     
     # Check which IDs are not in individual cache
     missing_ids = []
     result_dict = {}
     
     for pokemon_id in pokemon_ids:
-        if pokemon_id in pokemon_cache and current_time - pokemon_cache[pokemon_id]["timestamp"] < CACHE_TIMEOUT:
+        pokemon = pokemon_cache.get(pokemon_id) if cached else None
+        if pokemon is not None:
             # Use cached data
-            result_dict[pokemon_id] = pokemon_cache[pokemon_id]["data"]
+            result_dict[pokemon_id] = pokemon
         else:
             # Need to fetch this ID
             missing_ids.append(pokemon_id)
     
     # OPTIMIZATION: Fetch missing Pokémon data in a single query
     if missing_ids:
-        pokemon_list = list(pokemon_collection.find({"_id": {"$in": missing_ids}}))
+        cursor = pokemon_collection.find({"_id": {"$in": missing_ids}})
+        pokemon_list = await run_query(cursor.to_list(length=None))
+        record_read(pokemon_list)
         
         # Add to individual cache and result dict
         for pokemon in pokemon_list:
             pokemon_id = pokemon["_id"]
-            pokemon_cache[pokemon_id] = {
-                "data": pokemon,
-                "timestamp": current_time
-            }
+            pokemon_cache.set(pokemon_id, pokemon)
             result_dict[pokemon_id] = pokemon
     
-    # Cache the bulk result
-    pokemon_bulk_cache[cache_key] = {
-        "data": result_dict,
-        "timestamp": current_time
-    }
+    # Cache the bulk result, tagged with every ID so updates can find it
+    pokemon_bulk_cache.set(cache_key, result_dict, tags=cache_key)
     
     return result_dict
 
 def invalidate_cache(user_id=None, pokemon_id=None):
     """Invalidate cache entries when data changes"""
-    if user_id and user_id in user_cache:
-        del user_cache[user_id]
+    if user_id:
+        user_cache.invalidate_tag(user_id)
     
-    if pokemon_id and pokemon_id in pokemon_cache:
-        del pokemon_cache[pokemon_id]
-        
-        # Also invalidate any bulk caches that might contain this Pokémon
-        keys_to_remove = []
-        for key in pokemon_bulk_cache:
-            if pokemon_id in key.split(","):
-                keys_to_remove.append(key)
+    if pokemon_id:
+        pokemon_cache.invalidate(pokemon_id)
         
-        for key in keys_to_remove:
-            if key in pokemon_bulk_cache:
-                del pokemon_bulk_cache[key]
+        # Also invalidate any bulk caches that contain this Pokémon (reverse index lookup)
+        pokemon_bulk_cache.invalidate_tag(pokemon_id)
     
     # Clear all cache if no specific ID is provided
     if not user_id and not pokemon_id:
@@ -120,12 +151,259 @@ def invalidate_cache(user_id=None, pokemon_id=None):
 
 async def update_user_data(user_id, update_query):
     """Update user data and invalidate cache"""
-    result = inventory_collection.update_one({"_id": user_id}, update_query)
+    result = await run_query(inventory_collection.update_one({"_id": user_id}, update_query))
     invalidate_cache(user_id=user_id)
     return result
 
+async def get_pokemon_by_ordinal(owner_id, ordinal):
+    """A trainer's Pokémon by its 1-based box number"""
+    pokemon_data = await run_query(pokemon_collection.find_one({"owner_id": owner_id, "ordinal": ordinal}))
+    record_read(pokemon_data)
+    if pokemon_data:
+        pokemon_cache.set(pokemon_data["_id"], pokemon_data)
+    return pokemon_data
+
 async def update_pokemon_data(pokemon_id, update_query):
     """Update Pokémon data and invalidate cache"""
-    result = pokemon_collection.update_one({"_id": pokemon_id}, update_query)
+    result = await run_query(pokemon_collection.update_one({"_id": pokemon_id}, update_query))
     invalidate_cache(pokemon_id=pokemon_id)
-    return result
\ No newline at end of file
+    
+    # Keep the %box summary in step (renames etc.)
+    changes = summary_changes(update_query)
+    if changes:
+        await run_query(box_summary_collection.update_one({"_id": pokemon_id}, {"$set": changes}))
+    return result
+
+async def insert_user_data(user_doc):
+    """Create a new trainer inventory document"""
+    result = await run_query(inventory_collection.insert_one(user_doc))
+    invalidate_cache(user_id=user_doc["_id"])
+    return result
+
+async def insert_pokemon_data(pokemon_doc):
+    """Store a newly obtained Pokémon document"""
+    return await run_query(pokemon_collection.insert_one(pokemon_doc))
+
+async def lease_unique_ids(count):
+    """Atomically reserve a block of caught Pokémon IDs; returns (first, last)"""
+    # A single $inc hands each caller (any process or shard) a disjoint range
+    unique_id_doc = await run_query(unique_id_collection.find_one_and_update(
+        {},
+        {"$inc": {"last_id": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    ))
+    last = unique_id_doc["last_id"]
+    return last - count + 1, last
+
+async def get_config_data(config_id):
+    """Get a document from the config collection"""
+    return await run_query(config_collection.find_one({"_id": config_id}))
+
+async def get_all_config_data():
+    """Every document in the config collection"""
+    return await run_query(config_collection.find({}).to_list(length=None))
+
+async def get_all_emoji_data():
+    """Every document in the emojis collection"""
+    return await run_query(emoji_collection.find({}).to_list(length=None))
+
+def watch_collections(collection_names):
+    """Change stream over the given collections of the bot database"""
+    return async_db.watch([{"$match": {"ns.coll": {"$in": list(collection_names)}}}])
+
+async def get_move_data(move_name):
+    """Get a move by its normalized name"""
+    return await run_query(move_collection.find_one({"name": move_name}))
+
+async def get_ability_data(ability_name):
+    """Get an ability by its normalized name"""
+    return await run_query(ability_collection.find_one({"name": ability_name}))
+
+async def bulk_update_pokemon(updates):
+    """Apply {pokemon_id: update_query} to many Pokémon in one unordered bulk write
+    
+    Raises BulkWriteError when some updates fail; the rest are still applied and
+    mirrored (see failed_update_ids).
+    """
+    if not updates:
+        return None
+    
+    operations = [UpdateOne({"_id": pokemon_id}, update_query) for pokemon_id, update_query in updates.items()]
+    try:
+        result = await run_query(pokemon_collection.bulk_write(operations, ordered=False))
+    except BulkWriteError as e:
+        failed_ids = failed_update_ids(e, updates)
+        await _mirror_box_summaries({
+            pokemon_id: update_query for pokemon_id, update_query in updates.items() if pokemon_id not in failed_ids
+        })
+        raise
+    finally:
+        # Also after a failure or timeout - part of the batch may have been written
+        for pokemon_id in updates:
+            invalidate_cache(pokemon_id=pokemon_id)
+    
+    await _mirror_box_summaries(updates)
+    return result
+
+def failed_update_ids(error, updates):
+    """IDs of the updates a bulk_update_pokemon BulkWriteError reports as not applied"""
+    pokemon_ids = list(updates)
+    return {pokemon_ids[write_error["index"]] for write_error in error.details.get("writeErrors", ())}
+
+async def _mirror_box_summaries(updates):
+    """Apply the summary part of already-written Pokémon updates (level-ups etc.)"""
+    summary_operations = []
+    for pokemon_id, update_query in updates.items():
+        changes = summary_changes(update_query)
+        if changes:
+            summary_operations.append(UpdateOne({"_id": pokemon_id}, {"$set": changes}))
+    if not summary_operations:
+        return
+    try:
+        await run_query(box_summary_collection.bulk_write(summary_operations, ordered=False))
+    except Exception as e:
+        # The Pokémon are already updated; a stale row is fixed by the next box rebuild
+        print(f"Error updating box summaries: {e}")
+
+async def consume_ball(user_id, ball_field):
+    """Atomically use one ball; returns the updated ball counts, or None if none were left"""
+    # The $gt guard makes concurrent uses/purchases safe - counts can never go negative
+    ball_counts = await run_query(inventory_collection.find_one_and_update(
+        {"_id": user_id, ball_field: {"$gt": 0}},
+        {"$inc": {ball_field: -1}},
+        projection=BALL_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    ))
+    invalidate_cache(user_id=user_id)
+    return ball_counts
+
+# Ball counts plus caught_count, which after the $inc is the new Pokémon's box number
+CATCH_PROJECTION = {**BALL_PROJECTION, "caught_count": 1}
+
+async def _record_catch_transaction(user_id, guard, inventory_update, pokemon_doc):
+    async def catch_in_transaction(session):
+        ball_counts = await inventory_collection.find_one_and_update(
+            guard,
+            inventory_update,
+            projection=CATCH_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if ball_counts is None:
+            await session.abort_transaction()
+            return None
+        pokemon_doc.update(owner_id=user_id, ordinal=ball_counts["caught_count"])
+        await pokemon_collection.insert_one(pokemon_doc, session=session)
+        await box_summary_collection.insert_one(
+            build_box_summary(pokemon_doc, user_id, pokemon_doc["ordinal"]),
+            session=session
+        )
+        return ball_counts
+
+    # with_transaction reruns the callback on TransientTransactionError (e.g. a write
+    # conflict with a concurrent %buy on the same inventory) and retries the commit
+    async with await async_client.start_session() as session:
+        return await session.with_transaction(catch_in_transaction)
+
+async def record_catch(user_id, ball_field, earnings, pokemon_doc):
+    """Use the ball, award earnings, number the Pokémon and insert it as one unit
+
+    Runs as a transaction when the deployment supports it. Otherwise the Pokémon is
+    inserted first and removed again if the guarded inventory update does not match.
+    Returns the updated ball counts, or None if the trainer had no ball left.
+    """
+    global _transactions_supported
+    guard = {"_id": user_id, ball_field: {"$gt": 0}}
+    inventory_update = {
+        "$inc": {ball_field: -1, "Pokedollars": earnings, "caught_count": 1}
+    }
+
+    try:
+        if _transactions_supported is not False:
+            try:
+                ball_counts = await run_query(_record_catch_transaction(user_id, guard, inventory_update, pokemon_doc))
+                _transactions_supported = True
+                return ball_counts
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                _transactions_supported = False
+                print("MongoDB transactions unavailable - recording catches without them")
+
+        # Owned but unnumbered until the guarded update hands out the box number
+        pokemon_doc["owner_id"] = user_id
+        await run_query(pokemon_collection.insert_one(pokemon_doc))
+        ball_counts = await run_query(inventory_collection.find_one_and_update(
+            guard,
+            inventory_update,
+            projection=CATCH_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        ))
+        if ball_counts is None:
+            await run_query(pokemon_collection.delete_one({"_id": pokemon_doc["_id"]}))
+            return None
+        pokemon_doc["ordinal"] = ball_counts["caught_count"]
+        await run_query(pokemon_collection.update_one({"_id": pokemon_doc["_id"]}, {"$set": {"ordinal": pokemon_doc["ordinal"]}}))
+        await insert_box_summary(build_box_summary(pokemon_doc, user_id, pokemon_doc["ordinal"]))
+        return ball_counts
+    finally:
+        invalidate_cache(user_id=user_id, pokemon_id=pokemon_doc["_id"])
+
+async def insert_box_summary(summary):
+    """Store the %box row for a newly obtained Pokémon"""
+    return await run_query(box_summary_collection.insert_one(summary))
+
+async def ensure_indexes():
+    """Create every index in utils.indexes (no-op when they already exist)"""
+    from utils.indexes import REQUIRED_INDEXES
+    for collection_name, keys, options in REQUIRED_INDEXES:
+        try:
+            await run_query(async_db[collection_name].create_index(keys, **options))
+        except Exception as e:
+            # One bad index (e.g. duplicate data under a unique key) shouldn't block the rest
+            print(f"Failed to create index {keys} on {collection_name}: {e}")
+
+async def get_box_page(owner_id, first_ordinal, count):
+    """Box summaries numbered first_ordinal .. first_ordinal + count - 1, in box order"""
+    cursor = box_summary_collection.find(
+        {"owner_id": owner_id, "ordinal": {"$gte": first_ordinal, "$lt": first_ordinal + count}}
+    ).sort("ordinal", ASCENDING)
+    summaries = await run_query(cursor.to_list(length=count))
+    record_read(summaries)
+    return summaries
+
+async def rebuild_box_summaries(owner_id):
+    """Regenerate a trainer's box summaries from their numbered Pokémon"""
+    cursor = pokemon_collection.find(
+        numbered_pokemon_filter(owner_id), SUMMARY_SOURCE_PROJECTION
+    ).sort("ordinal", ASCENDING)
+    operations = summary_upserts(owner_id, await run_query(cursor.to_list(length=None)))
+    
+    # Drop rows that no longer match before re-inserting, so (owner, ordinal) stays unique
+    await run_query(box_summary_collection.delete_many({"owner_id": owner_id}))
+    for start in range(0, len(operations), BOX_REBUILD_CHUNK):
+        await run_query(box_summary_collection.bulk_write(operations[start:start + BOX_REBUILD_CHUNK], ordered=False))
+    return len(operations)
+
+async def migrate_caught_pokemon(owner_id, caught_id_list):
+    """Number a trainer's Pokémon from the legacy caught_pokemon array and drop the array"""
+    operations = ordinal_updates(owner_id, caught_id_list)
+    for start in range(0, len(operations), BOX_REBUILD_CHUNK):
+        await run_query(pokemon_collection.bulk_write(operations[start:start + BOX_REBUILD_CHUNK], ordered=False))
+    
+    await run_query(inventory_collection.update_one(
+        {"_id": owner_id, **LEGACY_TRAINER_FILTER}, legacy_inventory_update(caught_id_list)
+    ))
+    await rebuild_box_summaries(owner_id)
+    invalidate_cache(user_id=owner_id)
+
+async def migrate_legacy_trainers():
+    """One-time startup migration of every trainer still on the caught_pokemon array"""
+    migrated = 0
+    async for user in inventory_collection.find(LEGACY_TRAINER_FILTER, {"caught_pokemon": 1}):
+        await migrate_caught_pokemon(user["_id"], user["caught_pokemon"])
+        migrated += 1
+    if migrated:
+        print(f"Migrated {migrated} trainers off the legacy caught_pokemon array")
+    return migrated
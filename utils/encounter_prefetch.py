@@ -0,0 +1,156 @@
+# utils/encounter_prefetch.py
+import math
+import time
+import asyncio
+from collections import deque, namedtuple
+
+# Everything %search needs that does not depend on who is searching
+PreparedEncounter = namedtuple("PreparedEncounter", [
+    "species", "shiny", "level", "sprite_url",
+    "image_bytes", "is_animated", "file_ext", "catalog_version", "created_at"
+])
+
+# Queue depth bounds per (shard, environment mode)
+PREFETCH_MIN_DEPTH = 1
+PREFETCH_MAX_DEPTH = 12
+
+# Searches counted towards the demand rate
+PREFETCH_RATE_WINDOW = 60
+
+# Extra queued encounters per search/minute of recent demand
+PREFETCH_SEARCHES_PER_SLOT = 6
+
+# Prepared encounters older than this are thrown away (sprite/render caches may have moved on)
+PREFETCH_MAX_AGE = 15 * 60
+
+# Queues nobody has searched from for this long stop being refilled
+PREFETCH_IDLE_AFTER = 10 * 60
+
+class EncounterPrefetcher:
+    """Keeps small per-(shard, mode) queues of pre-rolled, pre-rendered encounters
+
+    prepare(environment_mode) is the same coroutine %search uses inline; the producer
+    only calls it when a queue is below its target depth, so a cold or saturated
+    prefetcher just means %search falls back to preparing inline.
+    """
+
+    def __init__(self, prepare, current_version, can_prepare=None):
+        self.prepare = prepare
+        self.current_version = current_version  # callable -> catalog version
+        self.can_prepare = can_prepare or (lambda: True)
+        self.queues = {}    # (shard_id, mode) -> deque of PreparedEncounter
+        self.demand = {}    # (shard_id, mode) -> deque of search timestamps
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._produce())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def clear(self):
+        """Drop every queued encounter (e.g. after a catalog reload)"""
+        for queue in self.queues.values():
+            self.dropped += len(queue)
+            queue.clear()
+        self._wakeup.set()
+
+    def target_depth(self, key, now=None):
+        """Queue depth that keeps up with the recent search rate for this key"""
+        now = now or time.time()
+        timestamps = self.demand.get(key)
+        if not timestamps:
+            return 0
+
+        while timestamps and now - timestamps[0] > PREFETCH_RATE_WINDOW:
+            timestamps.popleft()
+        if not timestamps:
+            return 0
+
+        per_minute = len(timestamps) * 60 / PREFETCH_RATE_WINDOW
+        depth = PREFETCH_MIN_DEPTH + math.ceil(per_minute / PREFETCH_SEARCHES_PER_SLOT)
+        return min(PREFETCH_MAX_DEPTH, depth)
+
+    def _is_fresh(self, encounter, now):
+        return (encounter.catalog_version == self.current_version()
+                and now - encounter.created_at <= PREFETCH_MAX_AGE)
+
+    def pop(self, shard_id, environment_mode):
+        """Take a ready encounter, or None if the queue is empty"""
+        key = (shard_id, environment_mode)
+        now = time.time()
+        self.demand.setdefault(key, deque()).append(now)
+        queue = self.queues.setdefault(key, deque())
+
+        try:
+            while queue:
+                encounter = queue.popleft()
+                if self._is_fresh(encounter, now):
+                    self.hits += 1
+                    return encounter
+                self.dropped += 1
+
+            self.misses += 1
+            return None
+        finally:
+            # Refill (and adapt depth to the new demand) in the background
+            self._wakeup.set()
+
+    def _next_key(self, now):
+        """Key whose queue is furthest below its target, or None"""
+        best_key, best_gap = None, 0
+        for key, timestamps in self.demand.items():
+            if not timestamps or now - timestamps[-1] > PREFETCH_IDLE_AFTER:
+                continue
+            queue = self.queues.setdefault(key, deque())
+            gap = self.target_depth(key, now) - len(queue)
+            if gap > best_gap:
+                best_key, best_gap = key, gap
+        return best_key
+
+    async def _produce(self):
+        while True:
+            now = time.time()
+            key = self._next_key(now)
+
+            if key is None or not self.can_prepare():
+                # Nothing to do (or the render pool is busy with live searches)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                encounter = await self.prepare(key[1])
+            except Exception as e:
+                print(f"Error prefetching encounter: {e}")
+                await asyncio.sleep(5)
+                continue
+
+            if encounter is None:
+                continue
+            # A render that fell back to the plain sprite is not worth keeping
+            if key[1] in ("static", "animated") and encounter.sprite_url and encounter.image_bytes is None:
+                self.dropped += 1
+                continue
+            self.queues[key].append(encounter)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "queued": {f"{shard}/{mode}": len(queue) for (shard, mode), queue in self.queues.items()},
+            "targets": {f"{shard}/{mode}": self.target_depth((shard, mode)) for shard, mode in list(self.demand)},
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "dropped": self.dropped
+        }
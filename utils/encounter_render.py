@@ -0,0 +1,302 @@
+# utils/encounter_render.py
+"""CPU-bound encounter compositing.
+
+Everything here is synchronous and picklable so it can run in the render worker
+processes (utils/render_pool.py). Each worker keeps its own decoded-sprite LRU and
+maps the shared background atlas files.
+"""
+import io
+import os
+import time
+import cv2
+import numpy as np
+from PIL import Image
+from utils.sprite_store import get_decoded_sprite
+from utils.background_atlas import get_background
+
+# Animated output formats in order of preference (gif, webp, apng); checked against ANIMATED_ENCODERS below
+ANIMATED_FORMATS = tuple(
+    fmt.strip().lower() for fmt in os.getenv("ENCOUNTER_ANIMATED_FORMATS", "gif,webp,apng").split(",") if fmt.strip()
+)
+
+# A format is accepted as soon as its output fits this many bytes...
+ANIMATED_BYTE_BUDGET = int(os.getenv("ENCOUNTER_ANIMATED_BYTE_BUDGET", 512 * 1024))
+
+# ...and no further formats are tried once this much encode time has been spent
+ANIMATED_ENCODE_BUDGET_MS = float(os.getenv("ENCOUNTER_ANIMATED_ENCODE_BUDGET_MS", 250))
+
+ANIMATED_WEBP_QUALITY = 80
+
+# File extension Discord needs for each output format
+FORMAT_EXTENSIONS = {"png": "png", "gif": "gif", "webp": "webp", "apng": "png"}
+
+# cv2.resize handles at most this many channels per call
+CV_MAX_CHANNELS = 512
+
+def paste_position(bg_width, bg_height, spr_width, spr_height, position="bottom_center"):
+    """Top-left corner for a sprite on the background"""
+    if position == "center":
+        return (bg_width - spr_width) // 2, (bg_height - spr_height) // 2
+    # Default to bottom center
+    return (bg_width - spr_width) // 2, bg_height - spr_height - (bg_height // 10)
+
+def resize_stack(stack, new_size, interpolation=cv2.INTER_LANCZOS4):
+    """Resize an (N, h, w, C) frame stack, packing frames into channels so each
+    cv2.resize call handles many frames at once"""
+    frame_count, height, width, channels = stack.shape
+    if (width, height) == tuple(new_size):
+        return stack
+
+    new_width, new_height = new_size
+    per_call = max(1, CV_MAX_CHANNELS // channels)
+    resized = []
+    for start in range(0, frame_count, per_call):
+        chunk = stack[start:start + per_call]
+        count = chunk.shape[0]
+        packed = np.ascontiguousarray(chunk.transpose(1, 2, 0, 3)).reshape(height, width, count * channels)
+        packed = cv2.resize(packed, (new_width, new_height), interpolation=interpolation)
+        resized.append(packed.reshape(new_height, new_width, count, channels).transpose(2, 0, 1, 3))
+    return np.concatenate(resized)
+
+def blend_stack(background, sprite_stack, paste_x, paste_y):
+    """Alpha-blend a premultiplied float (N, h, w, 4) stack onto an RGB background;
+    returns a uint8 (N, H, W, 3) stack"""
+    frame_count, spr_height, spr_width = sprite_stack.shape[:3]
+    bg_height, bg_width = background.shape[:2]
+    frames = np.repeat(background[np.newaxis, :, :, :3], frame_count, axis=0)
+
+    # Clip the paste rectangle to the background
+    roi_y_start, roi_y_end = max(0, paste_y), min(bg_height, paste_y + spr_height)
+    roi_x_start, roi_x_end = max(0, paste_x), min(bg_width, paste_x + spr_width)
+    if roi_y_start >= roi_y_end or roi_x_start >= roi_x_end:
+        return frames
+
+    sprite_y_start = roi_y_start - paste_y
+    sprite_x_start = roi_x_start - paste_x
+    sprite_part = sprite_stack[:, sprite_y_start:sprite_y_start + (roi_y_end - roi_y_start),
+                               sprite_x_start:sprite_x_start + (roi_x_end - roi_x_start)]
+
+    roi = frames[:, roi_y_start:roi_y_end, roi_x_start:roi_x_end].astype(np.float32)
+    roi *= 1.0 - sprite_part[..., 3:4]
+    roi += sprite_part[..., :3] * 255.0
+    frames[:, roi_y_start:roi_y_end, roi_x_start:roi_x_end] = np.clip(roi + 0.5, 0, 255).astype(np.uint8)
+    return frames
+
+def encode_gif(frames, durations):
+    # Palette is already shared and optimal, so skip Pillow's optimize pass
+    images = quantize_stack(frames)
+    final_buffer = io.BytesIO()
+    images[0].save(
+        final_buffer,
+        format="GIF",
+        save_all=True,
+        append_images=images[1:],
+        optimize=False,
+        duration=durations,
+        loop=0,
+        disposal=2
+    )
+    return final_buffer.getvalue()
+
+def encode_webp(frames, durations):
+    images = [Image.fromarray(frame, "RGB") for frame in frames]
+    final_buffer = io.BytesIO()
+    images[0].save(
+        final_buffer,
+        format="WEBP",
+        save_all=True,
+        append_images=images[1:],
+        duration=durations,
+        loop=0,
+        quality=ANIMATED_WEBP_QUALITY,
+        method=4
+    )
+    return final_buffer.getvalue()
+
+def encode_apng(frames, durations):
+    images = [Image.fromarray(frame, "RGB") for frame in frames]
+    final_buffer = io.BytesIO()
+    images[0].save(
+        final_buffer,
+        format="PNG",
+        save_all=True,
+        append_images=images[1:],
+        duration=durations,
+        loop=0,
+        compress_level=6
+    )
+    return final_buffer.getvalue()
+
+ANIMATED_ENCODERS = {"gif": encode_gif, "webp": encode_webp, "apng": encode_apng}
+
+def _known_formats(formats):
+    """Drop format names with no encoder (a typo would fail every animated render)"""
+    unknown = [fmt for fmt in formats if fmt not in ANIMATED_ENCODERS]
+    if unknown:
+        print(f"Ignoring unknown ENCOUNTER_ANIMATED_FORMATS {unknown} (known: {', '.join(ANIMATED_ENCODERS)})")
+    return tuple(fmt for fmt in formats if fmt in ANIMATED_ENCODERS) or ("gif",)
+
+ANIMATED_FORMATS = _known_formats(ANIMATED_FORMATS)
+
+def encode_animated(frames, durations, formats=None, byte_budget=None, time_budget_ms=None):
+    """Encode a uint8 (N, H, W, 3) stack in the first preferred format that fits the
+    byte budget; once the encode-time budget is spent, the smallest result so far wins.
+
+    Returns (data, format, attempts) where attempts lists (format, encode_ms, bytes).
+    """
+    formats = formats or ANIMATED_FORMATS
+    byte_budget = ANIMATED_BYTE_BUDGET if byte_budget is None else byte_budget
+    time_budget_ms = ANIMATED_ENCODE_BUDGET_MS if time_budget_ms is None else time_budget_ms
+
+    best = None
+    attempts = []
+    spent_ms = 0.0
+    for fmt in formats:
+        start = time.perf_counter()
+        data = ANIMATED_ENCODERS[fmt](frames, durations)
+        encode_ms = (time.perf_counter() - start) * 1000
+        spent_ms += encode_ms
+        attempts.append((fmt, round(encode_ms, 1), len(data)))
+
+        if len(data) <= byte_budget:
+            return data, fmt, attempts
+        if best is None or len(data) < len(best[0]):
+            best = (data, fmt)
+        if spent_ms >= time_budget_ms:
+            break
+
+    return best[0], best[1], attempts
+
+def quantize_stack(frames, colors=256):
+    """Quantize every frame with one shared palette computed in a single pass"""
+    frame_count, height, width = frames.shape[:3]
+    mosaic = Image.fromarray(frames.reshape(frame_count * height, width, 3), "RGB")
+    paletted = mosaic.quantize(colors=colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    palette = paletted.getpalette()
+    indices = np.asarray(paletted).reshape(frame_count, height, width)
+
+    images = []
+    for frame_indices in indices:
+        image = Image.fromarray(frame_indices, "P")
+        image.putpalette(palette)
+        images.append(image)
+    return images
+
+def composite_animated(sprite, background, sprite_scale, position="bottom_center", formats=None):
+    """Composite every frame of an animated sprite onto an RGBA background;
+    returns (data, format, attempts) from encode_animated"""
+    stack = np.stack(sprite.frames).astype(np.float32)
+    stack *= 1.0 / 255.0
+    # Premultiply so resampling does not bleed colour from transparent pixels
+    stack[..., :3] *= stack[..., 3:4]
+
+    height, width = stack.shape[1:3]
+    stack = resize_stack(stack, (int(width * sprite_scale), int(height * sprite_scale)))
+    np.clip(stack, 0.0, 1.0, out=stack)
+
+    bg_height, bg_width = background.shape[:2]
+    paste_x, paste_y = paste_position(bg_width, bg_height, stack.shape[2], stack.shape[1], position)
+    frames = blend_stack(background, stack, paste_x, paste_y)
+    return encode_animated(frames, list(sprite.durations), formats)
+
+def render_encounter(
+    sprite_sha: str,
+    sprite_data: bytes,
+    background_folder: str,
+    background_index: int,
+    static_sprite_scale: float = 2.0,
+    animated_sprite_scale: float = 3.0,
+    position: str = "bottom_center",
+    bg_size: tuple = (640, 360),
+    is_animated_allowed: bool = False
+) -> tuple[bytes, bool, str, dict]:
+    """Composite a sprite onto a background; returns (encoded bytes, is_animated, file extension, encode metrics)"""
+    # Decoded frames come from the in-memory LRU for recently seen sprites
+    sprite = get_decoded_sprite(sprite_sha, sprite_data)
+    is_animated = sprite.is_animated
+
+    # Animated sprites: whole frame stack composited at once with NumPy
+    if is_animated and is_animated_allowed:
+        background = get_background(background_folder, bg_size, "RGBA", background_index)
+        data, fmt, attempts = composite_animated(sprite, background, animated_sprite_scale, position)
+        metrics = {"format": fmt, "bytes": len(data), "encode_ms": sum(a[1] for a in attempts), "attempts": attempts}
+        return data, True, FORMAT_EXTENSIONS[fmt], metrics
+
+    else:
+        # Use OpenCV for static images with smaller scale factor
+        sprite_scale = static_sprite_scale
+
+        # First frame (the only one for static sprites), RGBA to BGRA for OpenCV
+        sprite_array = cv2.cvtColor(sprite.frames[0], cv2.COLOR_RGBA2BGRA)
+
+        # Background is already BGRA at bg_size (copy from the shared atlas)
+        bg = get_background(background_folder, bg_size, "BGRA", background_index)
+        bg_height, bg_width = bg.shape[:2]
+
+        # Resize sprite
+        h, w = sprite_array.shape[:2]
+        sprite_array = cv2.resize(sprite_array, (int(w * sprite_scale), int(h * sprite_scale)))
+
+        # Same placement rule as the animated path
+        spr_height, spr_width = sprite_array.shape[:2]
+        paste_x, paste_y = paste_position(bg_width, bg_height, spr_width, spr_height, position)
+
+        # Convert background to BGRA if needed
+        if bg.shape[2] == 3:
+            bg = cv2.cvtColor(bg, cv2.COLOR_BGR2BGRA)
+
+        # Create ROI and handle edge cases
+        roi_y_start = max(0, paste_y)
+        roi_y_end = min(bg_height, paste_y + spr_height)
+        roi_x_start = max(0, paste_x)
+        roi_x_end = min(bg_width, paste_x + spr_width)
+
+        # Adjust sprite selection if paste position is negative
+        sprite_y_start = abs(min(0, paste_y))
+        sprite_x_start = abs(min(0, paste_x))
+        sprite_y_end = sprite_y_start + (roi_y_end - roi_y_start)
+        sprite_x_end = sprite_x_start + (roi_x_end - roi_x_start)
+
+        # Alpha blending (much faster than PIL paste)
+        roi = bg[roi_y_start:roi_y_end, roi_x_start:roi_x_end]
+        sprite_part = sprite_array[sprite_y_start:sprite_y_end, sprite_x_start:sprite_x_end]
+
+        # Apply alpha blending
+        alpha = sprite_part[:, :, 3] / 255.0
+        for c in range(0, 3):
+            roi[:, :, c] = sprite_part[:, :, c] * alpha + roi[:, :, c] * (1 - alpha)
+
+        # Encode to PNG
+        start = time.perf_counter()
+        _, encoded_img = cv2.imencode('.png', bg, [cv2.IMWRITE_PNG_COMPRESSION, 6])
+        encode_ms = round((time.perf_counter() - start) * 1000, 1)
+        data = encoded_img.tobytes()
+        metrics = {"format": "png", "bytes": len(data), "encode_ms": encode_ms, "attempts": [("png", encode_ms, len(data))]}
+        return data, False, "png", metrics
+
+class EncodeStats:
+    """Encode time and output size per format, aggregated in the bot process"""
+
+    def __init__(self):
+        self.formats = {}  # format -> {"chosen", "attempts", "encode_ms", "bytes"}
+
+    def record(self, metrics):
+        for fmt, encode_ms, size in metrics["attempts"]:
+            entry = self.formats.setdefault(fmt, {"chosen": 0, "attempts": 0, "encode_ms": 0.0, "bytes": 0})
+            entry["attempts"] += 1
+            entry["encode_ms"] += encode_ms
+            entry["bytes"] += size
+        self.formats[metrics["format"]]["chosen"] += 1
+
+    def stats(self):
+        return {
+            fmt: {
+                "chosen": entry["chosen"],
+                "attempts": entry["attempts"],
+                "avg_encode_ms": entry["encode_ms"] / entry["attempts"],
+                "avg_kb": entry["bytes"] / entry["attempts"] / 1024
+            }
+            for fmt, entry in self.formats.items()
+        }
+
+encode_stats = EncodeStats()
@@ -0,0 +1,103 @@
+# utils/encounter_sampler.py
+import random
+
+# Chance of each rarity tier per wild roll (relative weights)
+RARITY_WEIGHTS = {"Normal": 98.95, "Mythical": 1.0, "Legendary": 0.05}
+
+# 1 in SHINY_ODDS wild Pokémon is shiny
+SHINY_ODDS = 4096
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) build, O(1) weighted sampling"""
+    __slots__ = ("items", "prob", "alias")
+
+    def __init__(self, items, weights):
+        if not items:
+            raise ValueError("Alias table needs at least one item")
+        if len(items) != len(weights):
+            raise ValueError("Alias table items and weights differ in length")
+
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("Alias table weights must sum to a positive value")
+
+        n = len(items)
+        scaled = [w * n / total for w in weights]
+        prob = [0.0] * n
+        alias = [0] * n
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        # Leftovers are 1.0 up to floating-point error
+        for i in large + small:
+            prob[i] = 1.0
+            alias[i] = i
+
+        self.items = tuple(items)
+        self.prob = prob
+        self.alias = alias
+
+    def __len__(self):
+        return len(self.items)
+
+    def sample(self, rng=random):
+        i = rng.randrange(len(self.items))
+        return self.items[i] if rng.random() < self.prob[i] else self.items[self.alias[i]]
+
+class EncounterSampler:
+    """Rarity tier x species alias tables plus the shiny roll; no I/O per roll
+
+    pools maps rarity tier -> list of species records. species_weights optionally maps
+    Pokédex ID -> relative weight within its tier (default 1), which is also how
+    biome-specific tables can be built later: one sampler per biome.
+    """
+
+    def __init__(self, pools, rarity_weights=RARITY_WEIGHTS, species_weights=None,
+                 shiny_odds=SHINY_ODDS, seed=None, version=None):
+        species_weights = species_weights or {}
+        self.rng = random.Random(seed)
+        self.shiny_odds = shiny_odds
+        self.version = version
+
+        self.species_tables = {}
+        for tier, records in pools.items():
+            weights = [species_weights.get(record["id"], 1.0) for record in records]
+            # Tiers with no species (or only zero weights) are never rolled
+            if records and sum(weights) > 0:
+                self.species_tables[tier] = AliasTable(records, weights)
+
+        tiers = [tier for tier in self.species_tables if rarity_weights.get(tier, 0) > 0]
+        self.tier_table = AliasTable(tiers, [rarity_weights[tier] for tier in tiers])
+
+    def roll_tier(self):
+        return self.tier_table.sample(self.rng)
+
+    def roll_shiny(self):
+        return self.rng.randrange(self.shiny_odds) == 0
+
+    def roll(self):
+        """Return (species record, shiny)"""
+        species = self.species_tables[self.roll_tier()].sample(self.rng)
+        return species, self.roll_shiny()
+
+def build_wild_sampler(seed=None, species_weights=None):
+    """Build the wild-encounter sampler from the current catalog's rarity pools"""
+    from utils.species_catalog import get_catalog
+    from utils.encounter_utils import initialize_wild_pool
+
+    catalog = get_catalog()
+    normal_ID_list, mythical_ID_list, legendary_ID_list = initialize_wild_pool()
+    pools = {
+        "Normal": [catalog.get_by_id(pokemon_id) for pokemon_id in normal_ID_list],
+        "Mythical": [catalog.get_by_id(pokemon_id) for pokemon_id in mythical_ID_list],
+        "Legendary": [catalog.get_by_id(pokemon_id) for pokemon_id in legendary_ID_list]
+    }
+    return EncounterSampler(pools, species_weights=species_weights, seed=seed, version=catalog.version)
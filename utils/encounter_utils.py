@@ -2,16 +2,15 @@
 import discord
 import random
 import io
-import os
 import aiohttp
 import asyncio
-from PIL import Image
-import cv2
-import numpy as np
-from config import inventory_collection, db, move_collection
+from utils import config_snapshot
+from utils.sprite_store import fetch_sprite, lookup_sprite_sha
+from utils.background_atlas import background_names, background_version
+from utils.render_cache import render_cache, render_cache_key
+from utils.encounter_render import render_encounter, encode_stats
+from utils.render_pool import render_pool
 
-# Cache for sprite validation
-sprite_cache = {}
 session = None
 
 async def initialize_session():
@@ -23,47 +22,18 @@ async def initialize_session():
 
 def get_emoji(emoji_type):
     """Retrieve emoji for a given type"""
-    emoji_data = db.emojis.find_one({"_id": emoji_type})
-    return emoji_data["emoji"] if emoji_data else "🔍"
+    # Served from the in-memory config snapshot (no database round-trip)
+    return config_snapshot.get_emoji(emoji_type)
 
 def initialize_wild_pool():
     """Initialize pools of Pokémon IDs by rarity"""
-    pokemon_list = list(db.pokemon.find({}, {"id": 1, "rarity": 1}))
+    from utils.species_catalog import get_catalog
+    pokemon_list = list(get_catalog())
     normal_ID_list = [pokemon["id"] for pokemon in pokemon_list if pokemon.get('rarity') == "Normal"]
     mythical_ID_list = [pokemon["id"] for pokemon in pokemon_list if pokemon.get('rarity') == "Mythical"]
     legendary_ID_list = [pokemon["id"] for pokemon in pokemon_list if pokemon.get('rarity') == "Legendary"]
     return normal_ID_list, mythical_ID_list, legendary_ID_list
 
-def choose_random_wild(normal_ID_list, mythical_ID_list, legendary_ID_list):
-    """Choose a random wild Pokémon with appropriate rarity and shiny chances"""
-    from utils.pokemon_utils import search_pokemon_by_id
-    
-    # Choose rarity with appropriate weights
-    rarity_choice = random.choices(
-        ["normal", "mythical", "legendary"],
-        weights=[98.95, 1.0, 0.05],  # Adjusted for better balance
-        k=1
-    )[0]
-    
-    # Determine if shiny (1/4096 chance)
-    shiny = random.choices(
-        [True, False],
-        weights=[1, 4095],
-        k=1
-    )[0]
-    
-    # Select Pokémon based on rarity
-    if rarity_choice == "normal":
-        chosen_id = random.choice(normal_ID_list)
-    elif rarity_choice == "mythical":
-        chosen_id = random.choice(mythical_ID_list)
-    else:  # legendary
-        chosen_id = random.choice(legendary_ID_list)
-    
-    # Get the full Pokémon data
-    pokemon = search_pokemon_by_id(chosen_id)
-    return pokemon, shiny
-
 async def generate_encounter_image(
     sprite_url: str,
     background_folder: str = "assets/backgrounds",
@@ -72,164 +42,59 @@ async def generate_encounter_image(
     position: str = "bottom_center",
     bg_size: tuple = (640, 360),
     is_animated_allowed: bool = False
-) -> tuple[io.BytesIO, bool]:
-    """Generate a composite image for encounters with Pokémon sprite on background"""
+) -> tuple[io.BytesIO, bool, str]:
+    """Generate a composite image for encounters; returns (image buffer, is_animated, file extension)"""
     try:
-        # Get a random background
-        background_files = [f for f in os.listdir(background_folder)
-                          if os.path.isfile(os.path.join(background_folder, f))]
-        chosen_background_path = os.path.join(background_folder, random.choice(background_files))
+        # Pick a random background (decoded and resized once, served from the atlas)
+        backgrounds = background_names(background_folder, bg_size)
+        background_index = random.randrange(len(backgrounds))
+        background_key = background_version(background_folder, bg_size, index=background_index)
+        render_params = (static_sprite_scale, animated_sprite_scale, position, tuple(bg_size))
         
-        # Fetch sprite data
-        async with aiohttp.ClientSession() as session:
-            async with session.get(sprite_url) as response:
-                if response.status != 200:
-                    return None, False
-                sprite_data = await response.read()
+        # Previously rendered combination: just a byte copy from the render cache
+        sprite_sha = lookup_sprite_sha(sprite_url)
+        if sprite_sha:
+            cache_key = render_cache_key(sprite_sha, background_key, is_animated_allowed, render_params)
+            cached = await asyncio.to_thread(render_cache.get, cache_key)
+            if cached is not None:
+                return io.BytesIO(cached[0]), cached[1], cached[2]
         
-        # Check if sprite is GIF and if animated processing is allowed
-        sprite_image = Image.open(io.BytesIO(sprite_data))
-        is_animated = sprite_image.format == "GIF" and getattr(sprite_image, "is_animated", False)
+        # Fetch sprite data (content-addressed disk store - network only on first sight)
+        fetched = await fetch_sprite(sprite_url)
+        if fetched is None:
+            return None, False, None
+        sprite_sha, sprite_data = fetched
+        cache_key = render_cache_key(sprite_sha, background_key, is_animated_allowed, render_params)
         
-        # For animated GIFs, use Pillow
-        if is_animated and is_animated_allowed:
-            # Use higher scale factor for animated
-            sprite_scale = animated_sprite_scale
-            
-            # Process with Pillow (existing animated GIF code)
-            background = Image.open(chosen_background_path).convert("RGBA")
-            background = background.resize(bg_size, Image.LANCZOS)
-            bg_width, bg_height = background.size
-            
-            frame_count = sprite_image.n_frames
-            frames = []
-            durations = []
-            
-            # Process each frame
-            for frame_idx in range(frame_count):
-                sprite_image.seek(frame_idx)
-                frame_duration = sprite_image.info.get('duration', 100)
-                durations.append(frame_duration)
-                
-                frame = sprite_image.convert("RGBA")
-                original_size = frame.size
-                new_size = (int(original_size[0] * sprite_scale), int(original_size[1] * sprite_scale))
-                frame = frame.resize(new_size, Image.LANCZOS)
-                
-                # Calculate position
-                spr_width, spr_height = frame.size
-                if position == "center":
-                    paste_x = (bg_width - spr_width) // 2
-                    paste_y = (bg_height - spr_height) // 2
-                elif position == "bottom_center":
-                    paste_x = (bg_width - spr_width) // 2
-                    paste_y = bg_height - spr_height - (bg_height // 10)
-                else:
-                    # Default to bottom center
-                    paste_x = (bg_width - spr_width) // 2
-                    paste_y = bg_height - spr_height - (bg_height // 10)
-                
-                new_frame = background.copy()
-                new_frame.paste(frame, (paste_x, paste_y), frame)
-                frames.append(new_frame)
-            
-            # Save as animated GIF
-            final_buffer = io.BytesIO()
-            frames[0].save(
-                final_buffer,
-                format="GIF",
-                save_all=True,
-                append_images=frames[1:],
-                optimize=True,
-                duration=durations,
-                loop=0,
-                disposal=2
-            )
-            final_buffer.seek(0)
-            return final_buffer, True
+        # Composite in a render worker process; None means the pool is saturated
+        result = await render_pool.submit(
+            render_encounter,
+            sprite_sha,
+            sprite_data,
+            background_folder,
+            background_index,
+            static_sprite_scale,
+            animated_sprite_scale,
+            position,
+            bg_size,
+            is_animated_allowed
+        )
+        if result is None:
+            return None, False, None
         
-        else:
-            # Use OpenCV for static images with smaller scale factor
-            sprite_scale = static_sprite_scale
-            
-            # Convert sprite to numpy array for OpenCV
-            if is_animated:
-                # Using first frame of GIF
-                sprite_image.seek(0)
-                sprite_pil = sprite_image.convert("RGBA")
-                sprite_array = np.array(sprite_pil)
-                # Convert RGBA to BGRA (OpenCV uses BGR ordering)
-                sprite_array = cv2.cvtColor(sprite_array, cv2.COLOR_RGBA2BGRA)
-            else:
-                # For static images, decode directly with OpenCV
-                sprite_bytes = np.frombuffer(sprite_data, np.uint8)
-                sprite_array = cv2.imdecode(sprite_bytes, cv2.IMREAD_UNCHANGED)
-                
-                # Add alpha channel if missing
-                if sprite_array.shape[2] == 3:
-                    sprite_array = cv2.cvtColor(sprite_array, cv2.COLOR_BGR2BGRA)
-            
-            # Read background with OpenCV (much faster than PIL)
-            bg = cv2.imread(chosen_background_path)
-            bg = cv2.resize(bg, bg_size)
-            bg_height, bg_width = bg.shape[:2]
-            
-            # Resize sprite
-            h, w = sprite_array.shape[:2]
-            sprite_array = cv2.resize(sprite_array, (int(w * sprite_scale), int(h * sprite_scale)))
-            
-            # Calculate position
-            spr_height, spr_width = sprite_array.shape[:2]
-            if position == "center":
-                paste_x = (bg_width - spr_width) // 2
-                paste_y = (bg_height - spr_height) // 2
-            elif position == "bottom_center":
-                paste_x = (bg_width - spr_width) // 2
-                paste_y = bg_height - spr_height - (bg_height // 10)
-            else:
-                paste_x = (bg_width - spr_width) // 2
-                paste_y = bg_height - spr_height - (bg_height // 10)
-            
-            # Convert background to BGRA if needed
-            if bg.shape[2] == 3:
-                bg = cv2.cvtColor(bg, cv2.COLOR_BGR2BGRA)
-            
-            # Create ROI and handle edge cases
-            roi_y_start = max(0, paste_y)
-            roi_y_end = min(bg_height, paste_y + spr_height)
-            roi_x_start = max(0, paste_x)
-            roi_x_end = min(bg_width, paste_x + spr_width)
-            
-            # Adjust sprite selection if paste position is negative
-            sprite_y_start = abs(min(0, paste_y))
-            sprite_x_start = abs(min(0, paste_x))
-            sprite_y_end = sprite_y_start + (roi_y_end - roi_y_start)
-            sprite_x_end = sprite_x_start + (roi_x_end - roi_x_start)
-            
-            # Alpha blending (much faster than PIL paste)
-            roi = bg[roi_y_start:roi_y_end, roi_x_start:roi_x_end]
-            sprite_part = sprite_array[sprite_y_start:sprite_y_end, sprite_x_start:sprite_x_end]
-            
-            # Apply alpha blending
-            alpha = sprite_part[:, :, 3] / 255.0
-            for c in range(0, 3):
-                roi[:, :, c] = sprite_part[:, :, c] * alpha + roi[:, :, c] * (1 - alpha)
-            
-            # Encode to PNG
-            final_buffer = io.BytesIO()
-            _, encoded_img = cv2.imencode('.png', bg, [cv2.IMWRITE_PNG_COMPRESSION, 6])
-            final_buffer.write(encoded_img)
-            final_buffer.seek(0)
-            return final_buffer, False
+        image_bytes, is_animated, file_ext, metrics = result
+        encode_stats.record(metrics)
+        await asyncio.to_thread(render_cache.set, cache_key, image_bytes, is_animated, file_ext)
+        return io.BytesIO(image_bytes), is_animated, file_ext
     
     except Exception as e:
         print(f"Error generating encounter image: {e}")
-        return None, False
+        return None, False, None
 
 class PokemonEncounterView(discord.ui.View):
     """Interactive view for Pokémon encounters and catching"""
     def __init__(self, ctx, name, pokeballs, greatballs, ultraballs, masterballs,
-                 base_catch_rate, ball_data, SHembed_editor, earnings, flee_chance):
+                 base_catch_rate, ball_data, SHembed_editor, earnings, flee_chance, catch_handler):
         super().__init__(timeout=60)  # 60 second timeout
         self.ctx = ctx
         self.name = name
@@ -242,6 +107,8 @@ class PokemonEncounterView(discord.ui.View):
         self.SHembed_editor = SHembed_editor
         self.earnings = earnings
         self.flee_chance = flee_chance
+        # async (ball_field, earnings) -> ball counts or None; writes the whole catch at once
+        self.catch_handler = catch_handler
         self.code = 0
         self.catch_result = None
         self.catch = None
@@ -315,7 +182,6 @@ class PokemonEncounterView(discord.ui.View):
             await interaction.response.send_message("This is not your Pokémon battle!", ephemeral=True)
             return
         
-        self.pokeballs -= 1
         await self._process_catch_attempt(interaction, self.ball_data["Pokeball"], "Pokeball")
     
     async def greatball_callback(self, interaction):
@@ -323,7 +189,6 @@ class PokemonEncounterView(discord.ui.View):
             await interaction.response.send_message("This is not your Pokémon battle!", ephemeral=True)
             return
         
-        self.greatballs -= 1
         await self._process_catch_attempt(interaction, self.ball_data["Greatball"], "Greatball")
     
     async def ultraball_callback(self, interaction):
@@ -331,7 +196,6 @@ class PokemonEncounterView(discord.ui.View):
             await interaction.response.send_message("This is not your Pokémon battle!", ephemeral=True)
             return
         
-        self.ultraballs -= 1
         await self._process_catch_attempt(interaction, self.ball_data["Ultraball"], "Ultraball")
     
     async def masterball_callback(self, interaction):
@@ -339,7 +203,6 @@ class PokemonEncounterView(discord.ui.View):
             await interaction.response.send_message("This is not your Pokémon battle!", ephemeral=True)
             return
         
-        self.masterballs -= 1
         await self._process_catch_attempt(interaction, self.ball_data["Masterball"], "Masterball")
     
     async def run_callback(self, interaction):
@@ -366,38 +229,49 @@ class PokemonEncounterView(discord.ui.View):
         try:
             print(f"Processing catch with {ball_name}, multiplier: {ball_multiplier}")
             
-            # Update inventory in MongoDB
-            from utils.db_utils import update_user_data
+            from utils.db_utils import consume_ball
             
-            await update_user_data(
-                str(self.ctx.author.id),
-                {"$set": {
-                    "Pokeballs": self.pokeballs,
-                    "Greatballs": self.greatballs,
-                    "Ultraballs": self.ultraballs,
-                    "Masterballs": self.masterballs
-                }}
-            )
+            # Acknowledge now: a catch can take several database round trips,
+            # which may not fit in Discord's 3 second response window
+            await interaction.response.defer()
             
             # Calculate catch chance
             modified_catch_rate = self.base_catch_rate * ball_multiplier
             catch = random.randint(0, 255)
+            caught = catch <= modified_catch_rate
+            
+            # One guarded write per throw: a catch also pays out and stores the Pokémon
+            ball_field = f"{ball_name}s"
+            if caught:
+                ball_counts = await self.catch_handler(ball_field, self.earnings)
+            else:
+                ball_counts = await consume_ball(str(self.ctx.author.id), ball_field)
+            
+            if ball_counts is None:
+                # Spent elsewhere (another encounter, a trade...) since this battle started
+                setattr(self, ball_field.lower(), 0)
+                self.clear_items()
+                self._setup_buttons()
+                await self._update_embed(update_footer=True)
+                await interaction.edit_original_response(view=self)
+                await interaction.followup.send(f"You don't have any {ball_field} left!", ephemeral=True)
+                return
+            
+            # Sync local counts with what the database actually holds
+            self.pokeballs = ball_counts.get("Pokeballs", 0)
+            self.greatballs = ball_counts.get("Greatballs", 0)
+            self.ultraballs = ball_counts.get("Ultraballs", 0)
+            self.masterballs = ball_counts.get("Masterballs", 0)
             
             # Clear the view and recreate the buttons with updated counts
             self.clear_items()
             self._setup_buttons()
             
             # Handle catch outcome and update embed in a single operation
-            if catch <= modified_catch_rate:
+            if caught:
                 # Successful catch
                 self.catch_result = True
                 
-                # Award Pokedollars
-                await update_user_data(
-                    str(self.ctx.author.id),
-                    {"$inc": {"Pokedollars": self.earnings}}
-                )
-                
                 # Update both title and footer in one operation
                 await self._update_embed(
                     title=f"{self.name} was caught! You earned {self.earnings} Pokedollars",
@@ -412,7 +286,7 @@ class PokemonEncounterView(discord.ui.View):
                 self.catch = catch
                 self.rate = modified_catch_rate
                 
-                await interaction.response.edit_message(view=self)
+                await interaction.edit_original_response(view=self)
                 self.stop()
                 
             elif random.randint(1, 100) <= self.flee_chance:
@@ -431,7 +305,7 @@ class PokemonEncounterView(discord.ui.View):
                 self.catch = catch
                 self.rate = modified_catch_rate
                 
-                await interaction.response.edit_message(view=self)
+                await interaction.edit_original_response(view=self)
                 self.stop()
                 
             else:
@@ -449,7 +323,7 @@ class PokemonEncounterView(discord.ui.View):
                 self.catch = catch
                 self.rate = modified_catch_rate
                 
-                await interaction.response.edit_message(view=self)
+                await interaction.edit_original_response(view=self)
         except Exception as e:
             # Log the error and respond to avoid interaction timeout
             print(f"Error in catch attempt: {str(e)}")
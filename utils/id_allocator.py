@@ -0,0 +1,45 @@
+# utils/id_allocator.py
+import asyncio
+from utils.db_utils import lease_unique_ids
+
+# IDs reserved per database round-trip. Unused IDs in a lease are skipped when
+# the process restarts, so IDs stay unique but may have gaps.
+UNIQUE_ID_BLOCK_SIZE = 1000
+
+# Caught Pokémon IDs are zero-padded to this width; larger numbers simply grow wider
+UNIQUE_ID_WIDTH = 6
+
+def format_unique_id(number):
+    """Format a numeric ID the way caught Pokémon IDs are stored ("000042", "1000000")"""
+    return str(number).zfill(UNIQUE_ID_WIDTH)
+
+class UniqueIDAllocator:
+    """Hands out caught Pokémon IDs from blocks leased with one atomic increment"""
+
+    def __init__(self, block_size=UNIQUE_ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self.next_id = 0
+        self.last_id = -1  # Empty lease until the first allocation
+        self._lease_lock = asyncio.Lock()
+
+    def remaining(self):
+        """IDs left in the current lease"""
+        return max(0, self.last_id - self.next_id + 1)
+
+    async def allocate(self):
+        """Return the next unique ID, leasing a new block when the current one runs out"""
+        async with self._lease_lock:
+            if self.next_id > self.last_id:
+                self.next_id, self.last_id = await lease_unique_ids(self.block_size)
+
+            number = self.next_id
+            self.next_id += 1
+
+        return format_unique_id(number)
+
+# Shared allocator for every command that creates a Pokémon
+unique_ids = UniqueIDAllocator()
+
+async def get_next_unique_id():
+    """Reserve the next zero-padded caught Pokémon ID"""
+    return await unique_ids.allocate()
@@ -0,0 +1,71 @@
+# utils/indexes.py
+from pymongo import ASCENDING
+
+# Every index the bot's queries rely on: (collection, keys, options)
+REQUIRED_INDEXES = [
+    # Species lookups by Pokédex ID and name
+    ("pokemon", [("id", ASCENDING)], {"unique": True}),
+    ("pokemon", [("name", ASCENDING)], {}),
+    ("moves", [("name", ASCENDING)], {}),
+    ("abilities", [("name", ASCENDING)], {}),
+    # A trainer's Pokémon by box number; unnumbered rows (mid-catch fallback) are left out
+    ("caught_pokemon", [("owner_id", ASCENDING), ("ordinal", ASCENDING)],
+     {"unique": True, "partialFilterExpression": {"ordinal": {"$exists": True}}}),
+    # %box pages as range scans
+    ("box_summaries", [("owner_id", ASCENDING), ("ordinal", ASCENDING)], {"unique": True}),
+]
+
+# Representative form of every query the cogs issue, as explain-able commands.
+# full_scan marks queries that read the whole collection on purpose.
+QUERY_SHAPES = [
+    {"name": "user by id", "command": {"find": "inventory", "filter": {"_id": "0"}}},
+    {"name": "use a ball", "command": {
+        "findAndModify": "inventory", "query": {"_id": "0", "Pokeballs": {"$gt": 0}},
+        "update": {"$inc": {"Pokeballs": -1}}}},
+    {"name": "lease unique ids", "command": {
+        "findAndModify": "unique_id", "query": {}, "update": {"$inc": {"last_id": 0}}}, "full_scan": True},
+    {"name": "pokemon by id", "command": {"find": "caught_pokemon", "filter": {"_id": "0"}}},
+    {"name": "pokemon bulk", "command": {"find": "caught_pokemon", "filter": {"_id": {"$in": ["0", "1"]}}}},
+    {"name": "pokemon by box number", "command": {
+        "find": "caught_pokemon", "filter": {"owner_id": "0", "ordinal": 1}}},
+    {"name": "box summary rebuild", "command": {
+        "find": "caught_pokemon", "filter": {"owner_id": "0", "ordinal": {"$exists": True}},
+        "sort": {"ordinal": 1}}},
+    {"name": "box page", "command": {
+        "find": "box_summaries", "filter": {"owner_id": "0", "ordinal": {"$gte": 1, "$lt": 13}},
+        "sort": {"ordinal": 1}}},
+    {"name": "species by id", "command": {"find": "pokemon", "filter": {"id": 1}}},
+    {"name": "species by name", "command": {"find": "pokemon", "filter": {"name": "bulbasaur"}}},
+    {"name": "species catalog load", "command": {"find": "pokemon", "filter": {}}, "full_scan": True},
+    {"name": "move by name", "command": {"find": "moves", "filter": {"name": "tackle"}}},
+    {"name": "ability by name", "command": {"find": "abilities", "filter": {"name": "overgrow"}}},
+    {"name": "config by id", "command": {"find": "config", "filter": {"_id": "pokeballs"}}},
+    {"name": "config snapshot", "command": {"find": "config", "filter": {}}, "full_scan": True},
+    {"name": "emoji snapshot", "command": {"find": "emojis", "filter": {}}, "full_scan": True},
+]
+
+def plan_stages(plan):
+    """Every stage name in an explain() winning plan, outermost first"""
+    stages = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append(node["stage"])
+        # Classic plans nest via inputStage(s); SBE plans wrap the tree in queryPlan
+        for key in ("queryPlan", "inputStage"):
+            if key in node:
+                pending.append(node[key])
+        pending.extend(node.get("inputStages", ()))
+    return stages
+
+def winning_plan(explain_result):
+    """The winning plan of an explain result (unsharded or sharded)"""
+    planner = explain_result.get("queryPlanner", {})
+    plan = planner.get("winningPlan", {})
+    # Sharded clusters report one plan per shard
+    if "shards" in plan:
+        return {"inputStages": [shard.get("winningPlan", {}) for shard in plan["shards"]]}
+    return plan
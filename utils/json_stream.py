@@ -0,0 +1,122 @@
+# utils/json_stream.py
+import json
+
+# Characters read from disk per refill
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\r\n"
+
+# Characters that can continue a JSON number ("1" may become "1.5e10")
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+class _JSONStream:
+    """Incremental reader over a JSON file: only the value being decoded is held in memory"""
+
+    def __init__(self, f, chunk_size=STREAM_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Read another chunk, dropping what has already been consumed; False at EOF"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character (not consumed), or '' at EOF"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, found {found!r}")
+        self.pos += 1
+
+    def decode(self, decoder=json.JSONDecoder()):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+                # A number ending at the buffer edge, or cut after "1" / "1." / "1e", may
+                # continue in the next chunk - only accept it once a delimiter follows
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in _NUMBER_CHARS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if not self._fill():
+                value, self.pos = decoder.raw_decode(self.buffer, self.pos)
+                return value
+
+    def separator(self, closing):
+        """Consume a ',' between members; True when the closing bracket was reached instead"""
+        char = self.peek()
+        if char == closing:
+            self.pos += 1
+            return True
+        if char == ",":
+            self.pos += 1
+            return False
+        raise ValueError(f"Expected ',' or {closing!r} at offset {self.pos}, found {char!r}")
+
+def iter_json_array(path, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array one at a time"""
+    with open(path, "r", encoding="utf-8") as f:
+        stream = _JSONStream(f, chunk_size)
+        stream.expect("[")
+        if stream.peek() == "]":
+            return
+        while True:
+            yield stream.decode()
+            if stream.separator("]"):
+                return
+
+def iter_json_object(path, keys=(), chunk_size=STREAM_CHUNK_SIZE):
+    """Yield (key, value) pairs of a JSON object, optionally nested under keys
+
+    iter_json_object("Inventory.json", keys=("users",)) streams the members of
+    data["users"]; sibling values along the way are decoded and discarded.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        stream = _JSONStream(f, chunk_size)
+        stream.expect("{")
+
+        # Walk down to the requested member
+        for target in keys:
+            while True:
+                if stream.peek() == "}":
+                    raise KeyError(target)
+                key = stream.decode()
+                stream.expect(":")
+                if key == target:
+                    stream.expect("{")
+                    break
+                stream.decode()
+                if stream.separator("}"):
+                    raise KeyError(target)
+
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.decode()
+            stream.expect(":")
+            yield key, stream.decode()
+            if stream.separator("}"):
+                return
@@ -2,50 +2,28 @@
 import discord
 import random
 import asyncio
-import aiohttp
-from config import db
+from utils.species_catalog import get_catalog
+from utils.sprite_resolver import resolve_sprite_url
+from utils.type_chart import TYPE_COLOURS
 
 # ---- Functions imported from pokemon_functions.py ----
 
 def search_pokemon_by_id(pokemon_id):
     """Search for a Pokémon by ID"""
-    result = db.pokemon.find_one({"id": pokemon_id})
-    return result
+    return get_catalog().get_by_id(pokemon_id)
 
 def search_pokemon_by_name(pokemon_name):
     """Search for a Pokémon by name"""
     pokemon_name = pokemon_name.lower()
-    result = db.pokemon.find_one({"name": pokemon_name})
-    return result
+    return get_catalog().get_by_name(pokemon_name)
 
 def get_type_colour(type_list):
     """Get a color for a Pokémon based on its primary type"""
     if not type_list:
         return discord.Color.blue().value
     
-    type_colours = {
-        "grass": 0x7AC74C,
-        "fire": 0xEE8130,
-        "water": 0x6390F0,
-        "electric": 0xF7D02C,
-        "flying": 0xA98FF3,
-        "bug": 0xA6B91A,
-        "steel": 0xB7B7CE,
-        "fairy": 0xD685AD,
-        "poison": 0xA33EA1,
-        "dragon": 0x6F35FC,
-        "psychic": 0xF95587,
-        "dark": 0x705746,
-        "ghost": 0x735797,
-        "rock": 0xB6A136,
-        "ground": 0xE2BF65,
-        "fighting": 0xC22E28,
-        "ice": 0x96D9D6,
-        "normal": 0xA8A77A
-    }
-    
     primary_type = type_list[0].lower()
-    return type_colours.get(primary_type, discord.Color.blue().value)
+    return TYPE_COLOURS.get(primary_type, discord.Color.blue().value)
 
 # Add to utils/pokemon_utils.py
 def get_next_evolution(evolution_line, current_pokemon_name):
@@ -65,62 +43,8 @@ async def get_best_sprite_url(pokemon_data, shiny=False, environment_mode="off")
     if not pokemon_data or "sprites" not in pokemon_data:
         return None
     
-    sprites = pokemon_data["sprites"]
-    
-    # For static environment mode, prioritize static PNG sprites
-    if environment_mode == "static":
-        if shiny:
-            sprite_priority = [
-                "front_shiny_pokemondb",  # Static shiny from PokemonDB
-                "front_shiny_pokeapi",    # Static shiny from PokeAPI
-                "front_shiny",            # Any shiny (possibly animated)
-                "front_default_pokemondb" # Fallback to non-shiny static
-            ]
-        else:
-            sprite_priority = [
-                "front_default_pokemondb", # Static from PokemonDB
-                "front_default_pokeapi",   # Static from PokeAPI
-                "front_default"            # Any default (possibly animated)
-            ]
-    # For animated or disabled environment, use standard priority
-    else:
-        if shiny:
-            sprite_priority = [
-                "front_shiny",
-                "front_shiny_pokemondb",
-                "front_shiny_pokeapi",
-                "front_default",
-                "front_default_pokemondb"
-            ]
-        else:
-            sprite_priority = [
-                "front_default",
-                "front_default_pokemondb",
-                "front_default_pokemondb_3d",
-                "front_default_pokeapi",
-                "official_artwork",
-                "home_artwork"
-            ]
-    
-    # Check each sprite URL in priority order
-    sprite_cache = {}
-    
-    for key in sprite_priority:
-        url = sprites.get(key)
-        if url:
-            if key in sprite_cache:
-                return url
-            try:
-                # Simple check if URL exists
-                async with aiohttp.ClientSession() as session:
-                    async with session.head(url, timeout=2) as response:
-                        if response.status == 200:
-                            sprite_cache[key] = True
-                            return url
-            except Exception:
-                continue
-    
-    return None
+    # Resolved URLs are shared process-wide, persisted and revalidated in the background
+    return await resolve_sprite_url(pokemon_data, shiny, environment_mode)
 
 # ---- Additional utility functions for Pokémon generation ----
 
@@ -196,7 +120,7 @@ def generate_nature(partner_nature=None, has_synchronize=False):
 
 async def prompt_for_nickname(ctx, pokemon_name, unique_id):
     """Prompt user to nickname their newly caught Pokémon"""
-    from config import pokemon_collection
+    from utils.db_utils import update_pokemon_data
     
     nickname_complete = asyncio.Event()
     
@@ -222,8 +146,8 @@ async def prompt_for_nickname(ctx, pokemon_name, unique_id):
             nickname = self.children[0].value
             
             # Update the nickname in the database
-            result = pokemon_collection.update_one(
-                {"_id": self.unique_id},
+            result = await update_pokemon_data(
+                self.unique_id,
                 {"$set": {"nickname": nickname}}
             )
             
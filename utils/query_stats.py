@@ -0,0 +1,61 @@
+# utils/query_stats.py
+import contextvars
+import bson
+
+# Totals for the command running in the current task (None outside commands)
+_current = contextvars.ContextVar("query_stats", default=None)
+
+# command name -> {"invocations", "reads", "bytes"}
+command_totals = {}
+
+def begin_command(command_name):
+    """Start counting database reads for a command invocation"""
+    _current.set({"command": command_name, "reads": 0, "bytes": 0})
+
+def defer_command():
+    """Hand the current invocation's counting over to a task about to be created
+
+    Commands that return right after asyncio.create_task() call this first; the task
+    (which copies the context) calls end_command() when it finishes. Of the two
+    end_command() calls, whichever comes last folds the totals.
+    """
+    current = _current.get()
+    if current is not None:
+        current["deferred"] = True
+
+def end_command():
+    """Fold the current invocation into the per-command totals"""
+    current = _current.get()
+    if current is None:
+        return
+    _current.set(None)
+    if current.pop("deferred", False):
+        return
+
+    totals = command_totals.setdefault(current["command"], {"invocations": 0, "reads": 0, "bytes": 0})
+    totals["invocations"] += 1
+    totals["reads"] += current["reads"]
+    totals["bytes"] += current["bytes"]
+
+def record_read(documents):
+    """Count one database round trip and the BSON size of what it returned"""
+    current = _current.get()
+    if current is None or documents is None:
+        return
+
+    if isinstance(documents, dict):
+        documents = (documents,)
+    current["reads"] += 1
+    current["bytes"] += sum(len(bson.encode(document)) for document in documents)
+
+def stats():
+    """Per-command averages, heaviest readers first"""
+    rows = {}
+    for command_name, totals in sorted(command_totals.items(), key=lambda item: -item[1]["bytes"]):
+        invocations = totals["invocations"] or 1
+        rows[command_name] = {
+            "invocations": totals["invocations"],
+            "reads_per_call": totals["reads"] / invocations,
+            "bytes_per_call": totals["bytes"] / invocations
+        }
+    return rows
@@ -0,0 +1,163 @@
+# utils/render_cache.py
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Final encoded encounter images, keyed by everything that affects the output
+RENDER_CACHE_DIR = os.path.join("cache", "renders")
+RENDER_MEMORY_MAX_BYTES = 64 * 1024 * 1024
+RENDER_DISK_MAX_BYTES = 512 * 1024 * 1024
+
+# Bump whenever the compositing output changes so stale renders are never served
+RENDER_VERSION = 3
+
+def render_cache_key(sprite_sha, background_version, is_animated_allowed, params):
+    """Stable hash of the sprite content, background version, mode and render parameters
+
+    background_version comes from utils.background_atlas.background_version, so a
+    background edited in place never serves renders made from its old content.
+    """
+    raw = repr((RENDER_VERSION, sprite_sha, background_version, bool(is_animated_allowed), params))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+class RenderCache:
+    """Two-tier (memory LRU + disk) cache of rendered images, bounded by bytes"""
+
+    def __init__(self, directory=RENDER_CACHE_DIR, memory_max_bytes=RENDER_MEMORY_MAX_BYTES,
+                 disk_max_bytes=RENDER_DISK_MAX_BYTES):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()  # key -> (data, is_animated, ext)
+        self._memory_bytes = 0
+        self._disk = None             # key -> (file name, size, last_used)
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _file_name(self, key, is_animated, ext):
+        return f"{key}.{'a' if is_animated else 's'}.{ext}"
+
+    def _load_disk_index(self):
+        """Scan the cache directory once; afterwards the index is kept in memory"""
+        if self._disk is not None:
+            return
+
+        self._disk = {}
+        self._disk_bytes = 0
+        if not os.path.isdir(self.directory):
+            return
+
+        for file_name in os.listdir(self.directory):
+            parts = file_name.split(".")
+            if len(parts) != 3 or parts[1] not in ("a", "s"):
+                continue
+            stat = os.stat(os.path.join(self.directory, file_name))
+            self._disk[parts[0]] = (file_name, stat.st_size, stat.st_mtime)
+            self._disk_bytes += stat.st_size
+
+    def _remember(self, key, value):
+        """Insert into the memory tier, evicting least recently used renders"""
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key)[0])
+
+        data = value[0]
+        if len(data) > self.memory_max_bytes:
+            return
+
+        self._memory[key] = value
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, (old_data, _, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_data)
+            self.evictions += 1
+
+    def get(self, key):
+        """Return (data, is_animated, ext) or None"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+            self._load_disk_index()
+            entry = self._disk.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            file_name, size, _ = entry
+            try:
+                with open(os.path.join(self.directory, file_name), "rb") as f:
+                    data = f.read()
+            except OSError:
+                self._disk.pop(key, None)
+                self._disk_bytes -= size
+                self.misses += 1
+                return None
+
+            parts = file_name.split(".")
+            value = (data, parts[1] == "a", parts[2])
+            self._disk[key] = (file_name, size, time.time())
+            self._remember(key, value)
+            self.disk_hits += 1
+            return value
+
+    def set(self, key, data, is_animated, ext):
+        """Store a render in both tiers"""
+        with self._lock:
+            self._remember(key, (data, is_animated, ext))
+
+            self._load_disk_index()
+            if key in self._disk:
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+            file_name = self._file_name(key, is_animated, ext)
+            path = os.path.join(self.directory, file_name)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._disk[key] = (file_name, len(data), time.time())
+            self._disk_bytes += len(data)
+
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        # Evict down to 90% so we are not trimming on every insert
+        target = self.disk_max_bytes * 0.9
+        for key, (file_name, size, _) in sorted(self._disk.items(), key=lambda item: item[1][2]):
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except OSError:
+                pass
+            del self._disk[key]
+            self._disk_bytes -= size
+            self.evictions += 1
+            if self._disk_bytes <= target:
+                break
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_bytes": self._memory_bytes,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+            "disk_entries": len(self._disk or ()),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+# Shared cache for encounter images
+render_cache = RenderCache()
@@ -0,0 +1,117 @@
+# utils/render_pool.py
+import os
+import asyncio
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Worker processes for encounter compositing (leave a core for the event loop)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1))))
+
+# Renders queued or running at once; beyond this callers fall back to the plain sprite
+RENDER_MAX_IN_FLIGHT = int(os.getenv("RENDER_MAX_IN_FLIGHT", RENDER_WORKERS * 4))
+
+# Workers must not be forked from the bot: Motor/pymongo threads (and their locks)
+# would be copied mid-state. forkserver where the platform has it, spawn otherwise.
+RENDER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def _warm_worker(background_folder, bg_sizes):
+    """Process initializer: import the imaging stack and map the background atlases"""
+    for module_name in ("cv2", "PIL.Image"):
+        importlib.import_module(module_name)
+    from utils.background_atlas import warm_atlases
+    try:
+        warm_atlases(background_folder, bg_sizes)
+    except Exception as e:
+        print(f"Render worker {os.getpid()} could not warm the background atlas: {e}")
+
+class RenderPool:
+    """Process pool for CPU-bound rendering with a bounded number of in-flight jobs"""
+
+    def __init__(self, workers=RENDER_WORKERS, max_in_flight=RENDER_MAX_IN_FLIGHT):
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.executor = None
+        self.initargs = None
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.restarts = 0
+
+    def start(self, background_folder, bg_sizes):
+        """Start warm worker processes (no-op if already running)"""
+        if self.executor is None:
+            self.initargs = (background_folder, tuple(bg_sizes))
+            self.executor = self._new_executor()
+            print(f"Started render pool with {self.workers} workers")
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(RENDER_START_METHOD),
+            initializer=_warm_worker,
+            initargs=self.initargs
+        )
+
+    def _restart(self, broken_executor):
+        """Replace a pool broken by a dead worker (e.g. OOM on a large frame stack)"""
+        # Several in-flight jobs see the same break; only the first replaces the pool
+        if self.executor is not broken_executor:
+            return
+        broken_executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = self._new_executor()
+        self.restarts += 1
+        print(f"Render pool broken by a worker crash - restarted ({self.restarts} so far)")
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def saturated(self):
+        return self.in_flight >= self.max_in_flight
+
+    async def submit(self, fn, *args):
+        """Run fn(*args) in a worker; returns None when the queue is full"""
+        # Back-pressure: refuse new work instead of letting latency grow without bound
+        if self.saturated():
+            self.rejected += 1
+            return None
+
+        self.in_flight += 1
+        executor = self.executor
+        try:
+            if executor is None:
+                # Pool not started (e.g. cog not loaded) - still keep the event loop free
+                result = await asyncio.to_thread(fn, *args)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # This job is lost (callers fall back to the plain sprite); later ones get a fresh pool
+            self.failed += 1
+            self._restart(executor)
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        self.completed += 1
+        return result
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "restarts": self.restarts
+        }
+
+# Shared pool for encounter images
+render_pool = RenderPool()
@@ -0,0 +1,137 @@
+# utils/species_catalog.py
+import os
+import sys
+import json
+import time
+from types import MappingProxyType
+
+# Static species data is loaded once at startup and served from memory
+SPECIES_DATA_FILE = os.path.join("fresh_data", "all_pokemon_data_v2.json")
+
+# Sidecar written by precompute_sprites.py: {"<id>": {"default"|"static": {"normal"|"shiny": url}}}
+BEST_SPRITES_FILE = os.path.join("fresh_data", "best_sprites.json")
+
+# Fields dropped from the in-memory records (learnsets are never read by the bot)
+EXCLUDED_FIELDS = ("_id", "moves")
+
+_catalog = None
+
+def _freeze(value):
+    """Recursively convert a species document into read-only containers"""
+    if isinstance(value, dict):
+        return MappingProxyType({sys.intern(k): _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, str) and len(value) <= 32:
+        # Type names, sprite keys, rarities etc. repeat across ~1,000 species
+        return sys.intern(value)
+    return value
+
+def _compact_record(document, best_sprite=None):
+    """Build the compact, immutable record stored for one species"""
+    record = {k: v for k, v in document.items() if k not in EXCLUDED_FIELDS}
+    if best_sprite is not None:
+        record["best_sprite"] = best_sprite
+    return _freeze(record)
+
+class SpeciesCatalog:
+    """Immutable in-process index of all species keyed by Pokédex ID and name"""
+    __slots__ = ("by_id", "by_name", "by_type", "version", "source", "loaded_at")
+
+    def __init__(self, documents, version=1, source="unknown", best_sprites=None):
+        best_sprites = best_sprites or {}
+        by_id = {}
+        by_name = {}
+        for document in documents:
+            record = _compact_record(document, best_sprites.get(str(document["id"])))
+            by_id[record["id"]] = record
+            by_name[record["name"]] = record
+
+        # Species of each type in Pokédex order (%type counts and examples)
+        by_type = {}
+        for pokemon_id in sorted(by_id):
+            for type_name in by_id[pokemon_id].get("types", ()):
+                by_type.setdefault(type_name, []).append(by_id[pokemon_id])
+
+        # Mapping proxies keep callers from mutating the shared indexes
+        self.by_id = MappingProxyType(by_id)
+        self.by_name = MappingProxyType(by_name)
+        self.by_type = MappingProxyType({type_name: tuple(records) for type_name, records in by_type.items()})
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def get_by_id(self, pokemon_id):
+        """Look up a species record by Pokédex ID"""
+        return self.by_id.get(pokemon_id)
+
+    def get_by_name(self, pokemon_name):
+        """Look up a species record by its lowercase name"""
+        return self.by_name.get(pokemon_name)
+
+    def get_by_types(self, type_names):
+        """Species having every one of the given types, in Pokédex order"""
+        first, *rest = type_names
+        return tuple(record for record in self.by_type.get(first, ())
+                     if all(type_name in record["types"] for type_name in rest))
+
+def _load_documents(source):
+    """Fetch raw species documents from MongoDB or the bundled JSON file"""
+    if source == "mongo":
+        from config import db
+        return list(db.pokemon.find({}, {field: 0 for field in EXCLUDED_FIELDS}))
+
+    with open(SPECIES_DATA_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _load_best_sprites():
+    """Read the precomputed best-sprite sidecar, if the precompute job has been run"""
+    if not os.path.exists(BEST_SPRITES_FILE):
+        return {}
+
+    try:
+        with open(BEST_SPRITES_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable best sprite file {BEST_SPRITES_FILE}: {e}")
+        return {}
+
+def load_catalog(source=None):
+    """Load the species catalog, preferring MongoDB and falling back to the JSON file"""
+    global _catalog
+    sources = [source] if source else ["mongo", "file"]
+    version = _catalog.version + 1 if _catalog else 1
+    best_sprites = _load_best_sprites()
+
+    for candidate in sources:
+        try:
+            documents = _load_documents(candidate)
+        except Exception as e:
+            print(f"Failed to load species catalog from {candidate}: {e}")
+            continue
+
+        if not documents:
+            print(f"Species catalog source {candidate} returned no species")
+            continue
+
+        _catalog = SpeciesCatalog(documents, version=version, source=candidate, best_sprites=best_sprites)
+        print(f"Loaded {len(_catalog)} species into the catalog from {candidate} (v{version})")
+        return _catalog
+
+    raise RuntimeError("Species catalog could not be loaded from any source")
+
+def reload_catalog(source=None):
+    """Rebuild the catalog, e.g. after the pokemon collection has been re-uploaded"""
+    return load_catalog(source)
+
+def get_catalog():
+    """Return the loaded catalog, loading it on first use"""
+    if _catalog is None:
+        load_catalog()
+    return _catalog
@@ -0,0 +1,256 @@
+# utils/sprite_resolver.py
+import os
+import json
+import time
+import asyncio
+import aiohttp
+
+# Resolved sprite URLs survive restarts so warm starts skip the HEAD probes
+SPRITE_CACHE_FILE = os.path.join("cache", "sprite_urls.json")
+
+# Entries older than this are still served, but re-probed in the background
+SPRITE_REVALIDATE_AFTER = 24 * 60 * 60
+
+# Species with no reachable sprite are retried sooner
+SPRITE_NEGATIVE_REVALIDATE_AFTER = 60 * 60
+
+# Probes that failed on network errors are retried much sooner (and never saved)
+SPRITE_TRANSIENT_REVALIDATE_AFTER = 5 * 60
+
+# HEAD statuses that mean a sprite is really gone; anything else may be transient
+SPRITE_MISSING_STATUSES = (404, 410)
+
+# Delay before a batch of new results is written to disk
+SPRITE_SAVE_DELAY = 10
+
+SPRITE_PROBE_TIMEOUT = 2
+
+# (species_id, shiny, mode) -> {"url": str | None, "checked_at": float, "transient": bool (optional)}
+resolved_sprites = {}
+
+_loaded = False
+_save_scheduled = False
+_revalidating = set()
+_inflight = {}  # key -> task probing a sprite nobody has resolved yet
+_background_tasks = set()  # save/revalidate tasks, held so they aren't garbage collected
+
+def _start_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+def get_sprite_priority(shiny=False, environment_mode="off"):
+    """Sprite keys to try, best first, for a shiny flag and environment mode"""
+    # For static environment mode, prioritize static PNG sprites
+    if environment_mode == "static":
+        if shiny:
+            return (
+                "front_shiny_pokemondb",  # Static shiny from PokemonDB
+                "front_shiny_pokeapi",    # Static shiny from PokeAPI
+                "front_shiny",            # Any shiny (possibly animated)
+                "front_default_pokemondb" # Fallback to non-shiny static
+            )
+        return (
+            "front_default_pokemondb", # Static from PokemonDB
+            "front_default_pokeapi",   # Static from PokeAPI
+            "front_default"            # Any default (possibly animated)
+        )
+
+    # For animated or disabled environment, use standard priority
+    if shiny:
+        return (
+            "front_shiny",
+            "front_shiny_pokemondb",
+            "front_shiny_pokeapi",
+            "front_default",
+            "front_default_pokemondb"
+        )
+    return (
+        "front_default",
+        "front_default_pokemondb",
+        "front_default_pokemondb_3d",
+        "front_default_pokeapi",
+        "official_artwork",
+        "home_artwork"
+    )
+
+def sprite_mode(environment_mode):
+    """Collapse environment modes that share a sprite priority list"""
+    return "static" if environment_mode == "static" else "default"
+
+def sprite_cache_key(species_id, shiny, environment_mode):
+    return (species_id, bool(shiny), sprite_mode(environment_mode))
+
+def precomputed_sprite_url(pokemon_data, shiny=False, environment_mode="off"):
+    """Look up the offline-resolved sprite; returns (found, url)"""
+    best_sprite = pokemon_data.get("best_sprite")
+    if not best_sprite:
+        return False, None
+
+    choices = best_sprite.get(sprite_mode(environment_mode))
+    if choices is None:
+        return False, None
+
+    variant = "shiny" if shiny else "normal"
+    if variant not in choices:
+        return False, None
+    return True, choices[variant]
+
+def load_sprite_cache(path=SPRITE_CACHE_FILE):
+    """Load previously resolved sprite URLs from disk"""
+    global _loaded
+    _loaded = True
+
+    if not os.path.exists(path):
+        return 0
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable sprite cache {path}: {e}")
+        return 0
+
+    for entry in entries:
+        key = (entry["id"], entry["shiny"], entry["mode"])
+        resolved_sprites[key] = {"url": entry["url"], "checked_at": entry["checked_at"]}
+    return len(entries)
+
+def save_sprite_cache(path=SPRITE_CACHE_FILE):
+    """Write resolved sprite URLs to disk (atomic replace)"""
+    entries = [
+        {"id": key[0], "shiny": key[1], "mode": key[2], "url": value["url"], "checked_at": value["checked_at"]}
+        for key, value in list(resolved_sprites.items())
+        if not value.get("transient")
+    ]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    os.replace(tmp_path, path)
+
+async def _save_later():
+    global _save_scheduled
+    try:
+        await asyncio.sleep(SPRITE_SAVE_DELAY)
+    finally:
+        # Even if cancelled, so a later result can schedule the save again
+        _save_scheduled = False
+    try:
+        await asyncio.to_thread(save_sprite_cache)
+    except Exception as e:
+        print(f"Error saving sprite cache: {e}")
+
+def _schedule_save():
+    """Coalesce many new results into one disk write"""
+    global _save_scheduled
+    if not _save_scheduled:
+        _save_scheduled = True
+        _start_background(_save_later())
+
+async def _url_status(session, url):
+    """True if the URL serves a sprite, False if it is definitely missing, None if unknown"""
+    try:
+        async with session.head(url, timeout=aiohttp.ClientTimeout(total=SPRITE_PROBE_TIMEOUT)) as response:
+            if response.status == 200:
+                return True
+            if response.status in SPRITE_MISSING_STATUSES:
+                return False
+            return None
+    except Exception:
+        # Timeouts and network errors say nothing about the sprite itself
+        return None
+
+async def probe_best_sprite(sprites, shiny=False, environment_mode="off", session=None):
+    """First reachable sprite URL in priority order; returns (url, definite)
+
+    definite is False when nothing was reachable but some candidate could not be
+    checked (timeout, network error, 5xx), so the miss may be transient.
+    """
+    if session is None:
+        from utils.encounter_utils import initialize_session
+        session = await initialize_session()
+
+    definite = True
+    for key in get_sprite_priority(shiny, environment_mode):
+        url = sprites.get(key)
+        if not url:
+            continue
+        status = await _url_status(session, url)
+        if status:
+            return url, True
+        if status is None:
+            definite = False
+    return None, definite
+
+def fallback_sprite_url(sprites, shiny=False, environment_mode="off"):
+    """Highest-priority sprite URL the species lists, unprobed"""
+    for key in get_sprite_priority(shiny, environment_mode):
+        if sprites.get(key):
+            return sprites[key]
+    return None
+
+def _is_stale(entry):
+    if entry.get("transient"):
+        max_age = SPRITE_TRANSIENT_REVALIDATE_AFTER
+    else:
+        max_age = SPRITE_REVALIDATE_AFTER if entry["url"] else SPRITE_NEGATIVE_REVALIDATE_AFTER
+    return time.time() - entry["checked_at"] > max_age
+
+async def _resolve(key, sprites, shiny, environment_mode):
+    url, definite = await probe_best_sprite(sprites, shiny, environment_mode)
+    if url is None and not definite:
+        # The CDN couldn't be reached: keep serving what we had (or the listed URL),
+        # only in memory, and probe again soon
+        previous = resolved_sprites.get(key)
+        url = previous["url"] if previous and previous["url"] else fallback_sprite_url(sprites, shiny, environment_mode)
+        resolved_sprites[key] = {"url": url, "checked_at": time.time(), "transient": True}
+        return url
+
+    # Only definite answers (a reachable sprite, or every candidate 404) are cached on disk
+    resolved_sprites[key] = {"url": url, "checked_at": time.time()}
+    _schedule_save()
+    return url
+
+async def _revalidate(key, sprites, shiny, environment_mode):
+    try:
+        await _resolve(key, sprites, shiny, environment_mode)
+    except Exception as e:
+        print(f"Error revalidating sprite {key}: {e}")
+    finally:
+        _revalidating.discard(key)
+
+async def resolve_sprite_url(pokemon_data, shiny=False, environment_mode="off"):
+    """Best sprite URL for a species, served from the resolved table when possible"""
+    # Precomputed by precompute_sprites.py - no network I/O at all
+    found, url = precomputed_sprite_url(pokemon_data, shiny, environment_mode)
+    if found:
+        return url
+
+    if not _loaded:
+        load_sprite_cache()
+
+    sprites = pokemon_data["sprites"]
+    key = sprite_cache_key(pokemon_data["id"], shiny, environment_mode)
+    entry = resolved_sprites.get(key)
+
+    # A catalog reload may have changed the species' sprite URLs
+    if entry is not None and entry["url"] is not None and entry["url"] not in sprites.values():
+        entry = None
+
+    if entry is None:
+        # Concurrent callers for the same sprite share a single probe
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(_resolve(key, sprites, shiny, environment_mode))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    if _is_stale(entry) and key not in _revalidating:
+        _revalidating.add(key)
+        _start_background(_revalidate(key, sprites, shiny, environment_mode))
+
+    return entry["url"]
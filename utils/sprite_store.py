@@ -0,0 +1,212 @@
+# utils/sprite_store.py
+import io
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import Counter, namedtuple
+from utils.cache import TTLCache
+
+# Sprite files are stored once per distinct content, named by their SHA-256
+SPRITE_STORE_DIR = os.path.join("cache", "sprites")
+SPRITE_INDEX_FILE = os.path.join(SPRITE_STORE_DIR, "index.json")
+
+# Least recently used blobs are deleted once the store grows past this
+SPRITE_STORE_MAX_BYTES = 256 * 1024 * 1024
+
+# Index changes that are only last-used times are written at most this often (seconds)
+SPRITE_INDEX_SAVE_INTERVAL = 5 * 60
+
+# Decoded sprites kept in memory (per process)
+DECODED_SPRITE_CACHE_SIZE = 256
+DECODED_SPRITE_TTL = 6 * 60 * 60
+
+# Frames are read-only RGBA numpy arrays; durations are in milliseconds
+DecodedSprite = namedtuple("DecodedSprite", ["frames", "durations", "is_animated"])
+
+decoded_sprites = TTLCache("decoded_sprites", max_size=DECODED_SPRITE_CACHE_SIZE, ttl=DECODED_SPRITE_TTL)
+
+# url -> {"sha": str, "size": int, "last_used": float}
+_index = None
+_index_dirty = False
+_last_index_save = 0
+_inflight = {}  # url -> task downloading it
+
+def _blob_path(sha):
+    return os.path.join(SPRITE_STORE_DIR, sha[:2], sha)
+
+def _load_index():
+    global _index
+    if _index is not None:
+        return _index
+
+    _index = {}
+    if os.path.exists(SPRITE_INDEX_FILE):
+        try:
+            with open(SPRITE_INDEX_FILE, "r", encoding="utf-8") as f:
+                _index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable sprite index {SPRITE_INDEX_FILE}: {e}")
+    return _index
+
+def _write_index(snapshot):
+    os.makedirs(SPRITE_STORE_DIR, exist_ok=True)
+    tmp_path = f"{SPRITE_INDEX_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, SPRITE_INDEX_FILE)
+
+async def save_index():
+    """Persist the URL -> blob index (atomic replace)"""
+    global _index_dirty, _last_index_save
+    if _index is None or not _index_dirty:
+        return
+
+    # Snapshot on the event loop so the writer thread never sees a changing dict
+    snapshot = {url: dict(entry) for url, entry in _index.items()}
+    _index_dirty = False
+    _last_index_save = time.time()
+    await asyncio.to_thread(_write_index, snapshot)
+
+def _read_blob(sha):
+    try:
+        with open(_blob_path(sha), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _write_blob(data):
+    """Store bytes under their content hash; identical sprites share one file"""
+    sha = hashlib.sha256(data).hexdigest()
+    path = _blob_path(sha)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return sha
+
+def _evict_lru():
+    """Drop least recently used URLs until under the cap; returns blob shas no longer referenced"""
+    global _index_dirty
+    index = _load_index()
+
+    # Each blob counts once no matter how many URLs point at it
+    blob_sizes = {}
+    for entry in index.values():
+        blob_sizes[entry["sha"]] = entry["size"]
+    total = sum(blob_sizes.values())
+    if total <= SPRITE_STORE_MAX_BYTES:
+        return []
+
+    references = Counter(entry["sha"] for entry in index.values())
+    orphaned = []
+    for url, entry in sorted(index.items(), key=lambda item: item[1]["last_used"]):
+        del index[url]
+        _index_dirty = True
+        sha = entry["sha"]
+        references[sha] -= 1
+        if references[sha]:
+            continue
+        orphaned.append(sha)
+        total -= blob_sizes[sha]
+        if total <= SPRITE_STORE_MAX_BYTES:
+            break
+    return orphaned
+
+def _remove_blobs(shas):
+    for sha in shas:
+        try:
+            os.remove(_blob_path(sha))
+        except OSError:
+            pass
+
+async def _enforce_size_cap():
+    """Evict least recently used URLs (and unreferenced blobs) until under the cap"""
+    # The index is only touched on the event loop; the file deletes run in a thread
+    orphaned = _evict_lru()
+    if orphaned:
+        await asyncio.to_thread(_remove_blobs, orphaned)
+
+async def _download(url):
+    from utils.encounter_utils import initialize_session
+    session = await initialize_session()
+    async with session.get(url) as response:
+        if response.status != 200:
+            return None
+        return await response.read()
+
+async def _fetch_and_store(url):
+    global _index_dirty
+    data = await _download(url)
+    if data is None:
+        return None
+
+    sha = await asyncio.to_thread(_write_blob, data)
+    _load_index()[url] = {"sha": sha, "size": len(data), "last_used": time.time()}
+    _index_dirty = True
+    await _enforce_size_cap()
+    await save_index()
+    return sha, data
+
+def lookup_sprite_sha(url):
+    """Content hash of an already stored sprite URL, without reading it (None if unknown)"""
+    entry = _load_index().get(url)
+    return entry["sha"] if entry is not None else None
+
+async def fetch_sprite(url):
+    """Return (sha, bytes) for a sprite URL from disk, downloading it only once; None on failure"""
+    global _index_dirty
+    entry = _load_index().get(url)
+    if entry is not None:
+        data = await asyncio.to_thread(_read_blob, entry["sha"])
+        if data is not None:
+            # Persist the touch too, or eviction after a restart works from stale times
+            entry["last_used"] = time.time()
+            _index_dirty = True
+            if time.time() - _last_index_save > SPRITE_INDEX_SAVE_INTERVAL:
+                await save_index()
+            return entry["sha"], data
+
+    # Concurrent renders of the same species share one download
+    task = _inflight.get(url)
+    if task is None:
+        task = asyncio.create_task(_fetch_and_store(url))
+        _inflight[url] = task
+        task.add_done_callback(lambda _: _inflight.pop(url, None))
+
+    try:
+        return await asyncio.shield(task)
+    except Exception as e:
+        print(f"Error fetching sprite {url}: {e}")
+        return None
+
+def decode_sprite(data):
+    """Decode sprite bytes into RGBA frames and durations"""
+    import numpy as np
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    is_animated = image.format == "GIF" and getattr(image, "is_animated", False)
+    frame_count = image.n_frames if is_animated else 1
+
+    frames = []
+    durations = []
+    for frame_idx in range(frame_count):
+        image.seek(frame_idx)
+        frame = np.array(image.convert("RGBA"))
+        frame.setflags(write=False)  # Shared between renders - never modify in place
+        frames.append(frame)
+        durations.append(image.info.get("duration", 100))
+
+    return DecodedSprite(tuple(frames), tuple(durations), is_animated)
+
+def get_decoded_sprite(sha, data):
+    """Decoded sprite for a blob, served from the in-memory LRU when possible"""
+    decoded = decoded_sprites.get(sha)
+    if decoded is None:
+        decoded = decode_sprite(data)
+        decoded_sprites.set(sha, decoded)
+    return decoded
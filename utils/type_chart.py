@@ -0,0 +1,82 @@
+# utils/type_chart.py
+import numpy as np
+from functools import lru_cache
+from types import MappingProxyType
+
+# Row/column order of the effectiveness matrix
+TYPES = (
+    "normal", "fire", "water", "electric", "grass", "ice", "fighting", "poison", "ground",
+    "flying", "psychic", "bug", "rock", "ghost", "dragon", "dark", "steel", "fairy"
+)
+TYPE_INDEX = {type_name: i for i, type_name in enumerate(TYPES)}
+
+TYPE_COLOURS = {
+    "normal": 0xA8A77A, "fire": 0xEE8130, "water": 0x6390F0, "electric": 0xF7D02C,
+    "grass": 0x7AC74C, "ice": 0x96D9D6, "fighting": 0xC22E28, "poison": 0xA33EA1,
+    "ground": 0xE2BF65, "flying": 0xA98FF3, "psychic": 0xF95587, "bug": 0xA6B91A,
+    "rock": 0xB6A136, "ghost": 0x735797, "dragon": 0x6F35FC, "dark": 0x705746,
+    "steel": 0xB7B7CE, "fairy": 0xD685AD
+}
+
+# Defending type -> (weak to, resistant to, immune to)
+_DEFENSIVE_CHART = {
+    "normal": (("fighting",), (), ("ghost",)),
+    "fire": (("water", "ground", "rock"), ("fire", "grass", "ice", "bug", "steel", "fairy"), ()),
+    "water": (("electric", "grass"), ("fire", "water", "ice", "steel"), ()),
+    "electric": (("ground",), ("electric", "flying", "steel"), ()),
+    "grass": (("fire", "ice", "poison", "flying", "bug"), ("water", "electric", "grass", "ground"), ()),
+    "ice": (("fire", "fighting", "rock", "steel"), ("ice",), ()),
+    "fighting": (("flying", "psychic", "fairy"), ("bug", "rock", "dark"), ()),
+    "poison": (("ground", "psychic"), ("grass", "fighting", "poison", "bug", "fairy"), ()),
+    "ground": (("water", "grass", "ice"), ("poison", "rock"), ("electric",)),
+    "flying": (("electric", "ice", "rock"), ("grass", "fighting", "bug"), ("ground",)),
+    "psychic": (("bug", "ghost", "dark"), ("fighting", "psychic"), ()),
+    "bug": (("fire", "flying", "rock"), ("grass", "fighting", "ground"), ()),
+    "rock": (("water", "grass", "fighting", "ground", "steel"), ("normal", "fire", "poison", "flying"), ()),
+    "ghost": (("ghost", "dark"), ("poison", "bug"), ("normal", "fighting")),
+    "dragon": (("ice", "dragon", "fairy"), ("fire", "water", "electric", "grass"), ()),
+    "dark": (("fighting", "bug", "fairy"), ("ghost", "dark"), ("psychic",)),
+    "steel": (("fire", "fighting", "ground"),
+              ("normal", "grass", "ice", "flying", "psychic", "bug", "rock", "dragon", "steel", "fairy"),
+              ("poison",)),
+    "fairy": (("poison", "steel"), ("fighting", "bug", "dark"), ("dragon",))
+}
+
+def _build_matrix():
+    matrix = np.ones((len(TYPES), len(TYPES)), dtype=np.float32)
+    for defending, (weak_to, resistant_to, immune_to) in _DEFENSIVE_CHART.items():
+        column = TYPE_INDEX[defending]
+        for attacking, multiplier in ((weak_to, 2.0), (resistant_to, 0.5), (immune_to, 0.0)):
+            for attacking_type in attacking:
+                matrix[TYPE_INDEX[attacking_type], column] = multiplier
+    # Shared by the whole bot, so nobody may write to it
+    matrix.setflags(write=False)
+    return matrix
+
+# EFFECTIVENESS[attacking, defending] -> damage multiplier
+EFFECTIVENESS = _build_matrix()
+
+def is_type(type_name):
+    return type_name in TYPE_INDEX
+
+def defensive_multipliers(defending_types):
+    """Multiplier each attacking type deals to a single- or dual-typed defender (array of 18)"""
+    columns = [TYPE_INDEX[type_name] for type_name in defending_types]
+    return EFFECTIVENESS[:, columns].prod(axis=1)
+
+def attack_multiplier(attacking_type, defending_types):
+    """Damage multiplier of one attacking type against a single- or dual-typed defender"""
+    return float(defensive_multipliers(defending_types)[TYPE_INDEX[attacking_type]])
+
+def defensive_matchups(defending_types):
+    """{multiplier: (attacking types)} for every multiplier other than 1x, strongest first"""
+    return _matchups(tuple(defending_types))
+
+@lru_cache(maxsize=None)
+def _matchups(defending_types):
+    # 18 single types + 153 pairs, so every answer is computed at most once
+    multipliers = defensive_multipliers(defending_types)
+    matchups = {}
+    for multiplier in sorted(set(multipliers.tolist()) - {1.0}, reverse=True):
+        matchups[multiplier] = tuple(TYPES[i] for i in np.flatnonzero(multipliers == multiplier))
+    return MappingProxyType(matchups)
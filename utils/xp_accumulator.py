@@ -0,0 +1,147 @@
+# utils/xp_accumulator.py
+import time
+import asyncio
+from pymongo.errors import BulkWriteError
+from utils.db_utils import get_pokemon_bulk, bulk_update_pokemon, failed_update_ids
+from utils.pokemon_utils import calculate_stat, calculate_min_xp_for_level
+
+# Pending XP is written back at least this often (seconds). This is also the
+# upper bound on chat XP lost if the process dies without a clean shutdown.
+XP_FLUSH_INTERVAL = 30
+
+# Flush early once this many partners have pending XP
+XP_MAX_PENDING = 500
+
+def calculate_final_stats(base_stats, ivs, level):
+    """Recalculate every final stat for a level"""
+    return {
+        "hp": calculate_stat(base_stats["hp"], ivs["hp"], level, is_hp=True),
+        "attack": calculate_stat(base_stats["attack"], ivs["attack"], level),
+        "defense": calculate_stat(base_stats["defense"], ivs["defense"], level),
+        "special-attack": calculate_stat(base_stats["special-attack"], ivs["special-attack"], level),
+        "special-defense": calculate_stat(base_stats["special-defense"], ivs["special-defense"], level),
+        "speed": calculate_stat(base_stats["speed"], ivs["speed"], level)
+    }
+
+def apply_xp(level, xp):
+    """Apply XP to a level, returning (new_level, leftover_xp)"""
+    # XP resets to the excess on each level up (same rule the listener always used)
+    next_level_xp = calculate_min_xp_for_level(level + 1)
+    while xp >= next_level_xp:
+        xp -= next_level_xp
+        level += 1
+        next_level_xp = calculate_min_xp_for_level(level + 1)
+    return level, xp
+
+class XPAccumulator:
+    """Write-behind buffer for partner XP earned from chat messages"""
+
+    def __init__(self, max_pending=XP_MAX_PENDING):
+        self.max_pending = max_pending
+        self.pending = {}  # pokemon_id -> {"xp", "channel", "mention"}
+        self.last_flush = time.time()
+        self._flush_lock = asyncio.Lock()
+
+    def add(self, pokemon_id, xp, channel=None, mention=None):
+        """Queue XP for a Pokémon; returns True when an early flush is due"""
+        entry = self.pending.get(pokemon_id)
+        if entry is None:
+            entry = self.pending[pokemon_id] = {"xp": 0, "channel": None, "mention": None}
+
+        entry["xp"] += xp
+        # Level-up announcements go to wherever the trainer last chatted
+        if channel is not None:
+            entry["channel"] = channel
+            entry["mention"] = mention
+
+        return len(self.pending) >= self.max_pending
+
+    def pending_xp(self, pokemon_id):
+        """XP earned but not yet written to the database"""
+        entry = self.pending.get(pokemon_id)
+        return entry["xp"] if entry else 0
+
+    async def flush(self):
+        """Write all pending XP in one bulk write; returns level-up events"""
+        async with self._flush_lock:
+            if not self.pending:
+                return []
+
+            batch, self.pending = self.pending, {}
+            self.last_flush = time.time()
+
+            try:
+                # Uncached, since the updates below are derived from the stored level and XP
+                pokemon_dict = await get_pokemon_bulk(list(batch), cached=False)
+                updates, level_ups = self._build_updates(batch, pokemon_dict)
+            except asyncio.CancelledError:
+                self._requeue(batch)
+                raise
+            except Exception as e:
+                # Nothing was written yet - put the XP back so the next flush retries it
+                print(f"Error flushing partner XP: {e}")
+                self._requeue(batch)
+                return []
+
+            # Past this point part of the batch may already be applied, so only
+            # updates the server reports as failed are retried
+            try:
+                await bulk_update_pokemon(updates)
+            except BulkWriteError as e:
+                failed_ids = failed_update_ids(e, updates)
+                print(f"Error flushing partner XP: {len(failed_ids)} of {len(updates)} updates failed")
+                self._requeue({pokemon_id: batch[pokemon_id] for pokemon_id in failed_ids})
+                return [event for event in level_ups if event["pokemon"]["_id"] not in failed_ids]
+            except Exception as e:
+                # Timed out or lost the connection mid-write: the server may have applied
+                # it, and retrying would award the XP twice
+                print(f"Partner XP flush outcome unknown, dropping {len(updates)} updates: {e}")
+                return []
+
+            return level_ups
+
+    def _requeue(self, batch):
+        """Merge an unwritten batch back into the pending XP"""
+        for pokemon_id, entry in batch.items():
+            merged = self.pending.setdefault(pokemon_id, {"xp": 0, "channel": None, "mention": None})
+            merged["xp"] += entry["xp"]
+            merged["channel"] = merged["channel"] or entry["channel"]
+            merged["mention"] = merged["mention"] or entry["mention"]
+
+    def _build_updates(self, batch, pokemon_dict):
+        """Compute one combined update per Pokémon from its pending XP"""
+        updates = {}
+        level_ups = []
+
+        for pokemon_id, entry in batch.items():
+            pokemon = pokemon_dict.get(pokemon_id)
+            if not pokemon:
+                continue  # Released or missing - drop the XP
+
+            level = pokemon["level"]
+            current_xp = pokemon.get("xp", 0)
+            new_level, new_xp = apply_xp(level, current_xp + entry["xp"])
+
+            if new_level == level:
+                updates[pokemon_id] = {"$inc": {"xp": entry["xp"]}}
+                continue
+
+            # XP moves by a delta so XP written since the read isn't overwritten
+            updates[pokemon_id] = {
+                "$inc": {"xp": new_xp - current_xp},
+                "$set": {
+                    "level": new_level,
+                    "final_stats": calculate_final_stats(pokemon["base_stats"], pokemon["ivs"], new_level)
+                }
+            }
+            level_ups.append({
+                "pokemon": pokemon,
+                "new_level": new_level,
+                "channel": entry["channel"],
+                "mention": entry["mention"]
+            })
+
+        return updates, level_ups
+
+# Shared accumulator for the on_message listener
+partner_xp = XPAccumulator()